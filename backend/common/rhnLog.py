@@ -128,6 +128,13 @@ def log_debug(level, *args):
     if LOG and LOG.level >= level:
         LOG.logMessage(*args)
 
+# Whether log_debug(level, ...) would log anything; lets callers skip
+# building expensive messages
+
+
+def log_debug_enabled(level):
+    return bool(LOG and LOG.level >= level)
+
 # Dump some information to stderr.
 
 
@@ -0,0 +1,147 @@
+#
+# Copyright (c) 2021 SUSE LLC
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Cache of serialized values (e.g. encoded XMLRPC responses) shared by all
+# the server processes through read-only memory maps.
+#
+# Each entry is a file under CACHEDIR/shared, written to a temporary file
+# which is then renamed over the previous one, with the modified timestamp
+# as mtime. A process maps an entry the first time it reads it and serves it
+# from the map as long as the file is not replaced: get_buffer() does no
+# read nor unpickling per hit and the pages are shared with the other
+# processes through the page cache.
+#
+# A map is never closed explicitly, it is unmapped once the last buffer
+# returned for it is released: a reader can keep using a buffer while the
+# entry is replaced.
+#
+
+import mmap
+import os
+import sys
+import tempfile
+import threading
+from errno import ENOENT
+
+from uyuni.common.rhnLib import timestamp
+from uyuni.common.fileutils import makedirs, setPermsPath
+from spacewalk.common import rhnCache
+
+SUBDIR = "shared"
+
+# name -> (device, inode, mtime, size, memory map) of the mapped entries
+_maps = {}
+_lock = threading.Lock()
+
+
+def _fname(name):
+    return rhnCache.cleanupPath(os.path.join(rhnCache.CACHEDIR, SUBDIR, name))
+
+
+def _modified(modified):
+    if modified is None:
+        return None
+    return int(timestamp(modified))
+
+
+def _unmap(name):
+    # the map may still be used by the callers it was returned to, it is
+    # closed by the garbage collector once they are done
+    _maps.pop(name, None)
+
+
+def get_buffer(name, modified=None):
+    """
+    Returns a read-only buffer with the value stored for name, or None if
+    there is no such entry or, with modified, if it was stored for another
+    modified timestamp. The buffer stays valid as long as it is referenced,
+    even if the entry is replaced.
+    """
+    fname = _fname(name)
+    modified = _modified(modified)
+    with _lock:
+        try:
+            st = os.stat(fname)
+        except OSError:
+            _unmap(name)
+            return None
+        if modified is not None and int(st.st_mtime) != modified:
+            return None
+
+        key = (st.st_dev, st.st_ino, int(st.st_mtime), st.st_size)
+        entry = _maps.get(name)
+        if entry is not None and entry[:4] == key:
+            return entry[4]
+
+        _unmap(name)
+        try:
+            with open(fname, "rb") as f:
+                if os.fstat(f.fileno()).st_ino != st.st_ino:
+                    # replaced in between, the next call maps the new one
+                    return None
+                if not st.st_size:
+                    return b""
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (IOError, OSError):
+            e = sys.exc_info()[1]
+            if e.errno == ENOENT:
+                return None
+            raise
+        _maps[name] = key + (buf,)
+        return buf
+
+
+def get(name, modified=None):
+    """
+    Returns a copy of the value stored for name as a string, see get_buffer
+    to serve it without copying it
+    """
+    buf = get_buffer(name, modified)
+    if buf is None:
+        return None
+    return buf[:].decode('utf-8')
+
+
+def set(name, value, modified=None, user='root', group='root', mode=int('0755', 8)):
+    # pylint: disable=W0622
+    """ Stores value, a string or bytes, for name """
+    if isinstance(value, str):
+        value = value.encode('utf-8')
+    fname = _fname(name)
+    dirname = os.path.dirname(fname)
+    if not os.path.isdir(dirname):
+        makedirs(dirname, mode, user, group)
+
+    fd, tmp_name = tempfile.mkstemp(prefix=".%s." % os.path.basename(fname), dir=dirname)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(value)
+        os.chmod(tmp_name, int('0644', 8))
+        modified = _modified(modified)
+        if modified is not None:
+            os.utime(tmp_name, (modified, modified))
+        setPermsPath(tmp_name, user, group, int('0644', 8))
+        # readers keep the entry they mapped, the new one is seen by the
+        # next lookups
+        os.rename(tmp_name, fname)
+    except:
+        os.unlink(tmp_name)
+        raise
+
+
+def delete(name):
+    with _lock:
+        _unmap(name)
+    try:
+        os.unlink(_fname(name))
+    except OSError:
+        e = sys.exc_info()[1]
+        if e.errno != ENOENT:
+            raise
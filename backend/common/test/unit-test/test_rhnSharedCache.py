@@ -0,0 +1,68 @@
+#!/usr/bin/python
+#
+# Copyright (c) 2021 SUSE LLC
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+
+import shutil
+import sys
+import tempfile
+import unittest
+from spacewalk.common import rhnCache, rhnSharedCache
+
+
+class Tests(unittest.TestCase):
+    # pylint: disable=R0904
+    key = "unit-test-shared"
+
+    def setUp(self):
+        self.cachedir = rhnCache.CACHEDIR
+        rhnCache.CACHEDIR = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(rhnCache.CACHEDIR)
+        rhnCache.CACHEDIR = self.cachedir
+
+    def test_get_set(self):
+        self.assertIsNone(rhnSharedCache.get(self.key))
+        rhnSharedCache.set(self.key, u"<value>é</value>")
+        self.assertEqual(u"<value>é</value>", rhnSharedCache.get(self.key))
+        # served from the same map while the entry is not replaced
+        self.assertIs(rhnSharedCache.get_buffer(self.key), rhnSharedCache.get_buffer(self.key))
+
+    def test_modified(self):
+        rhnSharedCache.set(self.key, "old", modified='20041110001122')
+        self.assertEqual("old", rhnSharedCache.get(self.key, modified='20041110001122'))
+        self.assertIsNone(rhnSharedCache.get(self.key, modified='20051110001122'))
+
+        rhnSharedCache.set(self.key, "new", modified='20051110001122')
+        self.assertEqual("new", rhnSharedCache.get(self.key, modified='20051110001122'))
+        self.assertIsNone(rhnSharedCache.get(self.key, modified='20041110001122'))
+
+    def test_replaced_while_read(self):
+        rhnSharedCache.set(self.key, "old")
+        buf = rhnSharedCache.get_buffer(self.key)
+        rhnSharedCache.set(self.key, "new")
+        self.assertEqual(b"new", rhnSharedCache.get_buffer(self.key)[:])
+        # the buffer handed out before stays readable
+        self.assertEqual(b"old", buf[:])
+        rhnSharedCache.delete(self.key)
+        self.assertEqual(b"old", buf[:])
+
+    def test_delete(self):
+        rhnSharedCache.set(self.key, "value")
+        self.assertEqual("value", rhnSharedCache.get(self.key))
+        rhnSharedCache.delete(self.key)
+        self.assertIsNone(rhnSharedCache.get(self.key))
+        # deleting a missing entry is fine
+        rhnSharedCache.delete(self.key)
+
+
+if __name__ == '__main__':
+    sys.exit(unittest.main() or 0)
@@ -617,6 +617,8 @@ class QueryIterator:
         single result set.
         Params is a list of dictionaries that would fill the named bound variables
         from the statement.
+        The result sets are streamed from the database, so only a few rows are
+        held in memory at a time.
     """
 
     def __init__(self, statement, params):
@@ -624,12 +626,13 @@ class QueryIterator:
         self._params = params
         # Position in the params list
         self._params_pos = -1
-        self._result_set_exhausted = 1
+        # Rows of the current result set
+        self._rows = None
 
     def fetchone_dict(self):
         log_debug(4)
         while 1:
-            if self._result_set_exhausted:
+            if self._rows is None:
                 # Nothing to do here, move to the next set of params
                 pos = self._params_pos
                 pos = pos + 1
@@ -639,17 +642,16 @@ class QueryIterator:
                     return None
                 # Execute the satement
                 log_debug(5, "Using param", pos, self._params[pos])
-                self._statement.execute(**self._params[pos])
-                self._result_set_exhausted = 0
+                self._rows = self._statement.iterate(**self._params[pos])
                 # Go back into the loop
                 continue
 
             # Result set not exhausted yet
-            row = self._statement.fetchone_dict()
+            row = next(self._rows, None)
             if row:
                 return row
 
-            self._result_set_exhausted = 1
+            self._rows = None
 
 
 class CachedQueryIterator:
@@ -17,16 +17,15 @@ import os
 import sys
 import re
 import time
-from threading import Thread, Lock
+from collections import deque, OrderedDict
+from threading import Thread, Lock, Condition
 try:
     #  python 2
     import urlparse
-    from Queue import Queue, Empty
     from urllib import quote
 except ImportError:
     #  python3
     import urllib.parse as urlparse # pylint: disable=F0401,E0611
-    from queue import Queue, Empty
     from urllib.parse import quote
 import pycurl
 from urlgrabber.grabber import URLGrabberOptions, PyCurlFileObject, URLGrabError
@@ -108,10 +107,23 @@ def get_proxies(proxy, user, password):
     return proxies
 
 
+def get_curl_share():
+    """ Returns a share handle for the DNS and SSL session caches or None if
+        pycurl does not support it """
+    # pylint: disable=E1101
+    try:
+        share = pycurl.CurlShare()
+        share.setopt(pycurl.SH_SHARE, pycurl.LOCK_DATA_DNS)
+        share.setopt(pycurl.SH_SHARE, pycurl.LOCK_DATA_SSL_SESSION)
+    except (AttributeError, pycurl.error):
+        return None
+    return share
+
+
 class PyCurlFileObjectThread(PyCurlFileObject):
-    def __init__(self, url, filename, opts, curl_cache, parent):
+    def __init__(self, url, filename, opts, curl_cache, queue):
         self.curl_cache = curl_cache
-        self.parent = parent
+        self.queue = queue
         (url, parts) = opts.urlparser.parse(url, opts)
         (scheme, host, path, parm, query, frag) = parts
         opts.find_proxy(url, scheme)
@@ -125,38 +137,108 @@ class PyCurlFileObjectThread(PyCurlFileObject):
         return self.fo
 
     def _do_perform(self):
-        # WORKAROUND - BZ #1439758 - ensure first item in queue is performed alone to properly setup NSS
-        if not self.parent.first_in_queue_done:
-            self.parent.first_in_queue_lock.acquire()
+        # WORKAROUND - BZ #1439758 - ensure first item in queue is performed alone to properly setup NSS,
+        # the lock is shared by all queues so their first items are not performed at the same time
+        if not self.queue.first_in_queue_done:
+            self.queue.first_in_queue_lock.acquire()
             # If some other thread was faster, no need to block anymore
-            if self.parent.first_in_queue_done:
-                self.parent.first_in_queue_lock.release()
+            if self.queue.first_in_queue_done:
+                self.queue.first_in_queue_lock.release()
         try:
             PyCurlFileObject._do_perform(self)
         finally:
-            if not self.parent.first_in_queue_done:
-                self.parent.first_in_queue_done = True
-                self.parent.first_in_queue_lock.release()
+            if not self.queue.first_in_queue_done:
+                self.queue.first_in_queue_done = True
+                self.queue.first_in_queue_lock.release()
 
     def _set_opts(self, opts=None):
         if not opts:
             opts = {}
         PyCurlFileObject._set_opts(self, opts=opts)
         self.curl_obj.setopt(pycurl.FORBID_REUSE, 0) # pylint: disable=E1101
+        if self.queue.share is not None:
+            self.curl_obj.setopt(pycurl.SHARE, self.queue.share) # pylint: disable=E1101
 
 
 class FailedDownloadError(Exception):
     pass
 
 
+class DownloadQueue:
+    """ Files to download with the same set of SSL certificates, grouped by
+        host, together with the download statistics of the queue """
+
+    def __init__(self, index, ssl_set, first_in_queue_lock):
+        self.index = index
+        self.ssl_set = ssl_set
+        # host -> deque of download params
+        self.hosts = OrderedDict()
+        self.size = 0
+        # WORKAROUND - BZ #1439758 - ensure first item in queue is performed alone to properly setup NSS
+        self.first_in_queue_done = False
+        self.first_in_queue_lock = first_in_queue_lock
+        self.share = None
+        # statistics
+        self.files = 0
+        self.failed = 0
+        self.bytes = 0
+        self.started = None
+        self.finished = None
+
+    @staticmethod
+    def _host(params):
+        if not params['urls']:
+            return None
+        return urlparse.urlsplit(params['urls'][0])[1]
+
+    def put(self, params):
+        host = self._host(params)
+        if host not in self.hosts:
+            self.hosts[host] = deque()
+        self.hosts[host].append(params)
+        self.size += 1
+
+    def get(self, is_host_free):
+        """ Returns (host, params) of the next file whose host is free or
+            None if there is none """
+        for host, items in self.hosts.items():
+            if items and is_host_free(host):
+                self.size -= 1
+                return host, items.popleft()
+        return None
+
+    def qsize(self):
+        return self.size
+
+    def done(self, success, size):
+        self.files += 1
+        if not success:
+            self.failed += 1
+        self.bytes += size
+        self.finished = time.time()
+
+    def log_stats(self):
+        if not self.files:
+            return
+        elapsed = max(self.finished - self.started, 0.001)
+        mib = self.bytes / 1048576.0
+        log(2, "Queue #%d: %d files (%d failed), %.2f MiB in %.2f seconds (%.2f MiB/s)."
+            % (self.index, self.files, self.failed, mib, elapsed, mib / elapsed))
+
+
 class DownloadThread(Thread):
-    def __init__(self, parent, queue):
+    def __init__(self, parent):
         Thread.__init__(self)
         self.parent = parent
-        self.queue = queue
-        # pylint: disable=E1101
-        self.curl = pycurl.Curl()
+        # one curl handle per SSL set keeps connections alive between files
+        self.curls = {}
         self.mirror = 0
+        self.downloaded = 0
+
+    def __get_curl(self, queue):
+        if queue.ssl_set not in self.curls:
+            self.curls[queue.ssl_set] = pycurl.Curl() # pylint: disable=E1101
+        return self.curls[queue.ssl_set]
 
     @staticmethod
     def __is_file_done(local_path=None, file_obj=None, checksum_type=None, checksum=None):
@@ -198,7 +280,7 @@ class DownloadThread(Thread):
         else:
             self.mirror = 0
 
-    def __fetch_url(self, params):
+    def __fetch_url(self, queue, params):
         # Skip existing file if exists and matches checksum
         if not self.parent.force:
             if self.__is_file_done(local_path=params['target_file'], checksum_type=params['checksum_type'],
@@ -225,12 +307,14 @@ class DownloadThread(Thread):
                     query.rstrip('/'), ''))
             try:
                 try:
-                    fo = PyCurlFileObjectThread(url, params['target_file'], opts, self.curl, self.parent)
+                    fo = PyCurlFileObjectThread(url, params['target_file'], opts, self.__get_curl(queue), queue)
                     # Check target file
                     if not self.__is_file_done(file_obj=fo, checksum_type=params['checksum_type'],
                                                checksum=params['checksum']):
                         raise FailedDownloadError("Target file isn't valid. Checksum should be %s (%s)."
                                                   % (params['checksum'], params['checksum_type']))
+                    if os.path.isfile(params['target_file']):
+                        self.downloaded = os.path.getsize(params['target_file'])
                     break
                 except (FailedDownloadError, URLGrabError):
                     e = sys.exc_info()[1]
@@ -260,18 +344,23 @@ class DownloadThread(Thread):
         return True
 
     def run(self):
-        while not self.queue.empty() and self.parent.can_continue():
-            try:
-                params = self.queue.get(block=False)
-            except Empty:
+        while True:
+            task = self.parent.next_task()
+            if task is None:
                 break
+            queue, host, params = task
             self.mirror = 0
-            success = self.__fetch_url(params)
+            self.downloaded = 0
+            success = False
+            try:
+                success = self.__fetch_url(queue, params)
+            finally:
+                self.parent.task_done(queue, host, success, self.downloaded)
             if self.parent.log_obj:
                 # log_obj must be thread-safe
                 self.parent.log_obj.log(success, os.path.basename(params['relative_path']))
-            self.queue.task_done()
-        self.curl.close()
+        for curl in self.curls.values():
+            curl.close()
 
 
 class ThreadedDownloader:
@@ -281,21 +370,30 @@ class ThreadedDownloader:
         initCFG('server.satellite')
         try:
             self.threads = int(CFG.REPOSYNC_DOWNLOAD_THREADS)
+            # 0 means no per host limit
+            self.host_threads = int(CFG.REPOSYNC_DOWNLOAD_HOST_THREADS or 0)
         except ValueError:
             initCFG(comp)
-            raise ValueError("Number of threads expected, found: '%s'" % CFG.REPOSYNC_DOWNLOAD_THREADS)
+            raise ValueError("Number of threads expected, found: '%s', '%s'"
+                             % (CFG.REPOSYNC_DOWNLOAD_THREADS, CFG.REPOSYNC_DOWNLOAD_HOST_THREADS))
         else:
             initCFG(comp)
         if self.threads < 1:
             raise ValueError("Invalid number of threads: %d" % self.threads)
+        if self.host_threads < 0:
+            raise ValueError("Invalid number of threads per host: %d" % self.host_threads)
         self.retries = retries
         self.log_obj = log_obj
         self.force = force
         self.lock = Lock()
-        self.exception = None
-        # WORKAROUND - BZ #1439758 - ensure first item in queue is performed alone to properly setup NSS
-        self.first_in_queue_done = False
+        # guards the queues below and wakes up threads waiting for a free host
+        self.condition = Condition(self.lock)
+        # WORKAROUND - BZ #1439758 - one lock serializes the first download of every queue
         self.first_in_queue_lock = Lock()
+        self.exception = None
+        self.pending = 0
+        self.next_queue = 0
+        self.active_hosts = {}
 
     def set_log_obj(self, log_obj):
         self.log_obj = log_obj
@@ -316,43 +414,83 @@ class ThreadedDownloader:
         ssl_set = (params['ssl_ca_cert'], params['ssl_client_cert'], params['ssl_client_key'])
         if self._validate(ssl_set):
             if ssl_set not in self.queues:
-                self.queues[ssl_set] = Queue()
+                self.queues[ssl_set] = DownloadQueue(len(self.queues), ssl_set, self.first_in_queue_lock)
             queue = self.queues[ssl_set]
             queue.put(params)
 
     def run(self):
-        size = 0
-        for queue in list(self.queues.values()):
-            size += queue.qsize()
+        queues = [queue for queue in self.queues.values() if queue.qsize() > 0]
+        size = sum(queue.qsize() for queue in queues)
         if size <= 0:
             return
-        log(1, "Downloading total %d files from %d queues." % (size, len(self.queues)))
-
-        for index, queue in enumerate(self.queues.values()):
-            log(2, "Downloading %d files from queue #%d." % (queue.qsize(), index))
-            self.first_in_queue_done = False
-            started_threads = []
-            for _ in range(self.threads):
-                thread = DownloadThread(self, queue)
-                thread.setDaemon(True)
-                thread.start()
-                started_threads.append(thread)
-
-            # wait to finish
-            try:
-                while any(t.isAlive() for t in started_threads):
-                    time.sleep(1)
-            except KeyboardInterrupt:
-                e = sys.exc_info()[1]
-                self.fail_download(e)
-                while any(t.isAlive() for t in started_threads):
-                    time.sleep(1)
-                break
+        log(1, "Downloading total %d files from %d queues." % (size, len(queues)))
+        for queue in queues:
+            log(2, "Downloading %d files from queue #%d." % (queue.qsize(), queue.index))
+            queue.share = get_curl_share()
+
+        # all queues are drained at once by one pool of threads
+        self.pending = size
+        self.next_queue = 0
+        self.active_hosts = {}
+        started_threads = []
+        for _ in range(min(self.threads, size)):
+            thread = DownloadThread(self)
+            thread.setDaemon(True)
+            thread.start()
+            started_threads.append(thread)
+
+        # wait to finish
+        try:
+            while any(t.is_alive() for t in started_threads):
+                time.sleep(1)
+        except KeyboardInterrupt:
+            e = sys.exc_info()[1]
+            self.fail_download(e)
+            while any(t.is_alive() for t in started_threads):
+                time.sleep(1)
+
+        for queue in queues:
+            queue.log_stats()
+            if queue.share is not None:
+                queue.share.close()
+                queue.share = None
 
         # raise first detected exception if any
         if self.exception:
             raise self.exception  # pylint: disable=E0702
 
+    def __is_host_free(self, host):
+        return not self.host_threads or self.active_hosts.get(host, 0) < self.host_threads
+
+    def next_task(self):
+        """ Returns (queue, host, params) of the next file to download or None
+            if there is nothing left or the download failed. Queues are
+            served round robin, files of busy hosts are postponed. """
+        queues = list(self.queues.values())
+        with self.condition:
+            while True:
+                if self.exception is not None or self.pending <= 0:
+                    return None
+                for _ in range(len(queues)):
+                    queue = queues[self.next_queue % len(queues)]
+                    self.next_queue = (self.next_queue + 1) % len(queues)
+                    task = queue.get(self.__is_host_free)
+                    if task is not None:
+                        host, params = task
+                        self.pending -= 1
+                        self.active_hosts[host] = self.active_hosts.get(host, 0) + 1
+                        if queue.started is None:
+                            queue.started = time.time()
+                        return queue, host, params
+                # all remaining files are on hosts busy with other threads
+                self.condition.wait(1)
+
+    def task_done(self, queue, host, success, size):
+        with self.condition:
+            self.active_hosts[host] -= 1
+            queue.done(success, size)
+            self.condition.notify_all()
+
     def can_continue(self):
         self.lock.acquire()
         status = self.exception is None
@@ -360,7 +498,7 @@ class ThreadedDownloader:
         return status
 
     def fail_download(self, exception):
-        self.lock.acquire()
-        if not self.exception:
-            self.exception = exception
-        self.lock.release()
+        with self.condition:
+            if not self.exception:
+                self.exception = exception
+            self.condition.notify_all()
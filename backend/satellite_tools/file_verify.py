@@ -0,0 +1,268 @@
+#
+# Copyright (c) 2021 SUSE LLC
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+"""
+Verification of the checksums of files on disk, shared by satellite-sync and
+spacewalk-data-fsck.
+
+The checksums are computed by a pool of processes reading the files through
+mmap (or large reads for small files). Every computed checksum can be
+remembered with the size, mtime and inode of the file in the sync cache
+database, so a file which did not change since is not read again. Such a file
+is trusted: a memo does not notice content corrupted on disk behind an
+unchanged size, mtime and inode.
+"""
+
+import mmap
+import multiprocessing
+import os
+import time
+
+from uyuni.common import checksum as checksum_lib
+from spacewalk.common.rhnConfig import CFG
+from spacewalk.satellite_tools import syncCache
+
+# Error codes of verify(), as returned by Syncer._verify_file before
+VERIFY_OK = 0
+VERIFY_MISSING = 1
+VERIFY_MISMATCH = 2
+
+BUFFER_SIZE = 1024 * 1024
+# Files from this size on are hashed through mmap
+MMAP_THRESHOLD = 4 * 1024 * 1024
+DEFAULT_CACHE_DIR = "/var/cache/rhn/"
+
+
+def file_checksum(abs_path, checksum_type, buffer_size=BUFFER_SIZE):
+    """ Returns the checksum and the size of the file in abs_path """
+    if checksum_type == 'sha':
+        checksum_type = 'sha1'
+    h = checksum_lib.getHashlibInstance(checksum_type, False)
+    with open(abs_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                if hasattr(m, 'madvise'):
+                    m.madvise(mmap.MADV_SEQUENTIAL)
+                h.update(m)
+        else:
+            while True:
+                buf = f.read(buffer_size)
+                if not buf:
+                    break
+                h.update(buf)
+    return h.hexdigest(), size
+
+
+def _checksum_task(task):
+    abs_path, checksum_type = task
+    try:
+        value, size = file_checksum(abs_path, checksum_type)
+    except (IOError, OSError, ValueError) as e:
+        return abs_path, checksum_type, None, 0, str(e)
+    return abs_path, checksum_type, value, size, None
+
+
+def _stat(abs_path):
+    try:
+        return os.stat(abs_path)
+    except OSError:
+        return None
+
+
+class ChecksumMemo:
+
+    """
+    Persistent memo of file checksums, keyed on the path and the checksum type.
+    An entry is only used while the size, mtime and inode of the file are the
+    ones it was computed for, and dropped once the file is gone.
+    """
+
+    _kind = "file-checksums"
+
+    def __init__(self, store):
+        self._store = store
+
+    @staticmethod
+    def _object_id(abs_path, checksum_type):
+        return "%s:%s" % (checksum_type, abs_path)
+
+    @staticmethod
+    def _stamp(stat_info):
+        return "%d:%d:%d" % (stat_info.st_size, stat_info.st_mtime_ns, stat_info.st_ino)
+
+    def get_many(self, files):
+        """
+        files is a list of (abs_path, checksum_type, stat_info). Returns a dict
+        of the checksums known for them, keyed on (abs_path, checksum_type).
+        """
+        ids = dict((self._object_id(abs_path, checksum_type), (abs_path, checksum_type, stat_info))
+                   for abs_path, checksum_type, stat_info in files)
+        result = {}
+        for object_id, value in self._store.get_many(self._kind, list(ids)).items():
+            abs_path, checksum_type, stat_info = ids[object_id]
+            stamp, _sep, value = value.decode('ascii').partition(' ')
+            if stamp == self._stamp(stat_info):
+                result[(abs_path, checksum_type)] = value
+        return result
+
+    def delete_many(self, files):
+        """ Forgets files, a list of (abs_path, checksum_type) """
+        self._store.delete_many(self._kind, [self._object_id(abs_path, checksum_type)
+                                             for abs_path, checksum_type in files])
+
+    def set_many(self, entries):
+        """ Stores entries, a list of (abs_path, checksum_type, stat_info, checksum) """
+        self._store.set_many(self._kind, [
+            (self._object_id(abs_path, checksum_type), None,
+             ("%s %s" % (self._stamp(stat_info), value)).encode('ascii'))
+            for abs_path, checksum_type, stat_info, value in entries])
+
+
+def get_memo():
+    """ Returns the memo kept in the sync cache database """
+    cache_dir = CFG.get('sync_cache_dir') or DEFAULT_CACHE_DIR
+    return ChecksumMemo(syncCache.get_store(os.path.join(cache_dir, "satsync", "cache.db")))
+
+
+class FileVerifier:
+
+    """
+    Computes and verifies the checksums of files with a pool of `processes`
+    processes (by default one per CPU). memo is the ChecksumMemo to use,
+    None to always compute the checksums.
+    """
+
+    def __init__(self, processes=None, memo=None):
+        self.processes = processes or os.cpu_count() or 1
+        self.memo = memo
+        self._pool = None
+        # statistics
+        self.files = 0
+        self.memo_hits = 0
+        self.hashed = 0
+        self.hashed_bytes = 0
+        self.hash_time = 0.0
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(self.processes)
+        return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _forget(self, files):
+        # files which are gone do not keep their memo entries
+        if self.memo is not None and files:
+            self.memo.delete_many(files)
+
+    def checksums(self, files):
+        """
+        files is an iterable of (abs_path, checksum_type). Returns a dict keyed
+        on them with the checksum of each file, or None for the files which
+        are missing or cannot be read.
+        """
+        files = set(files)
+        self.files += len(files)
+        result = {}
+        present = []
+        for abs_path, checksum_type in files:
+            stat_info = _stat(abs_path)
+            if stat_info is None:
+                result[(abs_path, checksum_type)] = None
+            else:
+                present.append((abs_path, checksum_type, stat_info))
+
+        self._forget([f for f, value in result.items() if value is None])
+        if self.memo is not None and present:
+            known = self.memo.get_many(present)
+            self.memo_hits += len(known)
+            result.update(known)
+            present = [f for f in present if (f[0], f[1]) not in known]
+        if not present:
+            return result
+
+        start = time.time()
+        if len(present) == 1 or self.processes == 1:
+            computed = [_checksum_task(f[:2]) for f in present]
+        else:
+            computed = self._get_pool().imap_unordered(
+                _checksum_task, [f[:2] for f in present],
+                chunksize=max(1, min(16, len(present) // (self.processes * 4))))
+        stat_infos = dict(((f[0], f[1]), f[2]) for f in present)
+        memo_entries = []
+        for abs_path, checksum_type, value, size, _error in computed:
+            result[(abs_path, checksum_type)] = value
+            if value is None:
+                continue
+            self.hashed += 1
+            self.hashed_bytes += size
+            memo_entries.append((abs_path, checksum_type, stat_infos[(abs_path, checksum_type)], value))
+        self.hash_time += time.time() - start
+
+        if self.memo is not None and memo_entries:
+            self.memo.set_many(memo_entries)
+        return result
+
+    def verify(self, files, set_mtime=True):
+        """
+        files is an iterable of (abs_path, mtime, size, checksum_type, checksum).
+        A file with the expected mtime and size is assumed to be fine, the
+        checksum of the others is verified; with set_mtime a file with the
+        expected checksum gets the expected mtime.
+        Returns a dict of VERIFY_* error codes keyed on abs_path.
+        """
+        result = {}
+        to_check = {}
+        missing = []
+        for abs_path, mtime, size, checksum_type, value in files:
+            stat_info = _stat(abs_path)
+            if stat_info is None:
+                result[abs_path] = VERIFY_MISSING
+                missing.append((abs_path, checksum_type))
+            elif int(stat_info.st_mtime) == mtime and stat_info.st_size == size:
+                # Same mtime, and size, assume identity
+                result[abs_path] = VERIFY_OK
+            else:
+                to_check[abs_path] = (mtime, checksum_type, value)
+        self._forget(missing)
+
+        computed = self.checksums((abs_path, checksum_type)
+                                  for abs_path, (_mtime, checksum_type, _value) in to_check.items())
+        for abs_path, (mtime, checksum_type, value) in to_check.items():
+            l_checksum = computed[(abs_path, checksum_type)]
+            if l_checksum is None:
+                result[abs_path] = VERIFY_MISSING
+            elif l_checksum != value:
+                result[abs_path] = VERIFY_MISMATCH
+            else:
+                if set_mtime:
+                    os.utime(abs_path, (mtime, mtime))
+                result[abs_path] = VERIFY_OK
+        return result
+
+    def report(self):
+        """ Returns a summary of the work done """
+        rate = 0.0
+        if self.hash_time:
+            rate = self.hashed_bytes / self.hash_time / 1024 / 1024
+        return ("%d files checked: %d checksums computed (%.1f MiB in %.1fs, %.1f MiB/s, %d processes), "
+                "%d checksums taken from the memo" % (self.files, self.hashed, self.hashed_bytes / 1024.0 / 1024,
+                                                      self.hash_time, rate, self.processes, self.memo_hits))
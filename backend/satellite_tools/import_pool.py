@@ -0,0 +1,290 @@
+#
+# Copyright (c) 2021 SUSE LLC
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+"""
+Long-lived pool of worker processes for importing packages.
+
+Unlike multiprocessing.Pool(maxtasksperchild=1) a worker survives its task,
+so whatever its initializer sets up (e.g. a database connection) is reused
+by the next tasks. A worker is replaced only when its resident memory grows
+over a limit after a task, or when it dies.
+
+The pool hands every task to an idle worker through a queue of its own and
+remembers which worker got it, so a task is never out of the pool without
+being recorded: when a worker exits or dies before it started the task, the
+task goes back to the pool for another worker. Every worker also sends its
+results through a pipe of its own, so a worker killed while sending does not
+hold a lock the other workers need.
+"""
+
+import os
+import pickle
+import sys
+import threading
+import multiprocessing
+import multiprocessing.connection
+from collections import deque
+
+from spacewalk.satellite_tools.syncLib import log2disk
+
+
+def get_rss():
+    """ Returns the resident set size of this process in bytes """
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (IOError, OSError, ValueError, IndexError):
+        import resource
+        # peak instead of current usage, in kilobytes
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class WorkerDiedError(Exception):
+    pass
+
+
+class AsyncResult:
+    """ Result of a task submitted with ImportWorkerPool.apply_async """
+
+    def __init__(self, callback=None, error_callback=None):
+        self._event = threading.Event()
+        self._callback = callback
+        self._error_callback = error_callback
+        self._success = None
+        self._value = None
+
+    def _set(self, success, value):
+        self._success = success
+        self._value = value
+        if success and self._callback:
+            self._callback(value)
+        elif not success and self._error_callback:
+            self._error_callback(value)
+        self._event.set()
+
+    def ready(self):
+        return self._event.is_set()
+
+    def wait(self, timeout=None):
+        self._event.wait(timeout)
+
+    def get(self):
+        self._event.wait()
+        if not self._success:
+            raise self._value
+        return self._value
+
+
+def _worker(tasks, results, current_task, initializer, initargs, max_rss):
+    if initializer is not None:
+        initializer(*initargs)
+    pid = os.getpid()
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        task_id, func, args = task
+        # shared memory, unlike a message it is seen even if the worker dies right away;
+        # the pool retries the task of a worker which died before setting it
+        current_task.value = task_id
+        try:
+            result = (True, func(*args))
+        except Exception: # pylint: disable=W0703
+            result = (False, sys.exc_info()[1])
+        try:
+            # a result which cannot be sent fails the task, not the worker
+            pickle.dumps(result[1])
+        except Exception: # pylint: disable=W0703
+            result = (False, Exception("Unable to return the result: %s" % sys.exc_info()[1]))
+        results.send(('done', pid, task_id) + result)
+        current_task.value = -1
+
+        rss = get_rss()
+        if max_rss and rss > max_rss:
+            results.send(('exit', pid, rss))
+            break
+
+
+class _Worker:
+    """ A worker process, its pipes and the task the pool handed to it """
+
+    def __init__(self, process, tasks, results, current_task):
+        self.process = process
+        self.tasks = tasks
+        self.results = results
+        # shared id of the task the worker started or -1
+        self.current_task = current_task
+        # (task_id, func, args) handed to the worker and not done yet
+        self.task = None
+        self.stopping = False
+
+
+class ImportWorkerPool:
+    """ Pool of processes, each running initializer(*initargs) once and then
+        the submitted tasks. A worker whose RSS is above max_rss bytes after a
+        task is replaced by a new one, 0 means no limit. """
+
+    def __init__(self, processes, initializer=None, initargs=(), max_rss=0):
+        self.initializer = initializer
+        self.initargs = initargs
+        self.max_rss = max_rss
+        self._lock = threading.Lock()
+        # pid -> _Worker
+        self._workers = {}
+        # tasks not handed to a worker yet
+        self._backlog = deque()
+        # task id -> AsyncResult
+        self._pending = {}
+        self._next_task_id = 0
+        self._closing = False
+        self._terminated = False
+        with self._lock:
+            for _ in range(processes):
+                self._start_worker()
+        self._handler = threading.Thread(target=self._handle_results)
+        self._handler.daemon = True
+        self._handler.start()
+
+    def _start_worker(self):
+        tasks = multiprocessing.Queue()
+        results, worker_results = multiprocessing.Pipe(duplex=False)
+        current_task = multiprocessing.Value('q', -1, lock=False)
+        process = multiprocessing.Process(target=_worker, args=(tasks, worker_results, current_task,
+                                                                self.initializer, self.initargs, self.max_rss))
+        process.daemon = True
+        process.start()
+        # only the worker writes, its pipe ends when it exits
+        worker_results.close()
+        self._workers[process.pid] = _Worker(process, tasks, results, current_task)
+        self._dispatch()
+
+    def _dispatch(self):
+        """ Hands the waiting tasks to the idle workers, called with the lock held """
+        for worker in self._workers.values():
+            if worker.task is not None or worker.stopping:
+                continue
+            if self._backlog:
+                worker.task = self._backlog.popleft()
+                worker.tasks.put(worker.task)
+            elif self._closing:
+                worker.stopping = True
+                worker.tasks.put(None)
+
+    def _retire(self, pid):
+        """ Forgets a worker which exited or died and replaces it if there is
+            still work to do, called with the lock held """
+        worker = self._workers.pop(pid)
+        # what the worker sent before it ended
+        try:
+            while worker.results.poll():
+                self._handle_message(worker.results.recv())
+        except (EOFError, OSError):
+            pass
+        worker.results.close()
+        # nobody reads what is left in the queue of the worker
+        worker.tasks.cancel_join_thread()
+        worker.tasks.close()
+        if worker.task is not None:
+            task_id = worker.task[0]
+            if worker.current_task.value == task_id:
+                result = self._pending.pop(task_id, None)
+                if result is not None:
+                    result._set(False, WorkerDiedError("Import worker %d died with exit code %s"
+                                                       % (pid, worker.process.exitcode)))
+            else:
+                # the worker did not start the task
+                self._backlog.appendleft(worker.task)
+        if not self._terminated and (not self._closing or self._backlog):
+            self._start_worker()
+
+    def apply_async(self, func, args=(), callback=None, error_callback=None):
+        result = AsyncResult(callback, error_callback)
+        with self._lock:
+            if self._closing:
+                raise ValueError("Pool is closed")
+            task_id = self._next_task_id
+            self._next_task_id += 1
+            self._pending[task_id] = result
+            self._backlog.append((task_id, func, args))
+            self._dispatch()
+        return result
+
+    def _handle_results(self):
+        while True:
+            with self._lock:
+                if self._closing and not self._workers:
+                    return
+                pids = dict((worker.results, pid) for pid, worker in self._workers.items())
+            ready = multiprocessing.connection.wait(list(pids), timeout=1)
+            if not ready:
+                self._check_workers()
+                continue
+            with self._lock:
+                for connection in ready:
+                    pid = pids[connection]
+                    if pid not in self._workers:
+                        continue
+                    try:
+                        message = connection.recv()
+                    except (EOFError, OSError):
+                        # the worker exited
+                        self._workers[pid].process.join()
+                        self._retire(pid)
+                        continue
+                    self._handle_message(message)
+
+    def _handle_message(self, message):
+        """ Handles a message of a worker, called with the lock held """
+        kind, pid = message[0], message[1]
+        if kind == 'done':
+            result = self._pending.pop(message[2], None)
+            if result is not None:
+                result._set(message[3], message[4])
+            worker = self._workers.get(pid)
+            if worker is not None and worker.task is not None and worker.task[0] == message[2]:
+                worker.task = None
+            self._dispatch()
+        elif kind == 'exit':
+            log2disk(1, "Import worker %d uses %d MiB of memory, replacing it." % (pid, message[2] >> 20))
+            # otherwise the pool already found it dead and replaced it
+            if pid in self._workers:
+                self._workers[pid].process.join()
+                self._retire(pid)
+
+    def _check_workers(self):
+        """ Fails the task of a worker which died and replaces the worker """
+        with self._lock:
+            for pid, worker in list(self._workers.items()):
+                if not worker.process.is_alive():
+                    self._retire(pid)
+
+    def close(self):
+        """ Lets the workers finish the submitted tasks and waits for them """
+        with self._lock:
+            self._closing = True
+            self._dispatch()
+        self._handler.join()
+
+    def terminate(self):
+        """ Stops the workers right away, unfinished tasks fail """
+        with self._lock:
+            self._closing = True
+            self._terminated = True
+            self._backlog.clear()
+            workers = [worker.process for worker in self._workers.values()]
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.join()
+        self._handler.join()
+        with self._lock:
+            for result in self._pending.values():
+                result._set(False, WorkerDiedError("Import pool was terminated"))
+            self._pending = {}
@@ -43,9 +43,17 @@ except ImportError:
 RETRIES = 10
 RETRY_DELAY = 1
 FORMAT_PRIORITY = ['.xz', '.gz', '']
+# Characters of the decompressed Packages index parsed at once
+PACKAGES_CHUNK_SIZE = 1024 * 1024
+# Fields of a Packages index stanza reposync needs, all other lines are skipped
+PACKAGES_FIELDS_RE = re.compile(r'^(Package|Architecture|Version|Filename|SHA256|SHA1|MD5sum): ([^\n]*)$',
+                                re.MULTILINE)
+CHECKSUM_FIELDS = (('SHA256', 'sha256'), ('SHA1', 'sha1'), ('MD5sum', 'md5'))
 
 
 class DebPackage:
+    __slots__ = ('name', 'epoch', 'version', 'release', 'arch', 'relativepath', 'checksum_type', 'checksum')
+
     def __init__(self):
         self.name = None
         self.epoch = None
@@ -171,9 +179,14 @@ class DebRepo:
         return ''
 
     def get_package_list(self):
+        return list(self.iter_packages())
+
+    def iter_packages(self):
+        """
+        Download the Packages index and yield a DebPackage for every complete
+        package in it, while the index is decompressed and parsed incrementally.
+        """
         decompressed = None
-        packages_raw = []
-        to_return = []
 
         for extension in FORMAT_PRIORITY:
             scheme, netloc, path, query, fragid = urlparse.urlsplit(self.url)
@@ -189,59 +202,76 @@ class DebRepo:
                 break
 
         if decompressed:
-            for pkg in decompressed.read().split("\n\n"):
-                packages_raw.append(pkg)
-            decompressed.close()
+            try:
+                for package in parse_packages_index(decompressed):
+                    yield package
+            finally:
+                decompressed.close()
         else:
             print("ERROR: Download of package list failed.")
 
-        # Parse and format package metadata
-        for chunk in packages_raw:
-            package = DebPackage()
-            package.epoch = ""
-            lines = chunk.split("\n")
-            checksums = {}
-            for line in lines:
-                pair = line.split(" ", 1)
-                if pair[0] == "Package:":
-                    package.name = pair[1]
-                elif pair[0] == "Architecture:":
-                    package.arch = pair[1] + '-deb'
-                elif pair[0] == "Version:":
-                    package['epoch'] = ''
-                    version = pair[1]
-                    if version.find(':') != -1:
-                        package['epoch'], version = version.split(':')
-                    if version.find('-') != -1:
-                        tmp = version.split('-')
-                        package['version'] = '-'.join(tmp[:-1])
-                        package['release'] = tmp[-1]
-                    else:
-                        package['version'] = version
-                        package['release'] = 'X'
-                elif pair[0] == "Filename:":
-                    package.relativepath = pair[1]
-                elif pair[0] == "SHA256:":
-                    checksums['sha256'] = pair[1]
-                elif pair[0] == "SHA1:":
-                    checksums['sha1'] = pair[1]
-                elif pair[0] == "MD5sum:":
-                    checksums['md5'] = pair[1]
-
-            # Pick best available checksum
-            if 'sha256' in checksums:
-                package.checksum_type = 'sha256'
-                package.checksum = checksums['sha256']
-            elif 'sha1' in checksums:
-                package.checksum_type = 'sha1'
-                package.checksum = checksums['sha1']
-            elif 'md5' in checksums:
-                package.checksum_type = 'md5'
-                package.checksum = checksums['md5']
-
-            if package.is_populated():
-                to_return.append(package)
-        return to_return
+
+def parse_packages_index(stream, chunk_size=PACKAGES_CHUNK_SIZE):
+    """
+    Parse a Debian Packages index from a text stream.
+
+    The stream is read in chunks, so only one chunk of the index is in memory,
+    and every stanza is matched against the needed fields with one regular
+    expression instead of being split line by line.
+
+    :param stream: text stream of the decompressed index
+    :param chunk_size: number of characters read at once
+    :return: generator of populated DebPackage objects
+    """
+    rest = ''
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        stanzas = (rest + chunk).split("\n\n")
+        # the last stanza may continue in the next chunk
+        rest = stanzas.pop()
+        for stanza in stanzas:
+            package = _parse_packages_stanza(stanza)
+            if package is not None:
+                yield package
+    if rest:
+        package = _parse_packages_stanza(rest)
+        if package is not None:
+            yield package
+
+
+def _parse_packages_stanza(stanza):
+    fields = dict(PACKAGES_FIELDS_RE.findall(stanza))
+    if 'Package' not in fields:
+        return None
+
+    package = DebPackage()
+    package.name = fields['Package']
+    package.epoch = ''
+    if 'Architecture' in fields:
+        package.arch = fields['Architecture'] + '-deb'
+    if 'Version' in fields:
+        version = fields['Version']
+        if ':' in version:
+            package.epoch, version = version.split(':', 1)
+        if '-' in version:
+            package.version, package.release = version.rsplit('-', 1)
+        else:
+            package.version = version
+            package.release = 'X'
+    package.relativepath = fields.get('Filename')
+
+    # Pick best available checksum
+    for field, checksum_type in CHECKSUM_FIELDS:
+        if field in fields:
+            package.checksum_type = checksum_type
+            package.checksum = fields[field]
+            break
+
+    if package.is_populated():
+        return package
+    return None
 
 
 class ContentSource:
@@ -303,15 +333,19 @@ class ContentSource:
     def list_packages(self, filters, latest):
         """ list packages"""
 
-        pkglist = self.repo.get_package_list()
-        self.num_packages = len(pkglist)
         if latest:
+            # keep only the latest packages while the index is parsed
             latest_pkgs = {}
-            for pkg in pkglist:
+            self.num_packages = 0
+            for pkg in self.repo.iter_packages():
+                self.num_packages += 1
                 ident = '{}.{}'.format(pkg.name, pkg.arch)
-                if ident not in latest_pkgs.keys() or LooseVersion(pkg.evr()) > LooseVersion(latest_pkgs[ident].evr()):
+                if ident not in latest_pkgs or LooseVersion(pkg.evr()) > LooseVersion(latest_pkgs[ident].evr()):
                     latest_pkgs[ident] = pkg
             pkglist = list(latest_pkgs.values())
+        else:
+            pkglist = self.repo.get_package_list()
+            self.num_packages = len(pkglist)
         pkglist.sort(key = cmp_to_key(self._sort_packages))
 
         if not filters:
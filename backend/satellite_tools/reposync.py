@@ -36,7 +36,13 @@ import gzip
 from dateutil.tz import tzutc
 import gettext
 import errno
-import multiprocessing
+import threading
+try:
+    #  python 2
+    from Queue import Queue, Full
+except ImportError:
+    #  python3
+    from queue import Queue, Full
 
 from rhn.connections import idn_puny_to_unicode
 
@@ -52,10 +58,10 @@ from uyuni.common.checksum import getFileChecksum
 from spacewalk.common.rhnConfig import CFG, initCFG
 from spacewalk.common.rhnException import rhnFault
 from spacewalk.server.importlib import importLib, mpmSource, packageImport, errataCache
-from spacewalk.server.importlib.packageImport import ChannelPackageSubscription
 from spacewalk.server.importlib.backendOracle import SQLBackend
 from spacewalk.server.importlib.errataImport import ErrataImport
 from spacewalk.satellite_tools.download import ThreadedDownloader, ProgressBarLogger, TextLogger
+from spacewalk.satellite_tools.import_pool import ImportWorkerPool
 from spacewalk.satellite_tools.repo_plugins import CACHE_DIR
 from spacewalk.satellite_tools.repo_plugins import yum_src
 from spacewalk.server import taskomatic, rhnPackageUpload
@@ -76,6 +82,41 @@ relative_mediaproducts_dir = 'suse/media.1'
 checksum_cache_filename = 'reposync/checksum_cache'
 default_import_batch_size = 20
 
+# Import workers shared by all channels synced by this process
+_import_pool = None
+# Per worker process: SQL backend and prepared statements for its connection
+_import_worker_state = {}
+
+
+def _init_import_worker():
+    # the connection of the parent process must not be used by the worker
+    rhnSQL.closeDB(committing=False, closing=False)
+    rhnSQL.initDB()
+    _import_worker_state['backend'] = SQLBackend()
+    _import_worker_state['delete_package_queue'] = rhnSQL.prepare(
+        """delete from rhnPackageFileDeleteQueue where path = :path""")
+
+
+def get_import_pool():
+    """Returns the pool of import workers, started on first use"""
+    global _import_pool
+    if _import_pool is None:
+        max_rss = int(CFG.REPOSYNC_IMPORT_WORKER_MAX_RSS or 0) * 1024 * 1024
+        _import_pool = ImportWorkerPool(min(os.cpu_count() * 2, 32), initializer=_init_import_worker,
+                                        max_rss=max_rss)
+    return _import_pool
+
+
+def close_import_pool(terminate=False):
+    """Stops the import workers, the next get_import_pool() starts new ones"""
+    global _import_pool
+    if _import_pool is not None:
+        if terminate:
+            _import_pool.terminate()
+        else:
+            _import_pool.close()
+        _import_pool = None
+
 errata_typemap = {
     'security': 'Security Advisory',
     'recommended': 'Bug Fix Advisory',
@@ -419,6 +460,8 @@ class RepoSync(object):
             log_level = 0
         CFG.set('DEBUG', log_level)
         rhnLog.initLOG(log_path, log_level)
+        self.log_path = log_path
+        self.log_level = log_level
         # os.fchown isn't in 2.4 :/
         os.system("chgrp " + APACHE_GROUP + " " + log_path)
 
@@ -642,21 +685,9 @@ class RepoSync(object):
         # In strict mode unlink all packages from channel which are not synced from current repositories
         if self.strict and sync_error == 0:
             if not self.no_packages:
-                channel_packages = rhnSQL.fetchall_dict("""
-                    select p.id, ct.label as checksum_type, c.checksum
-                    from rhnChannelPackage cp,
-                         rhnPackage p,
-                         rhnChecksumType ct,
-                         rhnChecksum c
-                    where cp.channel_id = :channel_id
-                      and cp.package_id = p.id
-                      and p.checksum_id = c.id
-                      and c.checksum_type_id = ct.id
-                    """, channel_id=int(self.channel['id'])) or []
-                for package in channel_packages:
-                    if (package['checksum_type'], package['checksum']) not in self.all_packages:
-                        self.disassociate_package(package['checksum_type'], package['checksum'])
-                        self.regen = True
+                added, removed = self.update_channel_packages(keep_only=self.all_packages)
+                if removed:
+                    self.regen = True
 
             # For custom channels unlink also errata
             if not self.no_errata and self.channel['org_id']:
@@ -995,6 +1026,10 @@ class RepoSync(object):
             log(0, "    Packages passed filter rules: %5d" % num_passed)
         channel_id = int(self.channel['id'])
 
+        start_time = time.time()
+        db_packages = self._lookup_db_packages(
+            [pack for pack in packages if pack.arch in self.arches], channel_id)
+
         for pack in packages:
             if pack.arch not in self.arches:
                 # skip packages with incompatible architecture
@@ -1006,9 +1041,8 @@ class RepoSync(object):
             ident = "%s-%s%s-%s.%s" % (pack.name, epoch, pack.version, pack.release, pack.arch)
             self.available_packages[ident] = 1
 
-            packs = rhnPackage.get_info_for_package(
-                [pack.name, pack.version, pack.release, pack.epoch, pack.arch],
-                channel_id, self.org_id)
+            packs = db_packages.get(rhnPackage.package_info_key(
+                pack.name, pack.version, pack.release, pack.epoch, pack.arch), [])
             db_pack = None
             for p in packs:
                 if p['checksum'] == pack.checksum:
@@ -1049,6 +1083,8 @@ class RepoSync(object):
                     to_link = False
                 to_process.append((pack, to_download, to_link))
 
+        log2disk(0, "    Packages classified in %.2f seconds" % (time.time() - start_time))
+
         num_to_process = len(to_process)
         if num_to_process == 0:
             log(0, "    No new packages to sync.")
@@ -1061,79 +1097,179 @@ class RepoSync(object):
             log(0, "    Packages already synced:      %5d" % (num_passed - num_to_process))
             log(0, "    Packages to sync:             %5d" % num_to_process)
 
-        downloader = ThreadedDownloader()
-        to_download_count = 0
-        for what in to_process:
-            pack, to_download, to_link = what
-            if to_download:
-                target_file = os.path.join(plug.repo.pkgdir, pack.checksum, os.path.basename(pack.unique_id.relativepath))
-                pack.path = target_file
-                params = {}
-                checksum_type = pack.checksum_type
-                checksum = pack.checksum
-                plug.set_download_parameters(params, pack.unique_id.relativepath, target_file,
-                                             checksum_type=checksum_type, checksum_value=checksum)
-                downloader.add(params)
-                to_download_count += 1
+        to_download_count = sum(1 for (pack, to_download, to_link) in to_process if to_download)
         if num_to_process != 0:
             log(0, "    New packages to download:     %5d" % to_download_count)
             log2(0, 0, "  Downloading packages:")
         logger = TextLogger(None, to_download_count)
-        downloader.set_log_obj(logger)
-        downloader.run()
 
-        log2background(0, "Importing packages started.")
-        log(0, '')
-        log(0, '  Importing packages to DB:')
+        if int(CFG.REPOSYNC_PIPELINE or 0):
+            affected_channels, failed_packages = self._download_and_import_packages(
+                plug, to_process, to_disassociate, is_non_local_repo, logger)
+        else:
+            downloader = ThreadedDownloader()
+            for (pack, to_download, to_link) in to_process:
+                if to_download:
+                    downloader.add(self._package_download_params(plug, pack))
+            downloader.set_log_obj(logger)
+            downloader.run()
 
-        twisted_batch_indexes = self.twisted_batch_indexes(len(to_process), self.import_batch_size)
-        to_process_batches = [[to_process[twisted_index] for twisted_index in twisted_batch] for twisted_batch in twisted_batch_indexes]
+            log2background(0, "Importing packages started.")
+            log(0, '')
+            log(0, '  Importing packages to DB:')
 
-        affected_channels = []
-        with multiprocessing.Pool(processes=min(os.cpu_count() * 2, 32), maxtasksperchild=1) as pool:
-            results = [pool.apply_async(self.import_package_batch, args=[to_process_batch, to_disassociate, is_non_local_repo, i, len(to_process_batches)])
-                       for i, to_process_batch in enumerate(to_process_batches)]
-
-            for i, result in enumerate(results):
-                affected_channels_batch, failed_packages_batch, all_packages, processed_batch = result.get()
-                affected_channels += affected_channels_batch
-                failed_packages += failed_packages_batch
-                self.all_packages.update(all_packages)
-                for j, processed in enumerate(processed_batch):
-                    to_process[twisted_batch_indexes[i][j]] = processed
+            twisted_batch_indexes = self.twisted_batch_indexes(len(to_process), self.import_batch_size)
+            affected_channels, failed_packages = self._import_package_batches(
+                to_process, twisted_batch_indexes, to_disassociate, is_non_local_repo)
 
         if affected_channels:
             errataCache.schedule_errata_cache_update(affected_channels)
         log2background(0, "Importing packages finished.")
 
-        # Disassociate packages
-        for (checksum_type, checksum) in to_disassociate:
-            if to_disassociate[(checksum_type, checksum)]:
-                self.disassociate_package(checksum_type, checksum)
-        # Do not re-link if nothing was marked to link
-        if any([to_link for (pack, to_download, to_link) in to_process]):
+        # Disassociate packages replaced by a different package with the same NVREA
+        to_unlink = [checksum for checksum, unlink in to_disassociate.items() if unlink]
+        to_link = [self._channel_package_key(pack) for (pack, to_download, to_link) in to_process if to_link]
+        if to_link or to_unlink:
             log(0, '')
             log(0, "  Linking packages to the channel.")
-            # Packages to append to channel
-            import_batches = list(self.chunks(
-                [self.associate_package(pack) for (pack, to_download, to_link) in to_process if to_link],
-                1000))
-            count = 0
-            for import_batch in import_batches:
-                backend = SQLBackend()
-                caller = "server.app.yumreposync"
-                importer = ChannelPackageSubscription(import_batch,
-                                                      backend, caller=caller, repogen=False)
-                importer.run()
-                backend.commit()
-                del importer.batch
-                count += len(import_batch)
-                log(0, "    {} packages linked".format(count))
-            self.regen = True
-            self.regenerate_bootstrap_repo = True
+            added, removed = self.update_channel_packages(link=to_link, unlink=to_unlink)
+            if to_link:
+                self.regen = True
+                self.regenerate_bootstrap_repo = True
+            elif removed:
+                self.regen = True
         self._normalize_orphan_vendor_packages()
         return failed_packages
 
+    @staticmethod
+    def _package_download_params(plug, pack):
+        target_file = os.path.join(plug.repo.pkgdir, pack.checksum, os.path.basename(pack.unique_id.relativepath))
+        pack.path = target_file
+        params = {}
+        plug.set_download_parameters(params, pack.unique_id.relativepath, target_file,
+                                     checksum_type=pack.checksum_type, checksum_value=pack.checksum)
+        return params
+
+    def _import_package_batches(self, to_process, batch_indexes, to_disassociate, is_non_local_repo):
+        """Imports the packages of to_process in batches of indexes into to_process, in a pool of processes.
+        Returns the affected channels and the number of failed packages."""
+        to_process_batches = [[to_process[index] for index in batch] for batch in batch_indexes]
+
+        affected_channels = []
+        failed_packages = 0
+        pool = get_import_pool()
+        try:
+            results = [pool.apply_async(self.import_package_batch, args=[to_process_batch, to_disassociate, is_non_local_repo, i, len(to_process_batches)])
+                       for i, to_process_batch in enumerate(to_process_batches)]
+
+            for i, result in enumerate(results):
+                failed_packages += self._merge_import_result(to_process, batch_indexes[i], result.get(),
+                                                             affected_channels)
+        except BaseException:
+            # do not leave batches of this channel running
+            close_import_pool(terminate=True)
+            raise
+        return affected_channels, failed_packages
+
+    def _merge_import_result(self, to_process, batch_indexes, result, affected_channels):
+        affected_channels_batch, failed_packages_batch, all_packages, processed_batch = result
+        affected_channels += affected_channels_batch
+        self.all_packages.update(all_packages)
+        for j, processed in enumerate(processed_batch):
+            to_process[batch_indexes[j]] = processed
+        return failed_packages_batch
+
+    def _download_and_import_packages(self, plug, to_process, to_disassociate, is_non_local_repo, logger):
+        """Downloads to_process in batches of import_batch_size packages and hands every batch over to the
+        import pool as soon as its downloads are finished, while the next batches are being downloaded.
+        Downloads wait while reposync_max_staged_packages packages are downloaded but not imported yet.
+        Returns the affected channels and the number of failed packages."""
+        log2background(0, "Downloading and importing packages started.")
+        batch_indexes = [list(range(start, min(start + self.import_batch_size, len(to_process))))
+                         for start in range(0, len(to_process), self.import_batch_size)]
+        max_staged_batches = max(1, int(CFG.REPOSYNC_MAX_STAGED_PACKAGES or 0) // self.import_batch_size)
+
+        # create the downloaders here, their constructor switches the CFG component
+        downloaders = []
+        for batch in batch_indexes:
+            downloader = ThreadedDownloader()
+            downloader.set_log_obj(logger)
+            for index in batch:
+                pack, to_download, _ = to_process[index]
+                if to_download:
+                    downloader.add(self._package_download_params(plug, pack))
+            downloaders.append(downloader)
+
+        # a batch holds its slot from the start of its download until its import is done
+        staged = threading.BoundedSemaphore(max_staged_batches)
+        downloaded = Queue(max_staged_batches)
+        stop = threading.Event()
+
+        # the download thread waits with a timeout to notice when the imports stopped
+        def wait_for_slot():
+            while not stop.is_set():
+                if staged.acquire(timeout=1):
+                    return True
+            return False
+
+        def hand_over(item):
+            while not stop.is_set():
+                try:
+                    downloaded.put(item, timeout=1)
+                    return True
+                except Full:
+                    pass
+            return False
+
+        def download_batches():
+            try:
+                for i, downloader in enumerate(downloaders):
+                    if not wait_for_slot():
+                        return
+                    downloader.run()
+                    if not hand_over(i):
+                        return
+            except Exception: # pylint: disable=W0703
+                hand_over(sys.exc_info()[1])
+            finally:
+                hand_over(None)
+
+        def import_finished(_):
+            staged.release()
+
+        affected_channels = []
+        failed_packages = 0
+        pool = get_import_pool()
+        download_thread = threading.Thread(target=download_batches)
+        download_thread.daemon = True
+        download_thread.start()
+        results = []
+        try:
+            while True:
+                i = downloaded.get()
+                if i is None:
+                    break
+                if isinstance(i, Exception):
+                    raise i
+                to_process_batch = [to_process[index] for index in batch_indexes[i]]
+                results.append((i, pool.apply_async(
+                    self.import_package_batch,
+                    args=[to_process_batch, to_disassociate, is_non_local_repo, i, len(batch_indexes)],
+                    callback=import_finished, error_callback=import_finished)))
+
+            for i, result in results:
+                failed_packages += self._merge_import_result(to_process, batch_indexes[i], result.get(),
+                                                             affected_channels)
+        except BaseException:
+            # do not leave batches of this channel running
+            close_import_pool(terminate=True)
+            raise
+        finally:
+            # the download thread ends after the batch it is downloading
+            stop.set()
+            download_thread.join()
+        return affected_channels, failed_packages
+
     def twisted_batch_indexes(self, total_size, batch_size):
         """Assume a list of total_size elements, and consider the following two possible divisions of its elements: per "batch" or per "chunk".
         Batches are contiguous sub-lists of the original list with batch_size elements each (and there's batch_count=total_size/batch_size of them).
@@ -1174,11 +1310,22 @@ class RepoSync(object):
         return batch_count * element_index + batch_index
 
     def import_package_batch(self, to_process, to_disassociate, is_non_local_repo, batch_index, batch_count):
-        # Prepare SQL statements
-        rhnSQL.closeDB(committing=False, closing=False)
-        rhnSQL.initDB()
-        h_delete_package_queue = rhnSQL.prepare("""delete from rhnPackageFileDeleteQueue where path = :path""")
-        backend = SQLBackend()
+        """Runs in an import worker, see _init_import_worker"""
+        # log to the log file of the channel
+        rhnLog.initLOG(self.log_path, self.log_level)
+        try:
+            result = self._import_package_batch(to_process, to_disassociate, is_non_local_repo)
+        except Exception:
+            # keep the connection of the worker usable for the next batch
+            rhnSQL.rollback()
+            raise
+        rhnSQL.commit()
+        log(0, "  Package batch #{} of {} completed...".format(batch_index + 1, batch_count))
+        return result
+
+    def _import_package_batch(self, to_process, to_disassociate, is_non_local_repo):
+        h_delete_package_queue = _import_worker_state['delete_package_queue']
+        backend = _import_worker_state['backend']
         mpm_bin_batch = importLib.Collection()
         mpm_src_batch = importLib.Collection()
         affected_channels = []
@@ -1305,8 +1452,6 @@ class RepoSync(object):
                                 raise exc
             pack.clear_header()
 
-        rhnSQL.closeDB()
-        log(0, "  Package batch #{} of {} completed...".format(batch_index + 1, batch_count))
         return affected_channels, failed_packages, all_packages, to_process
 
     def show_packages(self, plug, source_id):
@@ -1335,12 +1480,12 @@ class RepoSync(object):
         log(0, "    Package marked with '.' is already presented on filesystem")
 
         channel_id = int(self.channel['id'])
+        db_packages = self._lookup_db_packages(packages, channel_id)
 
         for pack in packages:
 
-            packs = rhnPackage.get_info_for_package(
-                [pack.name, pack.version, pack.release, pack.epoch, pack.arch],
-                channel_id, self.org_id)
+            packs = db_packages.get(rhnPackage.package_info_key(
+                pack.name, pack.version, pack.release, pack.epoch, pack.arch), [])
             db_pack = None
             for p in packs:
                 if p['checksum'] == pack.checksum:
@@ -1371,6 +1516,13 @@ class RepoSync(object):
 
             log(0, "    " + pack_status + pack_full_name + pack_size + pack_hash_info)
 
+    def _lookup_db_packages(self, packages, channel_id):
+        """Fetch the database rows of all packages in one set-based query
+        instead of calling get_info_for_package for every one of them"""
+        return rhnPackage.get_info_for_packages(
+            [[pack.name, pack.version, pack.release, pack.epoch, pack.arch] for pack in packages],
+            channel_id, self.org_id)
+
     def _normalize_orphan_vendor_packages(self):
         # Sometimes reposync disassociates vendor packages (org_id = 0) from
         # channels.
@@ -1412,44 +1564,158 @@ class RepoSync(object):
             return True
         return False
 
-    def associate_package(self, pack):
-        package = {}
-        package['name'] = pack.name
-        package['version'] = pack.version
-        package['release'] = pack.release
-        package['arch'] = pack.arch
+    @staticmethod
+    def _channel_package_key(pack):
+        """(name, version, release, epoch, arch, checksum_type, checksum) of a package to link"""
         if pack.a_pkg:
-            package['checksum'] = pack.a_pkg.checksum
-            package['checksum_type'] = pack.a_pkg.checksum_type
             # use epoch from file header because createrepo puts epoch="0" to
             # primary.xml even for packages with epoch=''
-            package['epoch'] = pack.a_pkg.header['epoch']
+            epoch = pack.a_pkg.header['epoch']
+            checksum_type, checksum = pack.a_pkg.checksum_type, pack.a_pkg.checksum
         else:
-            # RPM not available but package metadata are in DB, reuse these values
-            package['checksum'] = pack.checksum
-            package['checksum_type'] = pack.checksum_type
-            package['epoch'] = pack.epoch
-        package['channels'] = [{'label': self.channel_label,
-                                'id': self.channel['id']}]
-        package['org_id'] = self.org_id
+            epoch = pack.epoch
+            checksum_type, checksum = pack.checksum_type, pack.checksum
+        return rhnPackage.package_info_key(pack.name, pack.version, pack.release, epoch, pack.arch) + \
+            (checksum_type, checksum)
 
-        return importLib.IncompletePackage().populate(package)
+    def update_channel_packages(self, link=(), unlink=(), keep_only=None, page_size=1000):
+        """Changes the packages of the channel in rhnChannelPackage with a few set-based statements
+        and commits them in one transaction.
 
-    def disassociate_package(self, checksum_type, checksum):
-        log(3, "Disassociating package with checksum: %s (%s)" % (checksum, checksum_type))
-        h = rhnSQL.prepare("""
-            delete from rhnChannelPackage cp
-             where cp.channel_id = :channel_id
-               and cp.package_id in (select p.id
-                                       from rhnPackage p
-                                       join rhnChecksumView c
-                                         on p.checksum_id = c.id
-                                      where c.checksum = :checksum
-                                        and c.checksum_type = :checksum_type
-                                    )
-        """)
-        h.execute(channel_id=int(self.channel['id']),
-                  checksum_type=checksum_type, checksum=checksum)
+        link: (name, version, release, epoch, arch, checksum_type, checksum) of packages to link
+        unlink: (checksum_type, checksum) of packages to unlink
+        keep_only: if not None, (checksum_type, checksum) of the only packages to keep in the channel
+
+        Returns the lists of added and removed package ids.
+        """
+        start_time = time.time()
+        channel_id = int(self.channel['id'])
+        if self.org_id:
+            org_statement = "p.org_id = %d" % self.org_id
+        else:
+            org_statement = "p.org_id is null"
+
+        try:
+            removed = []
+            if unlink:
+                self._fill_temporary_table("reposync_unlink", "checksum_type varchar(32), checksum varchar(128)",
+                                           set(unlink), page_size)
+                h = rhnSQL.prepare("""
+                    delete from rhnChannelPackage cp
+                     using rhnPackage p, rhnChecksumView c, reposync_unlink u
+                     where cp.channel_id = :channel_id
+                       and cp.package_id = p.id
+                       and p.checksum_id = c.id
+                       and c.checksum = u.checksum
+                       and c.checksum_type = u.checksum_type
+                 returning cp.package_id
+                """)
+                h.execute(channel_id=channel_id)
+                removed += [row[0] for row in h.fetchall()]
+
+            if keep_only is not None:
+                self._fill_temporary_table("reposync_keep", "checksum_type varchar(32), checksum varchar(128)",
+                                           set(keep_only), page_size)
+                h = rhnSQL.prepare("""
+                    delete from rhnChannelPackage cp
+                     using rhnPackage p, rhnChecksumView c
+                     where cp.channel_id = :channel_id
+                       and cp.package_id = p.id
+                       and p.checksum_id = c.id
+                       and not exists (select 1
+                                         from reposync_keep k
+                                        where k.checksum = c.checksum
+                                          and k.checksum_type = c.checksum_type)
+                 returning cp.package_id
+                """)
+                h.execute(channel_id=channel_id)
+                removed += [row[0] for row in h.fetchall()]
+
+            added = []
+            if link:
+                self._fill_temporary_table(
+                    "reposync_link",
+                    """name varchar(256), version varchar(512), release varchar(512), epoch varchar(16),
+                       arch varchar(64), checksum_type varchar(32), checksum varchar(128)""",
+                    set(link), page_size)
+                matched_packages = """
+                      from reposync_link l
+                      join rhnPackageName pn
+                        on pn.name = l.name
+                      join rhnPackageEVR pe
+                        on pe.version = l.version
+                       and pe.release = l.release
+                       and coalesce(pe.epoch, '0') = l.epoch
+                      join rhnPackageArch pa
+                        on pa.label = l.arch
+                      join rhnPackage p
+                        on p.name_id = pn.id
+                       and p.evr_id = pe.id
+                       and p.package_arch_id = pa.id
+                      join rhnChecksumView c
+                        on p.checksum_id = c.id
+                       and c.checksum = l.checksum
+                       and c.checksum_type = l.checksum_type
+                     where %s
+                """ % org_statement
+                h = rhnSQL.prepare("""
+                    select count(*)
+                      from reposync_link l2
+                     where not exists (select 1 %s and l.checksum = l2.checksum and l.checksum_type = l2.checksum_type)
+                """ % matched_packages)
+                h.execute()
+                missing = h.fetchone()[0]
+                if missing:
+                    log2(0, 1, "    WARNING: {} packages to link are not in the database".format(missing),
+                         stream=sys.stderr)
+
+                h = rhnSQL.prepare("""
+                    insert into rhnChannelPackage (channel_id, package_id)
+                    select distinct :channel_id, p.id
+                      %s
+                       and not exists (select 1
+                                         from rhnChannelPackage cp
+                                        where cp.channel_id = :channel_id
+                                          and cp.package_id = p.id)
+                 returning package_id
+                """ % matched_packages)
+                h.execute(channel_id=channel_id)
+                added = [row[0] for row in h.fetchall()]
+
+                # as ChannelPackageSubscription does, drop packages of another organization
+                h = rhnSQL.prepare("""
+                    delete from rhnChannelPackage cp
+                     using rhnPackage p, rhnChannel c
+                     where cp.channel_id = :channel_id
+                       and cp.package_id = p.id
+                       and c.id = cp.channel_id
+                       and c.org_id != p.org_id
+                 returning cp.package_id
+                """)
+                h.execute(channel_id=channel_id)
+                removed += [row[0] for row in h.fetchall()]
+
+            if added or removed:
+                backend = SQLBackend()
+                backend.update_newest_package_cache(caller="server.app.yumreposync",
+                                                    affected_channels={channel_id: (added, removed)})
+            rhnSQL.commit()
+        except:
+            rhnSQL.rollback()
+            raise
+
+        log(0, "    {} packages linked, {} packages unlinked in {:.2f} seconds".format(
+            len(added), len(removed), time.time() - start_time))
+        return added, removed
+
+    @staticmethod
+    def _fill_temporary_table(name, columns, rows, page_size):
+        # dropped together with the data when the transaction ends
+        rhnSQL.prepare("create temporary table %s (%s) on commit drop" % (name, columns)).execute()
+        sql = "insert into %s values %%s" % name
+        h = rhnSQL.prepare(sql)
+        h.execute_values(sql, sorted(rows), page_size=page_size, fetch=False)
+        rhnSQL.prepare("analyze %s" % name).execute()
 
     def disassociate_erratum(self, advisory_name):
         log(3, "Disassociating erratum: %s" % advisory_name)
@@ -2504,7 +2770,3 @@ class RepoSync(object):
         for cid in channels:
             update_needed_cache(cid)
         rhnSQL.commit()
-
-    @staticmethod
-    def chunks(seq, n):
-        return (seq[i:i+n] for i in range(0, len(seq), n))
@@ -21,7 +21,6 @@
 import datetime
 import os
 import sys
-import stat
 import time
 import fnmatch
 try:
@@ -45,7 +44,6 @@ from spacewalk.common import rhnMail
 from spacewalk.common.rhnLog import initLOG
 from spacewalk.common.rhnConfig import CFG, initCFG, PRODUCT_NAME
 from spacewalk.common.rhnTB import exitWithTraceback, fetchTraceback
-from uyuni.common.checksum import getFileChecksum
 from spacewalk.server import rhnSQL
 from spacewalk.server.rhnSQL import SQLError, SQLSchemaError, SQLConnectError
 from spacewalk.server.rhnLib import get_package_path
@@ -74,6 +72,7 @@ from spacewalk.satellite_tools import satCerts
 from spacewalk.satellite_tools import req_channels
 from spacewalk.satellite_tools import messages
 from spacewalk.satellite_tools import sync_handlers
+from spacewalk.satellite_tools import file_verify
 from spacewalk.satellite_tools import constants
 
 translation = gettext.translation('spacewalk-backend-server', fallback=True)
@@ -472,6 +471,7 @@ class Syncer:
         #self.create_orgs = OPTIONS.create_missing_orgs
         self.xml_dump_version = OPTIONS.dump_version or str(constants.PROTOCOL_VERSION)
         self.check_rpms = check_rpms
+        self._file_verifier = None
         self.keep_rpms = OPTIONS.keep_rpms
 
         # Object to help with channel math
@@ -914,17 +914,32 @@ class Syncer:
 
         self._diff_packages()
 
+    # One row per wanted package and matching package in the database; the
+    # lookup functions run once per wanted package in the CTE
     _query_compare_packages = """
-        select p.id, c.checksum_type, c.checksum, p.path, p.package_size,
+        with wanted as (
+            select w.ordering,
+                   lookup_package_name(w.name) name_id,
+                   lookup_evr(w.epoch, w.version, w.release, w.package_type) evr_id,
+                   lookup_package_arch(w.arch) package_arch_id,
+                   w.org_id
+              from (values %s) as w(ordering, name, epoch, version, release, arch, org_id, package_type)
+        )
+        select w.ordering, p.id, c.checksum_type, c.checksum, p.path, p.package_size,
                TO_CHAR(p.last_modified, 'YYYYMMDDHH24MISS') last_modified
-          from rhnPackage p, rhnChecksumView c
-         where p.name_id = lookup_package_name(:name)
-           and p.evr_id = lookup_evr(:epoch, :version, :release, :package_type)
-           and p.package_arch_id = lookup_package_arch(:arch)
-           and (p.org_id = :org_id or
-               (p.org_id is null and :org_id is null))
-           and p.checksum_id = c.id
+          from wanted w
+          join rhnPackage p
+            on p.name_id = w.name_id
+           and p.evr_id = w.evr_id
+           and p.package_arch_id = w.package_arch_id
+           and (p.org_id = w.org_id or
+               (p.org_id is null and w.org_id is null))
+          join rhnChecksumView c
+            on p.checksum_id = c.id
     """
+    _query_compare_packages_template = "(%s, %s, %s, %s, %s, %s, %s::numeric, %s)"
+    _query_compare_packages_columns = ('id', 'checksum_type', 'checksum', 'path', 'package_size',
+                                       'last_modified')
 
     _query_channel_package_type = """
         select at.label from rhnArchType at
@@ -945,31 +960,53 @@ class Syncer:
         package_collection = sync_handlers.ShortPackageCollection()
 
         package_type = self._get_package_type_for_channel(channel_label)
-        h = rhnSQL.prepare(self._query_compare_packages)
-        for pid in chunk:
-            package = package_collection.get_package(pid)
+        packages = package_collection.get_packages(chunk)
+        values = []
+        for ordering, pid in enumerate(chunk):
+            package = packages.get(pid)
             assert package is not None
-            l_timestamp = rhnLib.timestamp(package['last_modified'])
 
             if package['org_id'] is not None:
                 package['org_id'] = OPTIONS.orgid or DEFAULT_ORG
             nevra = get_nevra_dict(package)
-            nevra['org_id'] = package['org_id']
-            nevra['package_type'] = package_type
+            values.append((ordering, nevra['name'], nevra['epoch'], nevra['version'],
+                           nevra['release'], nevra['arch'], package['org_id'], package_type))
 
-            h.execute(**nevra)
+        # compare the whole chunk in one query
+        h = rhnSQL.prepare(self._query_compare_packages)
+        db_packages = {}
+        for r in (h.execute_values(self._query_compare_packages, values,
+                                   template=self._query_compare_packages_template,
+                                   page_size=len(values) or 1) or []):
+            db_packages.setdefault(r[0], []).append(dict(zip(self._query_compare_packages_columns, r[1:])))
+
+        rows = []
+        files = []
+        for ordering, pid in enumerate(chunk):
+            package = packages[pid]
+            l_timestamp = rhnLib.timestamp(package['last_modified'])
             row = None
-            for r in (h.fetchall_dict() or []):
+            for r in db_packages.get(ordering, []):
                 # let's check which checksum we have in database
                 if (r['checksum_type'] in package['checksums']
                         and package['checksums'][r['checksum_type']] == r['checksum']):
                     row = r
                     break
+            rows.append((pid, package, l_timestamp, row))
+            if row and row['path']:
+                files.append((row['path'], l_timestamp, package['package_size'], row['checksum_type'],
+                              package['checksums'][row['checksum_type']]))
 
+        # verify the files of the whole chunk at once
+        fs_errcodes = None
+        if self.check_rpms:
+            fs_errcodes = self._verify_files(files)
+
+        for pid, package, l_timestamp, row in rows:
             self._process_package(pid, package, l_timestamp, row,
                                   self._missing_channel_packages[channel_label],
                                   self._missing_fs_packages[channel_label],
-                                  check_rpms=self.check_rpms)
+                                  check_rpms=self.check_rpms, fs_errcodes=fs_errcodes)
 
     # XXX the "is null" condition will have to change in multiorg satellites
     def _diff_packages(self):
@@ -986,6 +1023,10 @@ class Syncer:
                                 self._diff_packages_process,
                                 _('Diffing:    '),
                                 [channel_label])
+        if self._file_verifier is not None:
+            log2disk(1, "Package files verified: %s" % self._file_verifier.report())
+            self._file_verifier.close()
+            self._file_verifier = None
 
         self._verify_missing_channel_packages(self._missing_channel_packages)
 
@@ -1022,29 +1063,24 @@ class Syncer:
         if not path:
             return 1
         abs_path = os.path.join(CFG.MOUNT_POINT, path)
-        try:
-            stat_info = os.stat(abs_path)
-        except OSError:
-            # File is missing completely
-            return 1
-
-        l_mtime = stat_info[stat.ST_MTIME]
-        l_size = stat_info[stat.ST_SIZE]
-        if l_mtime == mtime and l_size == size:
-            # Same mtime, and size, assume identity
-            return 0
+        verifier = file_verify.FileVerifier(processes=1, memo=file_verify.get_memo())
+        return verifier.verify([(abs_path, mtime, size, checksum_type, checksum)])[abs_path]
 
-        # Have to check checksum
-        l_checksum = getFileChecksum(checksum_type, filename=abs_path)
-        if l_checksum != checksum:
-            return 2
-
-        # Set the mtime
-        os.utime(abs_path, (mtime, mtime))
-        return 0
+    def _verify_files(self, files):
+        """
+        Verifies the files of a list of (path, mtime, size, checksum_type,
+        checksum) as _verify_file does, computing the checksums in parallel.
+        Returns a dict of the error codes keyed on path.
+        """
+        if self._file_verifier is None:
+            self._file_verifier = file_verify.FileVerifier(memo=file_verify.get_memo())
+        abs_paths = dict((os.path.join(CFG.MOUNT_POINT, f[0]), f[0]) for f in files)
+        errcodes = self._file_verifier.verify((os.path.join(CFG.MOUNT_POINT, f[0]),) + tuple(f[1:])
+                                              for f in files)
+        return dict((abs_paths[abs_path], errcode) for abs_path, errcode in errcodes.items())
 
     def _process_package(self, package_id, package, l_timestamp, row,
-                         m_channel_packages, m_fs_packages, check_rpms=1):
+                         m_channel_packages, m_fs_packages, check_rpms=1, fs_errcodes=None):
         path = None
         channel_package = None
         fs_package = None
@@ -1069,8 +1105,11 @@ class Syncer:
                 if check_rpms:
                     if db_path:
                         # check the filesystem
-                        errcode = self._verify_file(db_path, l_timestamp,
-                                                    package_size, checksum_type, checksum)
+                        if fs_errcodes is not None:
+                            errcode = fs_errcodes[db_path]
+                        else:
+                            errcode = self._verify_file(db_path, l_timestamp,
+                                                        package_size, checksum_type, checksum)
                         if errcode:
                             # file doesn't match
                             fs_package = package_id
@@ -1122,12 +1161,14 @@ class Syncer:
                 # Nothing to see here
                 continue
 
+            packages = package_collection.get_packages(pids)
+            short_packages = short_package_collection.get_packages(pids)
             for pid in pids:
                 # XXX Catch errors
-                if (not package_collection.has_package(pid) or not package_collection.get_package(pid)
-                        or package_collection.get_package(pid)['last_modified']
-                        != short_package_collection.get_package(pid)['last_modified']
-                        or 'extra_tags' not in package_collection.get_package(pid)):
+                package = packages.get(pid)
+                if (not package
+                        or package['last_modified'] != short_packages[pid]['last_modified']
+                        or 'extra_tags' not in package):
                     # not in the cache or cache outdated
                     mp.append(pid)
 
@@ -1710,11 +1751,12 @@ class Syncer:
         else:
             package_collection = sync_handlers.PackageCollection()
         batch = []
+        packages = package_collection.get_packages(chunk)
+        short_packages = short_package_collection.get_packages(chunk)
         for pid in chunk:
-            package = package_collection.get_package(pid)
+            package = packages.get(pid)
             if (package is None or package['last_modified']
-                    != short_package_collection.get_package(pid)
-                    ['last_modified']):
+                    != short_packages[pid]['last_modified']):
                 # not in the cache
                 raise Exception(_("Package Not Found in Cache, Clear the Cache to \
                                  Regenerate it."))
@@ -15,60 +15,253 @@
 # Mechanism to persistently cache sync info (mostly post-parsed(XML)
 #    package objects).
 #
+# All the entries are kept in one SQLite database under SYNC_CACHE_DIR
+# rather than in one file per entry; run this module with --migrate to
+# move a cache written by older versions into it.
+#
 
 # system imports:
 import os
+import pickle
+import sqlite3
+import sys
+import threading
+import zlib
+from optparse import Option, OptionParser
 
 # rhn imports:
 from spacewalk.common import rhnCache
 from spacewalk.common.rhnConfig import CFG, initCFG
-from uyuni.common.rhnLib import hash_object_id
+from uyuni.common.rhnLib import hash_object_id, timestamp as to_timestamp
+from uyuni.common.fileutils import makedirs
 
 # NOTE: this is a python 2.2-ism
 __all__ = []
 
+# Number of entries read or written per statement by the batch methods
+BATCH_SIZE = 500
+
+
+def _modified(timestamp):
+    if timestamp is None:
+        return None
+    return int(to_timestamp(timestamp))
+
+
+class CacheStore:
+
+    """
+    SQLite database holding the entries of all the sync caches, keyed on the
+    kind of cache and the object id. Like the file based rhnCache an entry
+    stored with a timestamp is only returned when asked for with the same
+    timestamp, or with none.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._db = None
+        self._pid = None
+        self._lock = threading.RLock()
+
+    def _connection(self):
+        # a connection must not be shared with a forked child
+        if self._db is None or self._pid != os.getpid():
+            dirname = os.path.dirname(self.path)
+            if not os.path.isdir(dirname):
+                makedirs(dirname)
+            db = sqlite3.connect(self.path, timeout=300, check_same_thread=False)
+            db.execute("pragma journal_mode = wal")
+            db.execute("pragma synchronous = normal")
+            db.execute("""
+                create table if not exists cache (
+                    kind text not null,
+                    object_id text not null,
+                    modified integer,
+                    value blob not null,
+                    primary key (kind, object_id)
+                ) without rowid
+            """)
+            db.commit()
+            self._db = db
+            self._pid = os.getpid()
+        return self._db
+
+    def get_many(self, kind, object_ids, modified=None):
+        """ Returns a dict of the values found for object_ids """
+        object_ids = list(object_ids)
+        result = {}
+        with self._lock:
+            db = self._connection()
+            for i in range(0, len(object_ids), BATCH_SIZE):
+                chunk = object_ids[i:i + BATCH_SIZE]
+                rows = db.execute("select object_id, modified, value from cache where kind = ? and object_id in (%s)"
+                                  % ", ".join("?" * len(chunk)), [kind] + chunk)
+                for object_id, entry_modified, value in rows:
+                    if modified is None or entry_modified == modified:
+                        result[object_id] = value
+        return result
+
+    def get(self, kind, object_id, modified=None):
+        return self.get_many(kind, [object_id], modified).get(object_id)
+
+    def has_key(self, kind, object_id, modified=None):
+        with self._lock:
+            row = self._connection().execute("select modified from cache where kind = ? and object_id = ?",
+                                              (kind, object_id)).fetchone()
+        return row is not None and (modified is None or row[0] == modified)
+
+    def set_many(self, kind, entries):
+        """ Stores entries, an iterable of (object_id, modified, value) """
+        with self._lock:
+            db = self._connection()
+            with db:
+                db.executemany("insert or replace into cache (kind, object_id, modified, value) values (?, ?, ?, ?)",
+                               ((kind, object_id, modified, sqlite3.Binary(value))
+                                for object_id, modified, value in entries))
+
+    def set(self, kind, object_id, value, modified=None):
+        self.set_many(kind, [(object_id, modified, value)])
+
+    def delete_many(self, kind, object_ids):
+        with self._lock:
+            db = self._connection()
+            with db:
+                db.executemany("delete from cache where kind = ? and object_id = ?",
+                               ((kind, object_id) for object_id in object_ids))
+
+    def delete(self, kind, object_id):
+        self.delete_many(kind, [object_id])
+
+    def compact(self):
+        """ Gives the space of replaced and deleted entries back """
+        with self._lock:
+            db = self._connection()
+            db.execute("pragma wal_checkpoint(truncate)")
+            db.execute("vacuum")
+
+    def close(self):
+        with self._lock:
+            if self._db is not None and self._pid == os.getpid():
+                self._db.close()
+            self._db = None
+
+
+_stores = {}
+
+
+def get_store(path=None):
+    """ Returns the shared store in path, by default the one in SYNC_CACHE_DIR """
+    if path is None:
+        path = os.path.join(CFG.SYNC_CACHE_DIR, "satsync", "cache.db")
+    if path not in _stores:
+        _stores[path] = CacheStore(path)
+    return _stores[path]
+
 
 class BaseCache:
     _compressed = 1
+    # Subdirectory and number of hash levels of the file cache used before
+    _subdir = "__unknown__"
+    _hash_factor = 0
 
-    def __init__(self):
+    def __init__(self, store=None):
         # Kind of kludgy - this may have weird side-effects if called from
         # within the server code
         rhnCache.CACHEDIR = CFG.SYNC_CACHE_DIR
+        self._store = store or get_store()
+
+    def _dumps(self, value):
+        value = pickle.dumps(value, -1)
+        if self._compressed:
+            value = zlib.compress(value, 5)
+        return value
+
+    def _loads(self, value):
+        try:
+            if self._compressed:
+                value = zlib.decompress(value)
+            return pickle.loads(value)
+        except (zlib.error, pickle.UnpicklingError, EOFError, ValueError):
+            # a damaged entry is a missing one
+            return None
 
     def cache_get(self, object_id, timestamp=None):
-        # Get the key
-        key = self._get_key(object_id)
-        return rhnCache.get(key, modified=timestamp, raw=0,
-                            compressed=self._compressed)
+        value = self._store.get(self._subdir, str(object_id), _modified(timestamp))
+        if value is None:
+            return None
+        return self._loads(value)
+
+    def cache_get_many(self, object_ids, timestamp=None):
+        """ Returns a dict of the cached objects among object_ids """
+        values = self._store.get_many(self._subdir, [str(x) for x in object_ids], _modified(timestamp))
+        result = {}
+        for object_id, value in values.items():
+            value = self._loads(value)
+            if value is not None:
+                result[object_id] = value
+        return result
 
     def cache_set(self, object_id, value, timestamp=None):
-        # Get the key
-        key = self._get_key(object_id)
-        return rhnCache.set(key, value, modified=timestamp, raw=0,
-                            compressed=self._compressed)
+        return self._store.set(self._subdir, str(object_id), self._dumps(value), _modified(timestamp))
+
+    def cache_set_many(self, values, timestamp=None):
+        """ Stores the objects of values, a dict keyed on object id """
+        modified = _modified(timestamp)
+        self._store.set_many(self._subdir, ((str(object_id), modified, self._dumps(value))
+                                            for object_id, value in values.items()))
 
     def cache_has_key(self, object_id, timestamp=None):
-        # Get the key
-        key = self._get_key(object_id)
-        return rhnCache.has_key(key, modified=timestamp)
+        return self._store.has_key(self._subdir, str(object_id), _modified(timestamp))
 
     def _get_key(self, object_id):
-        raise NotImplementedError()
+        """ Key of the entry in the file cache of older versions """
+        if self._hash_factor:
+            hash_val = hash_object_id(object_id, self._hash_factor)
+            return os.path.join("satsync", self._subdir, hash_val, str(object_id))
+        return os.path.normpath(os.path.join("satsync", self._subdir, str(object_id)))
 
+    def migrate(self, remove=False):
+        """
+        Moves the entries of the file cache of older versions into the store.
+        Returns the number of entries moved.
+        """
+        root = os.path.join(CFG.SYNC_CACHE_DIR, "satsync", self._subdir)
+        count = 0
+        batch = []
+        for dirname, _dirs, files in os.walk(root):
+            for filename in files:
+                path = os.path.join(dirname, filename)
+                object_id = os.path.relpath(path, root)
+                if self._hash_factor:
+                    object_id = filename
+                key = self._get_key(object_id)
+                if os.path.join(CFG.SYNC_CACHE_DIR, key) != os.path.normpath(path):
+                    # not an entry of this cache
+                    continue
+                value = rhnCache.get(key, compressed=self._compressed)
+                if value is None:
+                    continue
+                batch.append((object_id, int(os.stat(path).st_mtime), self._dumps(value), path))
+                if len(batch) >= BATCH_SIZE:
+                    count += self._migrate_batch(batch, remove)
+                    batch = []
+        count += self._migrate_batch(batch, remove)
+        return count
 
-class ChannelCache(BaseCache):
+    def _migrate_batch(self, batch, remove):
+        self._store.set_many(self._subdir, [entry[:3] for entry in batch])
+        if remove:
+            for entry in batch:
+                os.unlink(entry[3])
+        return len(batch)
 
-    def _get_key(self, object_id):
-        return os.path.join("satsync", "channels", str(object_id))
 
+class ChannelCache(BaseCache):
+    _subdir = "channels"
 
-class BasePackageCache(BaseCache):
-    _subdir = "__unknown__"
 
-    def _get_key(self, object_id):
-        hash_val = hash_object_id(object_id, 2)
-        return os.path.join("satsync", self._subdir, hash_val, str(object_id))
+class BasePackageCache(BaseCache):
+    _hash_factor = 2
 
 
 class ShortPackageCache(BasePackageCache):
@@ -86,22 +279,41 @@ class SourcePackageCache(BasePackageCache):
 
 class ErratumCache(BaseCache):
     _subdir = "errata"
-
-    def _get_key(self, object_id):
-        hash_val = hash_object_id(object_id, 1)
-        return os.path.join("satsync", self._subdir, hash_val, str(object_id))
+    _hash_factor = 1
 
 
 class KickstartableTreesCache(BaseCache):
     _subdir = "kickstartable-trees"
 
-    def _get_key(self, object_id):
-        return os.path.normpath(os.path.join("satsync", self._subdir,
-                                             object_id))
 
-if __name__ == '__main__':
+CACHES = [ChannelCache, ShortPackageCache, PackageCache, SourcePackageCache,
+          ErratumCache, KickstartableTreesCache]
+
+
+def main():
+    options = [
+        Option('--migrate', action='store_true',
+               help='move the entries of a file based cache of older versions into the cache database'),
+        Option('--remove', action='store_true',
+               help='remove the migrated files'),
+        Option('--compact', action='store_true',
+               help='give the unused space of the cache database back'),
+    ]
+    parser = OptionParser(option_list=options)
+    (opts, args) = parser.parse_args()
+    if args or not (opts.migrate or opts.compact):
+        parser.print_help()
+        return 1
+
     initCFG("server.satellite")
-    c = PackageCache()
-    pid = 'package-12345'
-    c.cache_set(pid, {'a': 1, 'b': 2})
-    print((c.cache_get(pid)))
+    if opts.migrate:
+        for cache in CACHES:
+            count = cache().migrate(remove=opts.remove)
+            print("%s: %d entries migrated" % (cache._subdir, count))
+    if opts.compact:
+        get_store().compact()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
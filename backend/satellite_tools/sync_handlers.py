@@ -284,6 +284,11 @@ class ShortPackageCollection:
         """Return the package with the specified id from the collection"""
         return self._cache.cache_get(package_id)
 
+    def get_packages(self, package_ids):
+        """Return a dict of the packages with the specified ids found in the
+        collection"""
+        return self._cache.cache_get_many(package_ids)
+
     def has_package(self, package_id):
         """Returns true if the package exists in the collection"""
         return self._cache.cache_has_key(package_id)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2021 SUSE LLC
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+"""
+Compare the streaming Debian Packages index parser of deb_src with the
+previous read-everything parser on a synthetic gzipped index.
+
+Usage: python deb_packages_benchmark.py [number of stanzas]
+"""
+
+import gzip
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from uyuni.common import fileutils
+from spacewalk.satellite_tools.repo_plugins import deb_src
+
+STANZA = """Package: pkg{n}
+Source: src{n}
+Version: {epoch}{n}.0.{minor}-{n}ubuntu1
+Architecture: amd64
+Maintainer: Ubuntu Developers <ubuntu-devel-discuss@lists.ubuntu.com>
+Installed-Size: {n}
+Depends: libc6 (>= 2.14), libgcc-s1 (>= 3.0), libstdc++6 (>= 5.2)
+Priority: optional
+Section: universe/misc
+Filename: pool/universe/p/pkg{n}/pkg{n}_{n}.0.{minor}-{n}ubuntu1_amd64.deb
+Size: {n}
+MD5sum: {md5}
+SHA1: {sha1}
+SHA256: {sha256}
+Description: synthetic package {n}
+ A long description of the synthetic package {n},
+ spread over a couple of continuation lines
+ to look like the real thing.
+Description-md5: {md5}
+
+"""
+
+
+def legacy_parse(decompressed):
+    """ The parser deb_src used before: read, split, then split every line """
+    to_return = []
+    for chunk in decompressed.read().split("\n\n"):
+        package = deb_src.DebPackage()
+        package.epoch = ""
+        checksums = {}
+        for line in chunk.split("\n"):
+            pair = line.split(" ", 1)
+            if pair[0] == "Package:":
+                package.name = pair[1]
+            elif pair[0] == "Architecture:":
+                package.arch = pair[1] + '-deb'
+            elif pair[0] == "Version:":
+                package['epoch'] = ''
+                version = pair[1]
+                if version.find(':') != -1:
+                    package['epoch'], version = version.split(':')
+                if version.find('-') != -1:
+                    tmp = version.split('-')
+                    package['version'] = '-'.join(tmp[:-1])
+                    package['release'] = tmp[-1]
+                else:
+                    package['version'] = version
+                    package['release'] = 'X'
+            elif pair[0] == "Filename:":
+                package.relativepath = pair[1]
+            elif pair[0] == "SHA256:":
+                checksums['sha256'] = pair[1]
+            elif pair[0] == "SHA1:":
+                checksums['sha1'] = pair[1]
+            elif pair[0] == "MD5sum:":
+                checksums['md5'] = pair[1]
+        for checksum_type in ('sha256', 'sha1', 'md5'):
+            if checksum_type in checksums:
+                package.checksum_type = checksum_type
+                package.checksum = checksums[checksum_type]
+                break
+        if package.is_populated():
+            to_return.append(package)
+    return to_return
+
+
+def write_index(filename, count):
+    with gzip.open(filename, 'wt') as index:
+        for n in range(count):
+            index.write(STANZA.format(n=n, epoch="1:" if n % 10 == 0 else "", minor=n % 7,
+                                      md5="%032x" % n, sha1="%040x" % n, sha256="%064x" % n))
+
+
+def measure(name, parse, filename):
+    tracemalloc.start()
+    start = time.time()
+    decompressed = fileutils.decompress_open(filename)
+    try:
+        packages = parse(decompressed)
+    finally:
+        decompressed.close()
+    elapsed = time.time() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print("%-10s %8d packages %8.2f s %10.1f MiB peak" % (name, len(packages), elapsed, peak / 1048576.0))
+    return packages
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    fd, filename = tempfile.mkstemp(suffix='.gz')
+    os.close(fd)
+    try:
+        write_index(filename, count)
+        print("Packages.gz with %d stanzas, %.1f MiB compressed" % (count, os.path.getsize(filename) / 1048576.0))
+        legacy = measure("legacy", legacy_parse, filename)
+        streaming = measure("streaming", lambda f: list(deb_src.parse_packages_index(f)), filename)
+    finally:
+        os.unlink(filename)
+
+    def key(p):
+        return (p.name, p.epoch, p.version, p.release, p.arch, p.relativepath, p.checksum_type, p.checksum)
+    if [key(p) for p in legacy] != [key(p) for p in streaming]:
+        print("ERROR: parsers returned different packages")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2021 SUSE LLC
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+import unittest
+from io import StringIO
+
+from spacewalk.satellite_tools.repo_plugins import deb_src
+
+PACKAGES_INDEX = """Package: libgmp10
+Source: gmp
+Version: 2:6.2.1+dfsg-1
+Architecture: amd64
+Description: Multiprecision arithmetic library
+ GNU MP is a programmer's library for arbitrary precision
+ arithmetic (ie, a bignum package).
+Filename: pool/main/g/gmp/libgmp10_6.2.1+dfsg-1_amd64.deb
+MD5sum: 0a6c1c3f9dd3ebb4a4ef0e4f0e1e1c77
+SHA256: 6e7f9ad3e4b6ee9b0e88a6d9e9d6ef5b2e8c5e3a2f8c6d7b5e4a3c2b1a0f9e8d
+
+Package: nano
+Version: 5.4
+Architecture: amd64
+Filename: pool/main/n/nano/nano_5.4_amd64.deb
+SHA1: 3d0b9a1e8e4c6f2b7a5d9c0e1f2a3b4c5d6e7f80
+
+Package: broken
+Version: 1.0-1
+Architecture: amd64
+
+Package: adduser
+Version: 3.118ubuntu2-1
+Architecture: all
+Filename: pool/main/a/adduser/adduser_3.118ubuntu2-1_all.deb
+SHA256: 1f1a6e2c5d3b4a7f8e9c0d1b2a3f4e5d6c7b8a9f0e1d2c3b4a5f6e7d8c9b0a1f
+"""
+
+
+class DebPackagesIndexTest(unittest.TestCase):
+
+    def _parse(self, chunk_size=deb_src.PACKAGES_CHUNK_SIZE):
+        return list(deb_src.parse_packages_index(StringIO(PACKAGES_INDEX), chunk_size=chunk_size))
+
+    def test_parse_packages_index(self):
+        packages = self._parse()
+
+        self.assertEqual(['libgmp10', 'nano', 'adduser'], [p.name for p in packages])
+        gmp = packages[0]
+        self.assertEqual('2', gmp.epoch)
+        self.assertEqual('6.2.1+dfsg', gmp.version)
+        self.assertEqual('1', gmp.release)
+        self.assertEqual('amd64-deb', gmp.arch)
+        self.assertEqual('pool/main/g/gmp/libgmp10_6.2.1+dfsg-1_amd64.deb', gmp.relativepath)
+        self.assertEqual('sha256', gmp.checksum_type)
+        self.assertEqual('6e7f9ad3e4b6ee9b0e88a6d9e9d6ef5b2e8c5e3a2f8c6d7b5e4a3c2b1a0f9e8d', gmp.checksum)
+
+        nano = packages[1]
+        self.assertEqual('', nano.epoch)
+        self.assertEqual('5.4', nano.version)
+        self.assertEqual('X', nano.release)
+        self.assertEqual('sha1', nano.checksum_type)
+
+        self.assertEqual('3.118ubuntu2', packages[2].version)
+        self.assertEqual('1', packages[2].release)
+
+    def test_parse_packages_index_small_chunks(self):
+        expected = [(p.name, p.evr(), p.arch, p.relativepath, p.checksum) for p in self._parse()]
+        for chunk_size in (1, 2, 7, 64):
+            packages = self._parse(chunk_size=chunk_size)
+            self.assertEqual(expected, [(p.name, p.evr(), p.arch, p.relativepath, p.checksum) for p in packages])
+
+    def test_parse_empty_packages_index(self):
+        self.assertEqual([], list(deb_src.parse_packages_index(StringIO(""))))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2021 SUSE LLC
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+import threading
+import time
+import unittest
+
+try:
+    from unittest.mock import Mock, patch
+except ImportError:
+    from mock import Mock, patch
+
+from spacewalk.satellite_tools import download
+
+
+def _params(url, name):
+    return {'urls': [url], 'relative_path': name,
+            'ssl_ca_cert': None, 'ssl_client_cert': None, 'ssl_client_key': None}
+
+
+class ThreadedDownloaderTest(unittest.TestCase):
+
+    def _downloader(self, threads=4, host_threads=0):
+        cfg = Mock(REPOSYNC_DOWNLOAD_THREADS=threads, REPOSYNC_DOWNLOAD_HOST_THREADS=host_threads)
+        with patch.object(download, 'CFG', cfg), patch.object(download, 'initCFG'):
+            return download.ThreadedDownloader()
+
+    @staticmethod
+    def _add(downloader, params, ssl_ca_cert=None):
+        params['ssl_ca_cert'] = ssl_ca_cert
+        downloader.add(params)
+        downloader.pending += 1
+
+    def test_host_limit(self):
+        downloader = self._downloader(host_threads=1)
+        self._add(downloader, _params('http://a.example.com/repo/', 'a1'))
+        self._add(downloader, _params('http://a.example.com/repo/', 'a2'))
+        self._add(downloader, _params('http://b.example.com/repo/', 'b1'))
+
+        queue, host, params = downloader.next_task()
+        self.assertEqual(('a.example.com', 'a1'), (host, params['relative_path']))
+        # the file of the other host comes before the second file of the busy host
+        self.assertEqual('b1', downloader.next_task()[2]['relative_path'])
+
+        tasks = []
+        waiting = threading.Thread(target=lambda: tasks.append(downloader.next_task()))
+        waiting.start()
+        waiting.join(0.2)
+        self.assertTrue(waiting.is_alive())
+        downloader.task_done(queue, host, True, 10)
+        waiting.join(5)
+        self.assertFalse(waiting.is_alive())
+        self.assertEqual('a2', tasks[0][2]['relative_path'])
+
+    def test_no_host_limit(self):
+        downloader = self._downloader()
+        for i in range(3):
+            self._add(downloader, _params('http://a.example.com/repo/', 'a%d' % i))
+        self.assertEqual(['a0', 'a1', 'a2'], [downloader.next_task()[2]['relative_path'] for _ in range(3)])
+        self.assertEqual(3, downloader.active_hosts['a.example.com'])
+
+    def test_next_task_and_task_done(self):
+        downloader = self._downloader()
+        self._add(downloader, _params('http://a.example.com/repo/', 'a1'))
+        self._add(downloader, _params('http://a.example.com/repo/', 'a2'))
+        self._add(downloader, _params('http://a.example.com/repo/', 'c1'), ssl_ca_cert='')
+        self.assertEqual(2, len(downloader.queues))
+
+        # the queues are served round robin
+        tasks = [downloader.next_task() for _ in range(3)]
+        self.assertEqual(['a1', 'c1', 'a2'], [params['relative_path'] for _, _, params in tasks])
+        self.assertEqual(0, downloader.pending)
+        self.assertEqual(3, downloader.active_hosts['a.example.com'])
+        # nothing left
+        self.assertIsNone(downloader.next_task())
+
+        for (queue, host, _), success in zip(tasks, (True, False, True)):
+            downloader.task_done(queue, host, success, 100)
+        self.assertEqual(0, downloader.active_hosts['a.example.com'])
+        queue_a, queue_c = tasks[0][0], tasks[1][0]
+        self.assertEqual((2, 0, 200), (queue_a.files, queue_a.failed, queue_a.bytes))
+        self.assertEqual((1, 1, 100), (queue_c.files, queue_c.failed, queue_c.bytes))
+        self.assertIsNotNone(queue_a.started)
+        self.assertIsNotNone(queue_a.finished)
+
+    def test_next_task_after_failure(self):
+        downloader = self._downloader()
+        self._add(downloader, _params('http://a.example.com/repo/', 'a1'))
+        downloader.fail_download(IOError("no space left on device"))
+        self.assertIsNone(downloader.next_task())
+        self.assertFalse(downloader.can_continue())
+
+    def test_first_download_serialized(self):
+        downloader = self._downloader()
+        queues = [download.DownloadQueue(i, (str(i), None, None), downloader.first_in_queue_lock)
+                  for i in range(2)]
+        performed = []
+        lock = threading.Lock()
+
+        def perform(file_obj):
+            start = time.time()
+            time.sleep(0.1)
+            with lock:
+                performed.append((file_obj.queue.index, start, time.time()))
+
+        def transfer(queue):
+            file_obj = download.PyCurlFileObjectThread.__new__(download.PyCurlFileObjectThread)
+            file_obj.queue = queue
+            file_obj._do_perform()
+
+        with patch.object(download.PyCurlFileObject, '_do_perform', perform):
+            threads = [threading.Thread(target=transfer, args=(queues[i % 2],)) for i in range(6)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(6, len(performed))
+        self.assertTrue(all(queue.first_in_queue_done for queue in queues))
+        firsts = []
+        for index in range(2):
+            transfers = [t for t in performed if t[0] == index]
+            transfers.sort(key=lambda t: t[1])
+            first = transfers[0]
+            # the other files of a queue wait for its first one
+            self.assertTrue(all(t[1] >= first[2] for t in transfers[1:]))
+            firsts.append(first)
+        # the first files of both queues are not performed at the same time
+        firsts.sort(key=lambda t: t[1])
+        self.assertLessEqual(firsts[0][2], firsts[1][1])
+
+
+if __name__ == '__main__':
+    unittest.main()
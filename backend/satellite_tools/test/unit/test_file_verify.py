@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2021 SUSE LLC
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+
+from spacewalk.satellite_tools import file_verify, syncCache
+
+
+class FileVerifierTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.store = syncCache.CacheStore(os.path.join(self.tmpdir, "cache.db"))
+        self.memo = file_verify.ChecksumMemo(self.store)
+        self.files = {}
+        for i, size in enumerate((0, 1000, file_verify.MMAP_THRESHOLD + 10)):
+            path = os.path.join(self.tmpdir, "file%d" % i)
+            data = os.urandom(size)
+            with open(path, 'wb') as f:
+                f.write(data)
+            self.files[path] = hashlib.sha256(data).hexdigest()
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_checksums(self):
+        missing = os.path.join(self.tmpdir, "missing")
+        with file_verify.FileVerifier(processes=2, memo=self.memo) as verifier:
+            result = verifier.checksums([(path, 'sha256') for path in list(self.files) + [missing]])
+        expected = dict(((path, 'sha256'), value) for path, value in self.files.items())
+        expected[(missing, 'sha256')] = None
+        self.assertEqual(expected, result)
+        self.assertEqual(3, verifier.hashed)
+        self.assertEqual(0, verifier.memo_hits)
+
+    def test_memo(self):
+        files = [(path, 'sha256') for path in self.files]
+        with file_verify.FileVerifier(processes=1, memo=self.memo) as verifier:
+            verifier.checksums(files)
+        with file_verify.FileVerifier(processes=1, memo=self.memo) as verifier:
+            result = verifier.checksums(files)
+            self.assertEqual(0, verifier.hashed)
+            self.assertEqual(3, verifier.memo_hits)
+            self.assertEqual(self.files, dict((path, value) for (path, _), value in result.items()))
+
+            # a changed file is hashed again
+            path = sorted(self.files)[1]
+            with open(path, 'wb') as f:
+                f.write(b'changed')
+            result = verifier.checksums(files)
+            self.assertEqual(1, verifier.hashed)
+            self.assertEqual(hashlib.sha256(b'changed').hexdigest(), result[(path, 'sha256')])
+
+    def test_memo_prune(self):
+        files = [(path, 'sha256') for path in self.files]
+        with file_verify.FileVerifier(processes=1, memo=self.memo) as verifier:
+            verifier.checksums(files)
+            removed, verified = sorted(self.files)[:2]
+            os.unlink(removed)
+            os.unlink(verified)
+            self.assertEqual(None, verifier.checksums(files)[(removed, 'sha256')])
+            self.assertEqual({verified: file_verify.VERIFY_MISSING},
+                             verifier.verify([(verified, 0, 0, 'sha256', self.files[verified])]))
+        self.assertEqual([self.memo._object_id(path, 'sha256') for path in sorted(self.files)[2:]],
+                         sorted(self.store.get_many(self.memo._kind, [self.memo._object_id(path, 'sha256')
+                                                                      for path in self.files])))
+
+    def test_verify(self):
+        path = sorted(self.files)[1]
+        st = os.stat(path)
+        with file_verify.FileVerifier(processes=1) as verifier:
+            result = verifier.verify([
+                (path, int(st.st_mtime), st.st_size, 'sha256', 'bad'),
+                (path + '.missing', 0, 0, 'sha256', 'bad'),
+            ])
+            self.assertEqual({path: file_verify.VERIFY_OK,
+                              path + '.missing': file_verify.VERIFY_MISSING}, result)
+            self.assertEqual(0, verifier.hashed)
+
+            result = verifier.verify([(path, 1000, st.st_size, 'sha256', 'bad')])
+            self.assertEqual({path: file_verify.VERIFY_MISMATCH}, result)
+
+            result = verifier.verify([(path, 1000, st.st_size, 'sha256', self.files[path])])
+            self.assertEqual({path: file_verify.VERIFY_OK}, result)
+            self.assertEqual(1000, int(os.stat(path).st_mtime))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2021 SUSE LLC
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+import os
+import signal
+import unittest
+
+from spacewalk.satellite_tools.import_pool import ImportWorkerPool, WorkerDiedError
+
+_state = {}
+
+
+def _init():
+    _state['initialized'] = os.getpid()
+
+
+def _task(value, grow=0, die=False):
+    if die:
+        os._exit(3)
+    _state.setdefault('memory', []).append(b'x' * grow)
+    return value, _state['initialized'], os.getpid()
+
+
+class ImportWorkerPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = ImportWorkerPool(2, initializer=_init, max_rss=256 * 1024 * 1024)
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_workers_are_reused(self):
+        results = [self.pool.apply_async(_task, (i,)).get() for i in range(10)]
+        self.assertEqual(list(range(10)), [r[0] for r in results])
+        # every task ran in a worker initialized once
+        self.assertTrue(all(r[1] == r[2] for r in results))
+        self.assertTrue(len(set(r[2] for r in results)) <= 2)
+
+    def test_worker_over_memory_limit_is_replaced(self):
+        first = self.pool.apply_async(_task, (0, 300 * 1024 * 1024)).get()
+        later = [self.pool.apply_async(_task, (i,)).get() for i in range(4)]
+        self.assertNotIn(first[2], [r[2] for r in later])
+
+    def test_died_worker_fails_its_task(self):
+        self.assertRaises(WorkerDiedError, self.pool.apply_async(_task, (0, 0, True)).get)
+        self.assertEqual(1, self.pool.apply_async(_task, (1,)).get()[0])
+
+    def test_exit_of_replaced_worker(self):
+        # the exit message of a worker _check_workers already replaced
+        with self.pool._lock:
+            self.pool._handle_message(('exit', -1, 0))
+        self.assertEqual(1, self.pool.apply_async(_task, (1,)).get()[0])
+        with self.pool._lock:
+            self.assertEqual(2, len(self.pool._workers))
+
+    def test_task_of_worker_died_before_starting_it(self):
+        # one worker, stopped so it cannot take the task it is handed
+        self.pool.close()
+        self.pool = ImportWorkerPool(1, initializer=_init)
+        self.assertEqual(0, self.pool.apply_async(_task, (0,)).get()[0])
+        with self.pool._lock:
+            pid = list(self.pool._workers)[0]
+        os.kill(pid, signal.SIGSTOP)
+        result = self.pool.apply_async(_task, (1,))
+        with self.pool._lock:
+            self.assertEqual(1, self.pool._workers[pid].task[0])
+        os.kill(pid, signal.SIGKILL)
+        # the replacement worker runs the task
+        value, _, worker_pid = result.get()
+        self.assertEqual(1, value)
+        self.assertNotEqual(pid, worker_pid)
+
+    def test_close_runs_submitted_tasks(self):
+        results = [self.pool.apply_async(_task, (i,)) for i in range(6)]
+        self.pool.close()
+        self.assertEqual(list(range(6)), [r.get()[0] for r in results])
+        self.assertEqual({}, self.pool._workers)
+
+    def test_callbacks(self):
+        done = []
+        self.pool.apply_async(_task, (1,), callback=done.append).get()
+        self.assertEqual(1, done[0][0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -16,6 +16,8 @@
 
 import imp
 import sys
+import threading
+import time
 import unittest
 import json
 try:
@@ -29,7 +31,6 @@ from mock import Mock, patch, call
 import spacewalk.satellite_tools.reposync
 from spacewalk.satellite_tools.repo_plugins import ContentPackage
 from spacewalk.satellite_tools.repo_plugins import yum_src
-from spacewalk.server.importlib import importLib
 
 from uyuni.common import rhn_rpm
 
@@ -503,35 +504,201 @@ class RepoSyncTest(unittest.TestCase):
 
     #    self.assertEqual(self.reposync.ErrataImport.call_args, None)
 
-    def test_associate_package(self):
+    def test_channel_package_key(self):
         pack = ContentPackage()
-        pack.setNVREA('name1', 'version1', 'release1', 'epoch1', 'arch1')
-        pack.unique_id = 1
+        pack.setNVREA('name1', 'version1', 'release1', '0', 'arch1')
+        pack.set_checksum('c_type1', 'checksum1')
+        self.assertEqual(self.reposync.RepoSync._channel_package_key(pack),
+                         ('name1', 'version1', 'release1', '0', 'arch1', 'c_type1', 'checksum1'))
+
         pack.a_pkg = rhn_rpm.RPM_Package(None)
-        pack.a_pkg.checksum = 'checksum1'
-        pack.a_pkg.checksum_type = 'c_type1'
-        pack.a_pkg.header = {'epoch': 'epoch1'}
-        pack.checksums[1] = 'checksum1'
+        pack.a_pkg.checksum = 'checksum2'
+        pack.a_pkg.checksum_type = 'c_type2'
+        pack.a_pkg.header = {'epoch': ''}
+        self.assertEqual(self.reposync.RepoSync._channel_package_key(pack),
+                         ('name1', 'version1', 'release1', '0', 'arch1', 'c_type2', 'checksum2'))
+
+    def _mock_channel_package_statements(self):
+        """Mock rhnSQL.prepare for update_channel_packages, returning the prepared statements"""
+        statements = []
+
+        def prepare(sql):
+            h = Mock()
+            h.sql = sql
+            h.fetchone = Mock(return_value=(0,))
+            if "delete from rhnChannelPackage" in sql and "reposync_unlink" in sql:
+                h.fetchall = Mock(return_value=[(11,), (12,)])
+            elif "insert into rhnChannelPackage" in sql:
+                h.fetchall = Mock(return_value=[(21,)])
+            else:
+                h.fetchall = Mock(return_value=[])
+            statements.append(h)
+            return h
+
+        self.reposync.rhnSQL.prepare = Mock(side_effect=prepare)
+        self.reposync.rhnSQL.rollback = Mock()
+        return statements
+
+    def test_update_channel_packages(self):
+        rs = self._create_mocked_reposync()
+        rs.channel = {'id': '42', 'org_id': 1}
+        rs.org_id = 1
+        backend = Mock()
+        self.reposync.SQLBackend = Mock(return_value=backend)
+        statements = self._mock_channel_package_statements()
+        link = [('name2', 'version1', 'release1', '0', 'arch1', 'sha256', 'checksum2'),
+                ('name1', 'version1', 'release1', '0', 'arch1', 'sha256', 'checksum1'),
+                ('name1', 'version1', 'release1', '0', 'arch1', 'sha256', 'checksum1')]
+        unlink = [('sha256', 'checksum3')]
+
+        self.assertEqual(([21], [11, 12]), rs.update_channel_packages(link=link, unlink=unlink))
+
+        sqls = [' '.join(h.sql.split()) for h in statements]
+        self.assertIn("create temporary table reposync_unlink (checksum_type varchar(32), checksum varchar(128)) "
+                      "on commit drop", sqls)
+        self.assertTrue([sql for sql in sqls if sql.startswith("create temporary table reposync_link (")])
+        self.assertFalse([sql for sql in sqls if "reposync_keep" in sql])
+        # the temporary tables are filled with the sorted, unique rows
+        filled = dict((h.execute_values.call_args[0][0], h.execute_values.call_args[0][1])
+                      for h in statements if h.execute_values.called)
+        self.assertEqual({"insert into reposync_unlink values %s": [('sha256', 'checksum3')],
+                          "insert into reposync_link values %s": sorted(set(link))}, filled)
+        # the links are restricted to the packages of the channel organization
+        insert = [h for h in statements if "insert into rhnChannelPackage" in h.sql][0]
+        self.assertIn("p.org_id = 1", insert.sql)
+        insert.execute.assert_called_once_with(channel_id=42)
+        # unlinking comes before linking
+        self.assertLess(sqls.index([sql for sql in sqls if "using rhnPackage p, rhnChecksumView c, reposync_unlink u"
+                                    in sql][0]),
+                        sqls.index(' '.join(insert.sql.split())))
+        backend.update_newest_package_cache.assert_called_once_with(caller="server.app.yumreposync",
+                                                                    affected_channels={42: ([21], [11, 12])})
+        self.assertTrue(self.reposync.rhnSQL.commit.called)
+
+    def test_update_channel_packages_keep_only(self):
+        rs = self._create_mocked_reposync()
+        rs.channel = {'id': '42', 'org_id': None}
+        rs.org_id = None
+        self.reposync.SQLBackend = Mock()
+        statements = self._mock_channel_package_statements()
+
+        self.assertEqual(([], []), rs.update_channel_packages(keep_only=[('sha256', 'checksum1')]))
+
+        sqls = [' '.join(h.sql.split()) for h in statements]
+        self.assertTrue([sql for sql in sqls if "create temporary table reposync_keep" in sql])
+        self.assertTrue([sql for sql in sqls if "not exists (select 1 from reposync_keep k" in sql])
+        self.assertFalse([sql for sql in sqls if "reposync_link" in sql or "reposync_unlink" in sql])
+        # nothing changed, nothing to refresh
+        self.assertFalse(self.reposync.SQLBackend.called)
+
+    def test_update_channel_packages_rollback(self):
+        rs = self._create_mocked_reposync()
+        rs.channel = {'id': '42', 'org_id': None}
+        rs.org_id = None
+        statements = self._mock_channel_package_statements()
+        self.reposync.SQLBackend = Mock(side_effect=ValueError("cache update failed"))
+
+        self.assertRaises(ValueError, rs.update_channel_packages, unlink=[('sha256', 'checksum1')])
+        self.assertTrue(self.reposync.rhnSQL.rollback.called)
+        self.assertFalse(self.reposync.rhnSQL.commit.called)
+        self.assertTrue(statements)
+
+    def _mock_download_pipeline(self, rs, batches, batch_size, max_staged, events, fail_download=None,
+                                fail_import=False):
+        """Mock the downloads and the import pool of _download_and_import_packages, recording the
+        downloads and the ends of the imports in events"""
+        lock = threading.Lock()
+
+        class Downloader:
+            count = 0
+
+            def __init__(self):
+                self.index = Downloader.count
+                Downloader.count += 1
+
+            def set_log_obj(self, logger):
+                pass
+
+            def add(self, params):
+                pass
+
+            def run(self):
+                if self.index == fail_download:
+                    raise IOError("download failed")
+                with lock:
+                    events.append(('download', self.index))
+
+        class Pool:
+            def apply_async(self, func, args, callback, error_callback):
+                if fail_import:
+                    raise ValueError("import failed")
+                result = Mock()
+                result.get = Mock(return_value=func(*args))
+                # imports end a bit later, in another thread
+                def finish():
+                    time.sleep(0.05)
+                    with lock:
+                        events.append(('import', args[3]))
+                    callback(None)
+                threading.Thread(target=finish).start()
+                return result
+
+        self.reposync.ThreadedDownloader = Downloader
+        self.reposync.get_import_pool = Mock(return_value=Pool())
+        self.reposync.close_import_pool = Mock()
+        self.reposync.log2background = Mock()
+        self.reposync.CFG.REPOSYNC_MAX_STAGED_PACKAGES = max_staged * batch_size
+        rs.import_batch_size = batch_size
+        rs.all_packages = {}
+        rs._package_download_params = Mock(return_value={})
+        rs.import_package_batch = Mock(
+            side_effect=lambda batch, to_disassociate, is_non_local_repo, i, count:
+            (['channel%d' % i], 1, {}, [(pack, False, True) for pack, _, _ in batch]))
+        return [('package%d' % i, True, True) for i in range(batches * batch_size)]
+
+    def test_download_and_import_packages_order(self):
+        rs = self._create_mocked_reposync()
+        events = []
+        to_process = self._mock_download_pipeline(rs, 5, 2, 2, events)
+
+        affected_channels, failed = rs._download_and_import_packages(Mock(), to_process, {}, True, Mock())
+
+        self.assertEqual(['channel%d' % i for i in range(5)], affected_channels)
+        self.assertEqual(5, failed)
+        self.assertEqual([('package%d' % i, False, True) for i in range(10)], to_process)
+        self.assertEqual([('download', i) for i in range(5)], [e for e in events if e[0] == 'download'])
+
+    def test_download_and_import_packages_staging_cap(self):
+        rs = self._create_mocked_reposync()
+        events = []
+        to_process = self._mock_download_pipeline(rs, 6, 3, 2, events)
+
+        rs._download_and_import_packages(Mock(), to_process, {}, True, Mock())
+
+        # a batch is downloaded once the import of the batch two before it is done
+        for i in range(2, 6):
+            self.assertLess(events.index(('import', i - 2)), events.index(('download', i)))
+
+    def test_download_and_import_packages_download_error(self):
+        rs = self._create_mocked_reposync()
+        events = []
+        to_process = self._mock_download_pipeline(rs, 4, 2, 1, events, fail_download=1)
+
+        self.assertRaises(IOError, rs._download_and_import_packages, Mock(), to_process, {}, True, Mock())
+        self.reposync.close_import_pool.assert_called_once_with(terminate=True)
+        self.assertEqual([('download', 0)], [e for e in events if e[0] == 'download'])
 
-        mocked_backend = Mock()
-        self.reposync.SQLBackend = Mock(return_value=mocked_backend)
+    def test_download_and_import_packages_import_error(self):
         rs = self._create_mocked_reposync()
-        rs._importer_run = Mock()
-        rs.channel_label = 'Label1'
-        rs.channel = {'id': 'channel1', 'org_id': 1}
-
-        package = {'name': 'name1',
-                   'version': 'version1',
-                   'release': 'release1',
-                   'epoch': 'epoch1',
-                   'arch': 'arch1',
-                   'checksum': 'checksum1',
-                   'checksum_type': 'c_type1',
-                   'org_id': 1,
-                   'channels': [{'label': 'Label1', 'id': 'channel1'}]}
-        refpack = importLib.IncompletePackage().populate(package)
-        ipack = rs.associate_package(pack)
-        self.assertEqual(ipack, refpack)
+        events = []
+        to_process = self._mock_download_pipeline(rs, 6, 1, 3, events, fail_import=True)
+        threads = threading.active_count()
+
+        self.assertRaises(ValueError, rs._download_and_import_packages, Mock(), to_process, {}, True, Mock())
+        self.reposync.close_import_pool.assert_called_once_with(terminate=True)
+        # the download thread waiting to hand over a batch stopped
+        self.assertEqual(threads, threading.active_count())
+        self.assertLess(len(events), 6)
 
     def test_get_errata_no_advisories_found(self):
         rs = self._create_mocked_reposync()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2021 SUSE LLC
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+
+from spacewalk.common import rhnCache
+from spacewalk.satellite_tools import syncCache
+
+
+class SyncCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cfg = patch.object(syncCache, 'CFG', Mock(SYNC_CACHE_DIR=self.tmpdir))
+        self.cfg.start()
+        self.store = syncCache.CacheStore(os.path.join(self.tmpdir, "cache.db"))
+
+    def tearDown(self):
+        self.store.close()
+        self.cfg.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def test_get_set(self):
+        cache = syncCache.PackageCache(self.store)
+        self.assertIsNone(cache.cache_get('rhn-package-1'))
+        cache.cache_set('rhn-package-1', {'name': 'foo'})
+        self.assertEqual({'name': 'foo'}, cache.cache_get('rhn-package-1'))
+        self.assertTrue(cache.cache_has_key('rhn-package-1'))
+        # the kinds of caches do not share entries
+        self.assertIsNone(syncCache.ShortPackageCache(self.store).cache_get('rhn-package-1'))
+
+    def test_timestamp(self):
+        cache = syncCache.ErratumCache(self.store)
+        cache.cache_set('rhn-erratum-1', 'new', timestamp='20210101120000')
+        self.assertEqual('new', cache.cache_get('rhn-erratum-1', timestamp='20210101120000'))
+        self.assertEqual('new', cache.cache_get('rhn-erratum-1'))
+        self.assertIsNone(cache.cache_get('rhn-erratum-1', timestamp='20200101120000'))
+        self.assertFalse(cache.cache_has_key('rhn-erratum-1', timestamp='20200101120000'))
+
+    def test_batch(self):
+        cache = syncCache.ShortPackageCache(self.store)
+        values = dict(("rhn-package-%d" % i, {'id': i}) for i in range(syncCache.BATCH_SIZE + 10))
+        cache.cache_set_many(values)
+        result = cache.cache_get_many(list(values) + ['rhn-package-missing'])
+        self.assertEqual(values, result)
+
+    def test_migrate(self):
+        rhnCache.CACHEDIR = self.tmpdir
+        old = syncCache.PackageCache(self.store)
+        rhnCache.set(old._get_key('rhn-package-123'), {'name': 'bar'}, compressed=1)
+        rhnCache.set(old._get_key('rhn-package-124'), {'name': 'baz'}, modified='20210101120000',
+                     compressed=1)
+        self.assertEqual(2, old.migrate(remove=True))
+        self.assertEqual({'name': 'bar'}, old.cache_get('rhn-package-123'))
+        self.assertEqual({'name': 'baz'}, old.cache_get('rhn-package-124', timestamp='20210101120000'))
+        self.assertFalse(os.path.exists(os.path.join(self.tmpdir, old._get_key('rhn-package-123'))))
+
+        self.store.compact()
+        self.assertEqual({'name': 'bar'}, old.cache_get('rhn-package-123'))
+
+
+if __name__ == '__main__':
+    unittest.main()
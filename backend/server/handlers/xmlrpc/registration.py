@@ -25,7 +25,7 @@ from spacewalk.common.rhnException import rhnFault
 from spacewalk.common.rhnTranslate import _, cat
 from uyuni.common.rhnLib import checkValue
 from spacewalk.server.rhnLib import normalize_server_arch
-from spacewalk.server.rhnServer import server_route, server_lib
+from spacewalk.server.rhnServer import server_route, server_lib, server_packages
 from spacewalk.server.rhnServer.server_certificate import Certificate
 from spacewalk.server.rhnHandler import rhnHandler
 from spacewalk.server import rhnUser, rhnServer, rhnSQL, rhnCapability, \
@@ -341,6 +341,7 @@ class Registration(rhnHandler):
         if 'packages' in data:
             for package in data['packages']:
                 newserv.add_package(package)
+            newserv.set_profile_digest(server_packages.profile_digest(data['packages']))
         # add the hardware profile
         if 'hardware_profile' in data:
             for hw in data['hardware_profile'][:]:
@@ -946,9 +947,14 @@ class Registration(rhnHandler):
         server = self.auth_system(system_id)
         # log the entry
         log_debug(1, server.getid(), "packages: %d" % len(packages))
+        digest = server_packages.profile_digest(packages)
+        if server.package_profile_unchanged(digest):
+            log_debug(1, server.getid(), "package profile unchanged")
+            return 0
         server.dispose_packages()
         for package in packages:
             server.add_package(package)
+        server.set_profile_digest(digest)
         server.save_packages()
         return 0
 
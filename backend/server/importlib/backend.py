@@ -74,6 +74,9 @@ class Backend:
     def __init__(self, dbmodule):
         self.dbmodule = dbmodule
         self.sequences = {}
+        # Inserts of at least this many rows into a table are streamed with
+        # COPY instead of multi-row INSERTs, 0 disables it
+        self.copy_threshold = 0
 
     # TODO: Why is there a pseudo-constructor here instead of just using
     # __init__?
@@ -83,6 +86,8 @@ class Backend:
         # Initialize sequences
         for k, v in list(sequences.items()):
             self.sequences[k] = self.dbmodule.Sequence(v)
+        if CFG.is_initialized():
+            self.copy_threshold = int(CFG.get('import_copy_threshold') or 0)
         # TODO: Why do we return a reference to ourselves? If somebody called
         # this method they already have a reference...
         return self
@@ -2444,7 +2449,7 @@ class Backend:
             # Nothing to do
             return
 
-        insertObj = TableInsert(tab, self.dbmodule)
+        insertObj = TableInsert(tab, self.dbmodule, copy_threshold=self.copy_threshold)
         insertObj.query(hash)
         return
 
@@ -2573,85 +2578,102 @@ class Backend:
         self.__doInsertTable(table.name, inserts)
 
     # This function does a diff on the specified table name for the presented
-    # data, using pk_fields as unique fields
+    # data, using uq_fields as unique fields. Rows of the table sharing the
+    # value of the first unique field with an incoming row, but not present
+    # in data, are deleted. The first unique field must not be NULL, the
+    # other ones match when both are NULL.
+    # The incoming rows are loaded into a temporary table, diffed against the
+    # table with one join for the new and changed rows and one anti join for
+    # the rows to delete, and applied with one statement per kind of change.
+    # Returns the number of inserted, updated and deleted rows.
     def _do_diff(self, data, table_name, uq_fields, fields):
         first_uq_col = uq_fields[0]
-        uq_col_values = {}
         all_fields = uq_fields + fields
+        incoming = {}
         for entry in data:
             for f in all_fields:
                 if f not in entry:
                     raise Exception("Missing field %s" % f)
-            val = entry[first_uq_col]
-            if val not in uq_col_values:
-                valhash = {}
-                uq_col_values[val] = valhash
-            else:
-                valhash = uq_col_values[val]
-            key = build_key(entry, uq_fields)
-            valhash[key] = entry
-
-        query = "select %s from %s where %s = :%s" % (
-            ", ".join(all_fields),
-            table_name,
-            first_uq_col, first_uq_col,
-        )
-        h = self.dbmodule.prepare(query)
-        updates = []
-        deletes = []
-        for val, valhash in list(uq_col_values.items()):
-            params = {first_uq_col: val}
-            h.execute(**params)
-            while 1:
-                row = h.fetchone_dict()
-                if not row:
-                    break
-                key = build_key(row, uq_fields)
-                if key not in valhash:
-                    # Need to delete this one
-                    deletes.append(row)
-                    continue
-                entry = valhash[key]
-                for f in fields:
-                    if entry[f] != row[f]:
-                        # Different, we have to update
-                        break
-                else:
-                    # Same value, remove it from valhash
-                    del valhash[key]
-                    continue
-                # Need to update
-                updates.append(entry)
+            if entry[first_uq_col] is None:
+                raise Exception("Field %s cannot be NULL" % first_uq_col)
+            incoming[build_key(entry, uq_fields)] = build_key(entry, all_fields)
 
-        inserts = []
-        list(map(inserts.extend, [list(x.values()) for x in list(uq_col_values.values())]))
+        stats = {'insert': 0, 'update': 0, 'delete': 0}
+        if not incoming:
+            return stats
 
-        if deletes:
-            params = transpose(deletes, uq_fields)
-            query = "delete from %s where %s" % (
-                table_name,
-                ' and '.join(["%s = :%s" % (x, x) for x in uq_fields]),
-            )
-            h = self.dbmodule.prepare(query)
-            h.executemany(**params)
-        if inserts:
-            params = transpose(inserts, all_fields)
-            query = "insert into %s (%s) values (%s)" % (
-                table_name,
-                ', '.join(all_fields),
-                ', '.join([":" + x for x in all_fields]),
-            )
-            h = self.dbmodule.prepare(query)
-            h.executemany(**params)
-        if updates:
-            params = transpose(updates, all_fields)
-            query = "update % set %s where %s" % (
-                table_name,
-                ', '.join(["%s = :s" + (x, x) for x in fields]),
-                ' and '.join(["%s = :%s" % (x, x) for x in uq_fields]),
-            )
+        columns = ', '.join(all_fields)
+        h = self.dbmodule.prepare("""
+            create temporary table rhn_diff_incoming on commit drop as
+            select %s from %s with no data
+        """ % (columns, table_name))
+        h.execute()
+        rows = list(incoming.values())
+        if self.copy_threshold and len(rows) >= self.copy_threshold:
+            self.dbmodule.bulk_insert('rhn_diff_incoming', all_fields, rows)
+        else:
+            query = "insert into rhn_diff_incoming (%s) values %%s" % columns
             h = self.dbmodule.prepare(query)
-            h.executemany(**params)
+            h.execute_values(query, rows, fetch=False, page_size=10000)
+
+        def uq_match(a, b):
+            # the first unique field is never NULL and stays hash joinable,
+            # NULLs of the other ones match as they do in Python
+            return ' and '.join(["%s.%s = %s.%s" % (a, first_uq_col, b, first_uq_col)] +
+                                ["%s.%s is not distinct from %s.%s" % (a, x, b, x) for x in uq_fields[1:]])
+
+        changed = ' or '.join(["i.%s is distinct from e.%s" % (x, x) for x in fields])
+        h = self.dbmodule.prepare("""
+            create temporary table rhn_diff_changes on commit drop as
+            select case when e.%(first)s is null then 'insert' else 'update' end as action,
+                   %(i_columns)s
+              from rhn_diff_incoming i
+              left join %(table)s e
+                on %(i_e_match)s
+             where e.%(first)s is null%(changed)s
+            union all
+            select 'delete', %(e_columns)s
+              from %(table)s e
+             where e.%(first)s in (select %(first)s from rhn_diff_incoming)
+               and not exists (select 1 from rhn_diff_incoming i where %(i_e_match)s)
+        """ % {
+            'first': first_uq_col,
+            'i_columns': ', '.join(["i.%s" % x for x in all_fields]),
+            'e_columns': ', '.join(["e.%s" % x for x in all_fields]),
+            'table': table_name,
+            'i_e_match': uq_match('i', 'e'),
+            'changed': changed and " or %s" % changed,
+        })
+        h.execute()
+
+        d_match = uq_match('t', 'd')
+        h = self.dbmodule.prepare("""
+            delete from %s t
+             using rhn_diff_changes d
+             where d.action = 'delete'
+               and %s
+        """ % (table_name, d_match))
+        stats['delete'] = h.execute()
+        if fields:
+            h = self.dbmodule.prepare("""
+                update %s t
+                   set %s
+                  from rhn_diff_changes d
+                 where d.action = 'update'
+                   and %s
+            """ % (table_name, ', '.join(["%s = d.%s" % (x, x) for x in fields]), d_match))
+            stats['update'] = h.execute()
+        h = self.dbmodule.prepare("""
+            insert into %s (%s)
+            select %s from rhn_diff_changes where action = 'insert'
+        """ % (table_name, columns, columns))
+        stats['insert'] = h.execute()
+
+        h = self.dbmodule.prepare("drop table rhn_diff_changes, rhn_diff_incoming")
+        h.execute()
+        log_debug(2, "Diff of %s: %d incoming rows, %d inserted, %d updated, %d deleted"
+                  % (table_name, len(rows), stats['insert'], stats['update'], stats['delete']))
+        return stats
 
     def validate_pks(self):
         # If nevra is enabled use checksum as primary key
@@ -2668,16 +2690,6 @@ def build_key(hash, fields):
     return tuple(map(lambda x, h=hash: h[x], fields))
 
 
-def transpose(arrhash, fields):
-    params = {}
-    for f in fields:
-        params[f] = []
-    for h in arrhash:
-        for f in fields:
-            params[f].append(h[f])
-    return params
-
-
 def hash2tuple(hash, fields):
     # Converts the hash into a tuple, with the fields ordered as presented in
     # the fields list
@@ -428,11 +428,13 @@ class TableDelete(TableLookup):
 
 class TableInsert(TableUpdate):
 
-    def __init__(self, table, dbmodule):
+    def __init__(self, table, dbmodule, copy_threshold=0):
         TableUpdate.__init__(self, table, dbmodule)
         self.queryTemplate = "insert into %s (%s) values %%s"
 
         self.insert_fields = self.pks + self.otherfields + self.blob_fields
+        # Inserts of at least this many rows are streamed with COPY, 0 never
+        self.copy_threshold = copy_threshold
 
     def _buildQuery(self, key):
         q = self.queryTemplate % (self.table.name, ', '.join(self.insert_fields))
@@ -446,11 +448,17 @@ class TableInsert(TableUpdate):
         else:
             blob_map = None
 
+        l = len(values[self.insert_fields[0]])
+        value_list = zip(*[values[f] for f in self.insert_fields])
+        if self.copy_threshold and l >= self.copy_threshold and not blob_map:
+            # Conflicting rows fail the insert, as they do with execute_values below
+            self.dbmodule.bulk_insert(self.table.name, self.insert_fields, value_list,
+                                      ignore_conflicts=False)
+            return
+
         # Do the insert
         statement = self._getCachedQuery(None, blob_map=blob_map)
-        l = len(values[self.insert_fields[0]])
-        value_list = [[values[f][i] for f in self.insert_fields] for i in range(l)]
-        statement.execute_values(self._buildQuery(None), value_list, fetch=False, page_size=10_000)
+        statement.execute_values(self._buildQuery(None), list(value_list), fetch=False, page_size=10_000)
 
 def sanitizeValue(value, datatype):
     if isinstance(datatype, DBstring):
@@ -29,6 +29,7 @@ class Channel:
         self.checksum_type = None
 
         self.num_packages = 0
+        self.package_ids = []
         self.packages = []
         self.errata = []
         self.updateinfo = None
@@ -30,6 +30,22 @@ from . import domain
 
 CACHE_PREFIX = "/var/cache/rhn/"
 
+# Number of packages loaded together by the batched package mappers
+PACKAGE_BATCH_SIZE = 500
+
+PRCO_TABLES = (
+    ('provides', 'rhnPackageProvides'),
+    ('requires', 'rhnPackageRequires'),
+    ('recommends', 'rhnPackageRecommends'),
+    ('supplements', 'rhnPackageSupplements'),
+    ('enhances', 'rhnPackageEnhances'),
+    ('suggests', 'rhnPackageSuggests'),
+    ('conflicts', 'rhnPackageConflicts'),
+    ('obsoletes', 'rhnPackageObsoletes'),
+    ('breaks', 'rhnPackageBreaks'),
+    ('predepends', 'rhnPackagePredepends'),
+)
+
 
 class ChannelMapper:
 
@@ -132,6 +148,7 @@ class ChannelMapper:
         package_ids = self.channel_sql.fetchall()
 
         channel.num_packages = len(package_ids)
+        channel.package_ids = [package_id[0] for package_id in package_ids]
         channel.packages = self._package_generator(package_ids)
 
         channel.errata = self._erratum_generator(channel_id)
@@ -156,9 +173,10 @@ class ChannelMapper:
         return channel
 
     def _package_generator(self, package_ids):
-        for package_id in package_ids:
-            pkg = self.pkg_mapper.get_package(package_id[0])
-            yield pkg
+        for i in range(0, len(package_ids), PACKAGE_BATCH_SIZE):
+            batch = [package_id[0] for package_id in package_ids[i:i + PACKAGE_BATCH_SIZE]]
+            for pkg in self.pkg_mapper.get_packages(batch):
+                yield pkg
 
     def _erratum_generator(self, channel_id):
         self.errata_id_sql.execute(channel_id=channel_id)
@@ -192,10 +210,7 @@ class CachedPackageMapper:
         """
         package_id = str(package_id)
 
-        last_modified = str(self.mapper.last_modified(package_id))
-        last_modified = last_modified.replace(" ", "")
-        last_modified = last_modified.replace(":", "")
-        last_modified = last_modified.replace("-", "")
+        last_modified = self._format_last_modified(self.mapper.last_modified(package_id))
 
         cache_key = "repomd-packages/" + package_id
         if self.cache.has_key(cache_key, last_modified):
@@ -206,6 +221,47 @@ class CachedPackageMapper:
 
         return package
 
+    def last_modified_batch(self, package_ids):
+        """ Get a dict of package id to last_modified date for package_ids. """
+        last_modified = self.mapper.last_modified_batch(package_ids)
+        for package_id in last_modified:
+            last_modified[package_id] = self._format_last_modified(last_modified[package_id])
+        return last_modified
+
+    def get_packages(self, package_ids):
+        """
+        Load the packages with ids package_ids, in the same order.
+
+        Packages with a new enough cache entry are loaded from the cache, all
+        the others are loaded together by the provided mapper.
+        """
+        last_modified = self.last_modified_batch(package_ids)
+
+        packages = {}
+        missing = []
+        for package_id in package_ids:
+            modified = last_modified[int(package_id)]
+            cache_key = "repomd-packages/" + str(package_id)
+            if self.cache.has_key(cache_key, modified):
+                packages[str(package_id)] = self.cache.get(cache_key)
+            else:
+                missing.append(package_id)
+
+        for package in self.mapper.get_packages(missing):
+            modified = last_modified[int(package.id)]
+            self.cache.set("repomd-packages/" + str(package.id), package, modified)
+            packages[str(package.id)] = package
+
+        return [packages[str(package_id)] for package_id in package_ids]
+
+    @staticmethod
+    def _format_last_modified(last_modified):
+        last_modified = str(last_modified)
+        last_modified = last_modified.replace(" ", "")
+        last_modified = last_modified.replace(":", "")
+        last_modified = last_modified.replace("-", "")
+        return last_modified
+
 
 class SqlPackageMapper:
 
@@ -405,11 +461,114 @@ class SqlPackageMapper:
         where package_id = :package_id
         """)
 
+        # Batched variants of the queries above. They are run with
+        # execute_values, which fills in the list of wanted package ids.
+        self.details_batch_sql = """
+        with wanted (id) as (
+            values %s
+        )
+        select
+            p.id,
+            pn.name,
+            pevr.version,
+            pevr.release,
+            pevr.epoch,
+            pa.label arch,
+            c.checksum checksum,
+            p.summary,
+            p.description,
+            p.vendor,
+            p.build_time,
+            p.package_size,
+            p.payload_size,
+            p.installed_size,
+            p.header_start,
+            p.header_end,
+            pg.name package_group,
+            p.build_host,
+            p.copyright,
+            p.path,
+            sr.name source_rpm,
+            p.last_modified,
+            c.checksum_type
+        from
+            wanted
+            join rhnPackage p on p.id = wanted.id
+            join rhnPackageName pn on p.name_id = pn.id
+            join rhnPackageEVR pevr on p.evr_id = pevr.id
+            join rhnPackageArch pa on p.package_arch_id = pa.id
+            join rhnPackageGroup pg on p.package_group = pg.id
+            join rhnSourceRPM sr on p.source_rpm_id = sr.id
+            join rhnChecksumView c on p.checksum_id = c.id
+        """
+
+        self.filelist_batch_sql = """
+        with wanted (id) as (
+            values %s
+        )
+        select
+            pf.package_id,
+            pc.name
+        from
+            wanted
+            join rhnPackageFile pf on pf.package_id = wanted.id
+            join rhnPackageCapability pc on pf.capability_id = pc.id
+        """
+
+        self.prco_batch_sql = """
+        with wanted (id) as (
+            values %%s
+        )
+        %s
+        """ % "\n        union all\n".join(["""
+        select
+           dep.package_id,
+           '%s',
+           dep.sense,
+           pc.name,
+           pc.version
+        from
+           wanted
+           join %s dep on dep.package_id = wanted.id
+           join rhnPackageCapability pc on dep.capability_id = pc.id""" % prco
+                                           for prco in PRCO_TABLES])
+
+        self.last_modified_batch_sql = """
+        with wanted (id) as (
+            values %s
+        )
+        select
+            p.id,
+            to_char(p.last_modified, 'YYYYMMDDHH24MISS') as last_modified
+        from
+            wanted
+            join rhnPackage p on p.id = wanted.id
+        """
+
+        self.other_batch_sql = """
+        with wanted (id) as (
+            values %s
+        )
+        select
+            cl.package_id,
+            cl.name,
+            cl.text,
+            cl.time
+        from
+            wanted
+            join rhnPackageChangelog cl on cl.package_id = wanted.id
+        """
+
     def last_modified(self, package_id):
         """ Get the last_modified date on the package with id package_id. """
         self.last_modified_sql.execute(package_id=package_id)
         return self.last_modified_sql.fetchone()[0]
 
+    def last_modified_batch(self, package_ids):
+        """ Get a dict of package id to last_modified date for package_ids. """
+        rows = self._execute_batch(self.last_modified_batch_sql, package_ids)
+        return dict(rows)
+
     def get_package(self, package_id):
         """ Get the package with id package_id from the RHN db. """
         package = domain.Package(package_id)
@@ -419,6 +578,38 @@ class SqlPackageMapper:
         self._fill_package_other(package)
         return package
 
+    def get_packages(self, package_ids):
+        """
+        Get the packages with ids package_ids from the RHN db.
+
+        Uses one query per kind of package data for the whole list, instead
+        of the per-package queries run by get_package.
+        """
+        packages = {}
+        for package_id in package_ids:
+            packages[int(package_id)] = domain.Package(package_id)
+        if not packages:
+            return []
+
+        for pkg in self._execute_batch(self.details_batch_sql, package_ids):
+            self._set_package_details(packages[pkg[0]], pkg[1:])
+        for item in self._execute_batch(self.prco_batch_sql, package_ids):
+            self._add_package_dep(packages[item[0]], item[1:])
+        for file_row in self._execute_batch(self.filelist_batch_sql, package_ids):
+            packages[file_row[0]].files.append(string_to_unicode(file_row[1]))
+        for data in self._execute_batch(self.other_batch_sql, package_ids):
+            self._add_package_changelog(packages[data[0]], data[1:])
+
+        return [packages[int(package_id)] for package_id in package_ids]
+
+    @staticmethod
+    def _execute_batch(sql, package_ids):
+        if not package_ids:
+            return []
+        h = rhnSQL.prepare(sql)
+        return h.execute_values(sql, [(int(package_id),) for package_id in package_ids],
+                                page_size=PACKAGE_BATCH_SIZE) or []
+
     def _get_package_filename(self, pkg):
         if pkg[18]:
             path = pkg[18]
@@ -435,7 +626,9 @@ class SqlPackageMapper:
         """ Load the packages basic details (summary, description, etc). """
         self.details_sql.execute(package_id=package.id)
         pkg = self.details_sql.fetchone()
+        self._set_package_details(package, pkg)
 
+    def _set_package_details(self, package, pkg):
         package.name = pkg[0]
         package.version = pkg[1]
         package.release = pkg[2]
@@ -468,49 +661,53 @@ class SqlPackageMapper:
         deps = self.prco_sql.fetchall() or []
 
         for item in deps:
-            version = item[3] or ""
-            relation = ""
-            release = None
-            epoch = 0
-            if version:
-                sense = item[1] or 0
-                relation = SqlPackageMapper.__get_relation(sense)
-
-                vertup = version.split('-')
-                if len(vertup) > 1:
-                    version = vertup[0]
-                    release = vertup[1]
-
-                vertup = version.split(':')
-                if len(vertup) > 1:
-                    epoch = vertup[0]
-                    version = vertup[1]
-
-            dep = {'name': string_to_unicode(item[2]), 'flag': relation,
-                   'version': version, 'release': release, 'epoch': epoch}
-
-            if item[0] == "provides":
-                package.provides.append(dep)
-            elif item[0] == "requires":
-                package.requires.append(dep)
-            elif item[0] == "conflicts":
-                package.conflicts.append(dep)
-            elif item[0] == "obsoletes":
-                package.obsoletes.append(dep)
-            elif item[0] == "recommends":
-                package.recommends.append(dep)
-            elif item[0] == "supplements":
-                package.supplements.append(dep)
-            elif item[0] == "enhances":
-                package.enhances.append(dep)
-            elif item[0] == "suggests":
-                package.suggests.append(dep)
-            elif item[0] == "breaks":
-                package.breaks.append(dep)
-            elif item[0] == "predepends":
-                package.predepends.append(dep)
-            else:
-                assert False, "Unknown PRCO type: %s" % item[0]
+            self._add_package_dep(package, item)
+
+    def _add_package_dep(self, package, item):
+        """ Add a (type, sense, name, version) dependency row to package. """
+        version = item[3] or ""
+        relation = ""
+        release = None
+        epoch = 0
+        if version:
+            sense = item[1] or 0
+            relation = SqlPackageMapper.__get_relation(sense)
+
+            vertup = version.split('-')
+            if len(vertup) > 1:
+                version = vertup[0]
+                release = vertup[1]
+
+            vertup = version.split(':')
+            if len(vertup) > 1:
+                epoch = vertup[0]
+                version = vertup[1]
+
+        dep = {'name': string_to_unicode(item[2]), 'flag': relation,
+               'version': version, 'release': release, 'epoch': epoch}
+
+        if item[0] == "provides":
+            package.provides.append(dep)
+        elif item[0] == "requires":
+            package.requires.append(dep)
+        elif item[0] == "conflicts":
+            package.conflicts.append(dep)
+        elif item[0] == "obsoletes":
+            package.obsoletes.append(dep)
+        elif item[0] == "recommends":
+            package.recommends.append(dep)
+        elif item[0] == "supplements":
+            package.supplements.append(dep)
+        elif item[0] == "enhances":
+            package.enhances.append(dep)
+        elif item[0] == "suggests":
+            package.suggests.append(dep)
+        elif item[0] == "breaks":
+            package.breaks.append(dep)
+        elif item[0] == "predepends":
+            package.predepends.append(dep)
+        else:
+            assert False, "Unknown PRCO type: %s" % item[0]
 
 #    @staticmethod
     def __get_relation(sense):
@@ -551,12 +748,16 @@ class SqlPackageMapper:
         log_data = self.other_sql.fetchall() or []
 
         for data in log_data:
+            self._add_package_changelog(package, data)
 
-            date = oratimestamp_to_sinceepoch(data[2])
+    @staticmethod
+    def _add_package_changelog(package, data):
+        """ Add a (name, text, time) changelog row to package. """
+        date = oratimestamp_to_sinceepoch(data[2])
 
-            chglog = {'author': string_to_unicode(data[0]), 'date': date,
-                      'text': string_to_unicode(data[1])}
-            package.changelog.append(chglog)
+        chglog = {'author': string_to_unicode(data[0]), 'date': date,
+                  'text': string_to_unicode(data[1])}
+        package.changelog.append(chglog)
 
 
 class CachedErratumMapper:
@@ -27,9 +27,7 @@ import shutil
 import os.path
 
 from gzip import GzipFile
-from gzip import write32u
 
-from uyuni.common.usix import LongType
 from uyuni.common import checksum
 from spacewalk.common import rhnCache
 from spacewalk.common.rhnLog import log_debug
@@ -84,9 +82,7 @@ class Repository(object):
         ret = self.get_primary_cache()
 
         if not ret:
-            viewobj = self.get_primary_view()
-
-            self.generate_files([viewobj])
+            self.generate_missing_files()
             ret = self.get_primary_cache()
 
         return ret
@@ -96,9 +92,7 @@ class Repository(object):
         ret = self.get_other_cache()
 
         if not ret:
-            viewobj = self.get_other_view()
-
-            self.generate_files([viewobj])
+            self.generate_missing_files()
             ret = self.get_other_cache()
 
         return ret
@@ -108,9 +102,7 @@ class Repository(object):
         ret = self.get_filelists_cache()
 
         if not ret:
-            viewobj = self.get_filelists_view()
-
-            self.generate_files([viewobj])
+            self.generate_missing_files()
             ret = self.get_filelists_cache()
 
         return ret
@@ -120,11 +112,7 @@ class Repository(object):
         ret = self.get_cache_file(self.updateinfo_prefix)
 
         if not ret:
-            viewobj = self.get_cache_view(self.updateinfo_prefix,
-                                          view.UpdateinfoView)
-
-            viewobj.write_updateinfo()
-            viewobj.fileobj.close()
+            self.generate_missing_files()
             ret = self.get_cache_file(self.updateinfo_prefix)
 
         return ret
@@ -138,9 +126,15 @@ class Repository(object):
         return ret
 
     def get_cache_view(self, cache_prefix, view_class):
+        """
+        Return a view writing to the cache entry of cache_prefix and, gzipped
+        on the fly, to the entry CompressedRepository would produce from it.
+        """
         cache_entry = self.get_cache_entry_name(cache_prefix)
         ret = self.cache.set_file(cache_entry, self.last_modified)
-        viewobj = view_class(self.channel, ret)
+        gz_cache_entry = self.get_cache_entry_name(cache_prefix + ".gz")
+        gz_ret = self.cache.set_file(gz_cache_entry, self.last_modified)
+        viewobj = view_class(self.channel, CompressingTeeFile(ret, gz_ret))
         return viewobj
 
     def get_primary_cache(self):
@@ -186,18 +180,112 @@ class Repository(object):
     def get_modules_file(self):
         return self.get_repomd_file(self.channel.modules, 'get_modules_file')
 
-    def generate_files(self, views):
+    def get_updateinfo_view(self):
+        return self.get_cache_view(self.updateinfo_prefix, view.UpdateinfoView)
+
+    def generate_missing_files(self):
+        """
+        Generate every metadata file without a valid cache entry in a single
+        pass over the channel's packages.
+        """
+        to_generate = []
+        if not self.get_primary_cache():
+            to_generate.append(self.get_primary_view())
+        if not self.get_filelists_cache():
+            to_generate.append(self.get_filelists_view())
+        if not self.get_other_cache():
+            to_generate.append(self.get_other_view())
+
+        updateinfo_view = None
+        if not self.get_cache_file(self.updateinfo_prefix):
+            updateinfo_view = self.get_updateinfo_view()
+
+        self.generate_files(to_generate, updateinfo_view)
+
+    def generate_files(self, views, updateinfo_view=None):
+        """
+        Write the package metadata of all views in one pass.
+
+        The XML fragment of each package is cached per view and channel, keyed
+        by package id and package last_modified, so only new or changed
+        packages get loaded from the database and rendered again. Fragments of
+        packages which left the channel are deleted afterwards.
+        """
         for view in views:
             view.write_start()
 
-        for package in self.channel.packages:
-            for view in views:
-                view.write_package(package)
+        if views:
+            package_mapper = mapper.get_package_mapper()
+            package_ids = self.channel.package_ids
+            for i in range(0, len(package_ids), mapper.PACKAGE_BATCH_SIZE):
+                self._write_package_batch(views, package_mapper,
+                                          package_ids[i:i + mapper.PACKAGE_BATCH_SIZE])
 
         for view in views:
             view.write_end()
             view.fileobj.close()
 
+        if views:
+            self._prune_fragments(views, package_ids)
+
+        if updateinfo_view:
+            updateinfo_view.write_updateinfo()
+            updateinfo_view.fileobj.close()
+
+    def _write_package_batch(self, views, package_mapper, package_ids):
+        last_modified = package_mapper.last_modified_batch(package_ids)
+
+        fragments = {}
+        missing = []
+        for package_id in package_ids:
+            package_fragments = []
+            for viewobj in views:
+                fragment = self.cache.get(self._fragment_entry_name(viewobj, package_id),
+                                          last_modified[package_id])
+                if fragment is None:
+                    missing.append(package_id)
+                    break
+                package_fragments.append(fragment)
+            else:
+                fragments[package_id] = package_fragments
+
+        log_debug(4, "Rendering %d of %d packages" % (len(missing), len(package_ids)))
+        for package in package_mapper.get_packages(missing):
+            package_id = int(package.id)
+            package_fragments = []
+            for viewobj in views:
+                fragment = viewobj.render_package(package)
+                self.cache.set(self._fragment_entry_name(viewobj, package_id), fragment,
+                               last_modified[package_id])
+                package_fragments.append(fragment)
+            fragments[package_id] = package_fragments
+
+        for package_id in package_ids:
+            for viewobj, fragment in zip(views, fragments[package_id]):
+                viewobj.write_fragment(fragment)
+
+    def _fragment_entry_name(self, viewobj, package_id):
+        return "repomd-fragments/%s/%s/%s" % (viewobj.fragment_name, self.channel_id, package_id)
+
+    def _prune_fragments(self, views, package_ids):
+        """ Deletes the cached fragments of the packages not in package_ids """
+        package_ids = set(str(package_id) for package_id in package_ids)
+        for viewobj in views:
+            entry_dir = os.path.dirname(self._fragment_entry_name(viewobj, 0))
+            try:
+                cached = os.listdir(os.path.join(rhnCache.CACHEDIR, entry_dir))
+            except OSError:
+                continue
+            stale = [name for name in cached if name not in package_ids]
+            for name in stale:
+                try:
+                    self.cache.delete("%s/%s" % (entry_dir, name))
+                except (KeyError, OSError):
+                    pass
+            if stale:
+                log_debug(4, "Deleted %d cached %s fragments of channel %s"
+                          % (len(stale), viewobj.fragment_name, self.channel_id))
+
     def __get_channel(self):
         """ Late binding for the channel. """
         if self._channel is None:
@@ -335,16 +423,7 @@ class MetadataRepository:
             timestamp = int(time.mktime(time.strptime(self.last_modified,
                                                       "%Y%m%d%H%M%S")))
 
-            to_generate = []
-
-            if not self.repository.get_primary_cache():
-                to_generate.append(self.repository.get_primary_view())
-            if not self.repository.get_other_cache():
-                to_generate.append(self.repository.get_other_view())
-            if not self.repository.get_filelists_cache():
-                to_generate.append(self.repository.get_filelists_view())
-
-            self.repository.generate_files(to_generate)
+            self.repository.generate_missing_files()
 
             primary = self.__compute_checksums(timestamp,
                                                self.repository.get_primary_xml_file(),
@@ -436,11 +515,32 @@ def get_repository(channel):
 
 class NoTimeStampGzipFile(GzipFile):
 
-    def _write_gzip_header(self):
-        self.fileobj.write('\037\213')
-        self.fileobj.write('\010')
-        # no flags
-        self.fileobj.write('\x00')
-        write32u(self.fileobj, LongType(0))
-        self.fileobj.write('\002')
-        self.fileobj.write('\377')
+    """ GzipFile writing neither a timestamp nor a file name to the header. """
+
+    def __init__(self, filename=None, mode=None, compresslevel=9, fileobj=None):
+        GzipFile.__init__(self, filename='', mode=mode, compresslevel=compresslevel,
+                          fileobj=fileobj, mtime=0)
+
+
+class CompressingTeeFile:
+
+    """
+    Write the same metadata to an uncompressed and a gzip compressed file,
+    so the compressed variant does not need another pass over the data.
+    """
+
+    def __init__(self, fileobj, gz_fileobj):
+        self.fileobj = fileobj
+        self.gz_fileobj = gz_fileobj
+        self.gzip_file = NoTimeStampGzipFile(mode="wb", fileobj=gz_fileobj)
+
+    def write(self, data):
+        if not isinstance(data, bytes):
+            data = data.encode('utf-8')
+        self.fileobj.write(data)
+        self.gzip_file.write(data)
+
+    def close(self):
+        self.gzip_file.close()
+        self.gz_fileobj.close()
+        self.fileobj.close()
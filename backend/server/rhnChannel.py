@@ -28,7 +28,7 @@ except ImportError:
 from uyuni.common.usix import IntType, raise_with_tb
 
 # common module
-from spacewalk.common import rhnCache, rhnFlags, suseLib
+from spacewalk.common import rhnFlags, rhnSharedCache, suseLib
 from spacewalk.common.rhnConfig import CFG
 from spacewalk.common.rhnLog import log_debug, log_error
 from spacewalk.common.rhnException import rhnFault, rhnException
@@ -1121,15 +1121,15 @@ _query_all_packages_from_channel_checksum = """
 def list_all_packages_checksum_sql(channel_id):
     log_debug(3, channel_id)
     h = rhnSQL.prepare(_query_all_packages_from_channel_checksum)
-    h.execute(channel_id=str(channel_id))
-    ret = h.fetchall_dict()
-    if not ret:
-        return []
-    # process the results
-    ret = [(a["name"], a["version"], a["release"], a["epoch"],
-                         a["arch"], a["package_size"], a['checksum_type'],
-                         a['checksum']) for a in __stringify(ret)]
-    return ret
+    return _list_packages_checksum_rows(h.iterate(rows=rhnSQL.ROWS_NAMEDTUPLE,
+                                                  channel_id=str(channel_id)))
+
+
+def _list_packages_checksum_rows(rows):
+    # process the results as they are streamed from the database
+    return [__stringify((a.name, a.version, a.release, a.epoch, a.arch,
+                         a.package_size, a.checksum_type, a.checksum))
+            for a in rows]
 
 # This function executes the SQL call for listing latest packages with
 # checksum info
@@ -1202,29 +1202,17 @@ def list_packages_checksum_sql(channel_id):
     order by pn.name, arch_rank.rank desc
     """
     h = rhnSQL.prepare(query)
-    h.execute(channel_id=str(channel_id))
-    ret = h.fetchall_dict()
-    if not ret:
-        return []
-    # process the results
-    ret = [(a["name"], a["version"], a["release"], a["epoch"],
-                         a["arch"], a["package_size"], a['checksum_type'],
-                         a['checksum']) for a in __stringify(ret)]
-    return ret
+    return _list_packages_checksum_rows(h.iterate(rows=rhnSQL.ROWS_NAMEDTUPLE,
+                                                  channel_id=str(channel_id)))
 
 # This function executes the SQL call for listing packages
 
 
 def _list_packages_sql(query, channel_id):
     h = rhnSQL.prepare(query)
-    h.execute(channel_id=str(channel_id))
-    ret = h.fetchall_dict()
-    if not ret:
-        return []
-    # process the results
-    ret = [(a["name"], a["version"], a["release"], a["epoch"],
-                         a["arch"], a["package_size"]) for a in __stringify(ret)]
-    return ret
+    # process the results as they are streamed from the database
+    return [__stringify((a.name, a.version, a.release, a.epoch, a.arch, a.package_size))
+            for a in h.iterate(rows=rhnSQL.ROWS_NAMEDTUPLE, channel_id=str(channel_id))]
 
 
 def list_packages_sql(channel_id):
@@ -1470,15 +1458,12 @@ def list_all_packages_complete_sql(channel_id):
        and pdep.capability_id = pc.id
     """)
 
-    h.execute(channel_id=str(channel_id))
     # XXX This query has to order the architectures somehow; the 7.2 up2date
     # client was broken and was selecting the wrong architecture if athlons
     # are passed first. The rank ordering here should make sure that i386
     # kernels appear before athlons.
-    ret = h.fetchall_dict()
-    if not ret:
-        return []
-    for pkgi in ret:
+    ret = []
+    for pkgi in h.iterate(channel_id=str(channel_id)):
         pkgi['provides'] = []
         pkgi['requires'] = []
         pkgi['conflicts'] = []
@@ -1508,10 +1493,11 @@ def list_all_packages_complete_sql(channel_id):
                     version = " " + version
             dep = item['name'] + relation + version
             pkgi[item['capability_type']].append(dep)
-    # process the results
-    ret = [(a["name"], a["version"], a["release"], a["epoch"],
-                         a["arch"], a["package_size"], a['provides'],
-                         a['requires'], a['conflicts'], a['obsoletes'], a['recommends'], a['suggests'], a['supplements'], a['enhances'], a['breaks'], a['predepends']) for a in __stringify(ret)]
+        # process the results
+        a = __stringify(pkgi)
+        ret.append((a["name"], a["version"], a["release"], a["epoch"],
+                    a["arch"], a["package_size"], a['provides'],
+                    a['requires'], a['conflicts'], a['obsoletes'], a['recommends'], a['suggests'], a['supplements'], a['enhances'], a['breaks'], a['predepends']))
     return ret
 
 
@@ -1577,7 +1563,8 @@ def _list_packages(channel, cache_prefix, function):
     if not c_info:  # unknown channel
         raise rhnFault(40, "could not find any data on channel '%s'" % channel)
     cache_entry = "%s-%s" % (cache_prefix, channel)
-    ret = rhnCache.get(cache_entry, c_info["last_modified"])
+    # the mapped response is handed to the response writer as it is
+    ret = rhnSharedCache.get_buffer(cache_entry, c_info["last_modified"])
     if ret:  # we scored a cache hit
         log_debug(4, "Scored cache hit", channel)
         # Mark the response as being already XMLRPC-encoded
@@ -1597,7 +1584,7 @@ def _list_packages(channel, cache_prefix, function):
     # Mark the response as being already XMLRPC-encoded
     rhnFlags.set("XMLRPC-Encoded-Response", 1)
     # set the cache
-    rhnCache.set(cache_entry, ret, c_info["last_modified"])
+    rhnSharedCache.set(cache_entry, ret, c_info["last_modified"])
     return ret
 
 
@@ -1692,9 +1679,11 @@ def list_obsoletes(channel):
     if not c_info:  # unknown channel
         raise rhnFault(40, "could not find any data on channel '%s'" % channel)
     cache_entry = "list_obsoletes-%s" % channel
-    ret = rhnCache.get(cache_entry, c_info["last_modified"])
+    ret = rhnSharedCache.get_buffer(cache_entry, c_info["last_modified"])
     if ret:  # we scored a cache hit
         log_debug(4, "Scored cache hit", channel)
+        # Mark the response as being already XMLRPC-encoded
+        rhnFlags.set("XMLRPC-Encoded-Response", 1)
         return ret
 
     # Get the obsoleted packages
@@ -1752,8 +1741,11 @@ def list_obsoletes(channel):
         if key in hash:
             for p in hash[key]:
                 result.append(p)
+    result = xmlrpclib.dumps((result, ), methodresponse=1)
+    # Mark the response as being already XMLRPC-encoded
+    rhnFlags.set("XMLRPC-Encoded-Response", 1)
     # we can cache this now
-    rhnCache.set(cache_entry, result, c_info["last_modified"])
+    rhnSharedCache.set(cache_entry, result, c_info["last_modified"])
     return result
 
 
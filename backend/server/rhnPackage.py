@@ -260,6 +260,81 @@ def get_info_for_package(pkg, channel_id, org_id):
     return ret
 
 
+def package_info_key(name, version, release, epoch, arch):
+    """Key used by get_info_for_packages. yum repos report epoch="0" also
+    for packages without an epoch, so '0', '' and None are the same epoch"""
+    if epoch in ('0', '', None):
+        epoch = '0'
+    return (str(name), str(version), str(release), str(epoch), str(arch))
+
+
+def get_info_for_packages(pkgs, channel_id, org_id, page_size=1000):
+    """Set-based variant of get_info_for_package.
+
+    pkgs is an iterable of [name, version, release, epoch, arch] lists.
+    Returns a dict mapping package_info_key() of every package found in the
+    database to the list of rows get_info_for_package would have returned
+    for it (same columns, same order).
+    """
+    wanted = set(package_info_key(*pkg) for pkg in pkgs)
+    log_debug(3, "Looking up %s packages" % len(wanted))
+    ret = {}
+    if not wanted:
+        return ret
+
+    if org_id:
+        orgStatement = "p.org_id = %d" % int(org_id)
+    else:
+        orgStatement = "p.org_id is null"
+
+    # the VALUES placeholder must survive the string formatting below
+    statement = """
+    WITH wanted (name, version, release, epoch, arch) AS (
+      VALUES %%s
+    )
+    select wanted.name, wanted.version, wanted.release, wanted.epoch, wanted.arch,
+           p.path, cp.channel_id,
+           cv.checksum_type, cv.checksum, p.org_id, pe.epoch
+      from wanted
+      join rhnPackageName pn
+        on pn.name = wanted.name
+      join rhnPackageEVR pe
+        on pe.version = wanted.version
+       and pe.release = wanted.release
+       and coalesce(pe.epoch, '0') = wanted.epoch
+      join rhnPackageArch pa
+        on pa.label = wanted.arch
+      join rhnPackage p
+        on p.name_id = pn.id
+       and p.evr_id = pe.id
+       and p.package_arch_id = pa.id
+      left join rhnChannelPackage cp
+        on p.id = cp.package_id
+       and cp.channel_id = %d
+      join rhnChecksumView cv
+        on p.checksum_id = cv.id
+     where %s
+     order by wanted.name, wanted.version, wanted.release, wanted.epoch, wanted.arch,
+              cp.channel_id nulls last,
+              p.id desc
+    """ % (int(channel_id), orgStatement)
+
+    h = rhnSQL.prepare(statement)
+    rows = h.execute_values(statement, sorted(wanted), page_size=page_size) or []
+    for row in rows:
+        key = tuple(row[:5])
+        path, c_id, checksum_type, checksum, p_org_id, epoch = row[5:]
+        ret.setdefault(key, []).append({
+            'path': path,
+            'channel_id': c_id,
+            'checksum_type': checksum_type,
+            'checksum': checksum,
+            'org_id': _none2emptyString(p_org_id),
+            'epoch': epoch,
+        })
+    return ret
+
+
 def _none2emptyString(foo):
     if foo is None:
         return ""
@@ -29,6 +29,7 @@ from . import sql_row
 from . import sql_sequence
 from . import dbi
 from . import sql_types
+from . import sql_stats
 types = sql_types
 
 from .const import POSTGRESQL, SUPPORTED_BACKENDS
@@ -37,6 +38,9 @@ from .const import POSTGRESQL, SUPPORTED_BACKENDS
 from .sql_base import SQLError, SQLSchemaError, SQLConnectError, \
     SQLStatementPrepareError, Statement, ModifiedRowError
 
+# row types for Cursor.iterate()
+from .sql_base import ROWS_DICT, ROWS_TUPLE, ROWS_NAMEDTUPLE
+
 # ths module works with a private global __DB object that is
 # instantiated by the initDB call. This object/instance should NEVER,
 # EVER be exposed to the calling applications.
@@ -83,9 +87,13 @@ def initDB(backend=None, host=None, port=None, username=None,
     config files.
     """
 
+    prepare_threshold = 0
     if backend is None:
         if CFG is None or not CFG.is_initialized():
             initCFG('server')
+        prepare_threshold = int(CFG.get('db_prepare_threshold') or 0)
+        if int(CFG.get('db_statistics') or 0):
+            sql_stats.enable(CFG.get('db_statistics_dir'))
         backend = CFG.DB_BACKEND
         host = CFG.DB_HOST
         port = CFG.DB_PORT
@@ -124,6 +132,7 @@ def initDB(backend=None, host=None, port=None, username=None,
         #e_type, e_value = sys.exc_info()[:2]
         # raise rhnException("Could not initialize Oracle database connection",
         #                   str(e_type), str(e_value))
+    __test_DB().prepare_threshold = prepare_threshold
     return 0
 
 # close the database
@@ -207,6 +216,10 @@ def execute(sql, *args, **kwargs):
     return db.execute(sql, *args, **kwargs)
 
 
+def bulk_insert(table, columns, rows, ignore_conflicts=False):
+    return cursor().bulk_insert(table, columns, rows, ignore_conflicts)
+
+
 def fetchall_dict(sql, *args, **kwargs):
     h = prepare(sql)
     h.execute(sql, *args, **kwargs)
@@ -20,6 +20,9 @@
 import sys
 import string
 import re
+import time
+import functools
+import itertools
 import psycopg2
 import psycopg2.extras
 
@@ -29,15 +32,26 @@ if not hasattr(psycopg2, 'extensions'):
     import psycopg2.extensions
 
 from . import sql_base
+from . import sql_stats
 from rhn.UserDictCase import UserDictCase
 from spacewalk.server import rhnSQL
 
 from uyuni.common.usix import BufferType, raise_with_tb
-from spacewalk.common.rhnLog import log_debug, log_error
+from spacewalk.common.rhnLog import log_debug, log_debug_enabled, log_error
 from spacewalk.common.rhnException import rhnException
 from .const import POSTGRESQL
 
 
+_NAMED_PARAM_RE = re.compile(r'(\W):(\w+)')
+
+# Statements which can be prepared on the server
+_PREPARABLE_RE = re.compile(r'\s*(select|insert|update|delete|with|values)\b', re.I)
+
+# Unique names for the server-side prepared statements
+_prepared_statement_ids = itertools.count()
+
+
+@functools.lru_cache(maxsize=4096)
 def convert_named_query_params(query):
     """
     Convert a query with named parameters (i.e. :id, :name, etc) into one
@@ -45,16 +59,135 @@ def convert_named_query_params(query):
 
     python-psycopg2 requires parameters to be in this form, so to keep our
     existing queries intact we'll convert them when provided to the
-    postgresql driver.
+    postgresql driver. The result is memoized, as the same statements are
+    prepared over and over.
 
     RETURNS: the new query with parameters replaced
     """
-    log_debug(6, "Converting query for PostgreSQL: %s" % query)
-    new_query = re.sub(r'(\W):(\w+)', r'\1%(\2)s', query.replace('%', '%%'))
-    log_debug(6, "New query: %s" % new_query)
+    log_debug(6, "Converting query for PostgreSQL:", query)
+    new_query = _NAMED_PARAM_RE.sub(r'\1%(\2)s', query.replace('%', '%%'))
+    log_debug(6, "New query:", new_query)
     return new_query
 
 
+class PreparedStatements:
+
+    """
+    Server-side prepared statements of a connection.
+
+    A statement executed threshold times is prepared with PREPARE and later
+    executions run EXECUTE instead, so the server parses and plans it only
+    once. Statements the server can not prepare (e.g. because the type of a
+    parameter can not be inferred) keep being executed as they are.
+    """
+
+    # Limit on the statements counted and not prepared yet; queries with
+    # inlined values would otherwise grow the counters forever
+    max_counted = 10000
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        # statement -> number of executions
+        self._counts = {}
+        # statement -> EXECUTE statement, or None if it can not be prepared
+        self._statements = {}
+
+    def get(self, cursor, query):
+        """
+        Return the EXECUTE statement to run instead of query, which uses
+        named parameters, or None to run query itself.
+        """
+        if query in self._statements:
+            return self._statements[query]
+        count = self._counts.get(query, 0) + 1
+        if count < self.threshold:
+            if len(self._counts) >= self.max_counted:
+                self._counts.clear()
+            self._counts[query] = count
+            return None
+        self._counts.pop(query, None)
+        statement = self._statements[query] = self._prepare(cursor, query)
+        return statement
+
+    @staticmethod
+    def _prepare(cursor, query):
+        if not _PREPARABLE_RE.match(query):
+            return None
+        names = []
+
+        def placeholder(match):
+            name = match.group(2).lower()
+            if name not in names:
+                names.append(name)
+            return "%s$%d" % (match.group(1), names.index(name) + 1)
+        body = _NAMED_PARAM_RE.sub(placeholder, query)
+        name = "rhn_statement_%d" % next(_prepared_statement_ids)
+        # a failed PREPARE must not abort the transaction of the caller
+        cursor.execute("SAVEPOINT rhn_prepare")
+        try:
+            cursor.execute("PREPARE %s AS %s" % (name, body))
+        except psycopg2.Error:
+            e = sys.exc_info()[1]
+            cursor.execute("ROLLBACK TO SAVEPOINT rhn_prepare")
+            log_debug(4, "Unable to prepare statement:", e.pgerror)
+            return None
+        cursor.execute("RELEASE SAVEPOINT rhn_prepare")
+        log_debug(5, "Prepared statement", name, "for", query)
+        if not names:
+            return "EXECUTE %s" % name
+        return "EXECUTE %s (%s)" % (name, ", ".join("%%(%s)s" % n for n in names))
+
+
+# Unique names for the server-side cursors opened by Cursor.iterate()
+_named_cursor_ids = itertools.count()
+
+# Unique names for the temporary tables of Cursor.bulk_insert()
+_bulk_table_ids = itertools.count()
+
+_COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def _copy_value(value):
+    """ Format a value for COPY in text format """
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return value and 't' or 'f'
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return '\\\\x' + bytes(value).hex()
+    return str(value).translate(_COPY_ESCAPES)
+
+
+class CopyReader:
+
+    """
+    File-like object producing the rows of an iterable in the text format of
+    COPY ... FROM STDIN, without building the whole data set in memory.
+    """
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buffer = ''
+        self.count = 0
+
+    def read(self, size=-1):
+        chunks = [self._buffer]
+        length = len(self._buffer)
+        for row in self._rows:
+            line = '\t'.join([_copy_value(v) for v in row]) + '\n'
+            chunks.append(line)
+            length += len(line)
+            self.count += 1
+            if 0 <= size <= length:
+                break
+        data = ''.join(chunks)
+        if size < 0:
+            self._buffer = ''
+            return data
+        self._buffer = data[size:]
+        return data[:size]
+
+
 class Function(sql_base.Procedure):
 
     """
@@ -162,6 +295,10 @@ class Database(sql_base.Database):
             self.port = -1
 
         self.dbh = None
+        # number of executions after which a statement is prepared on the
+        # server, 0 disables server-side prepared statements
+        self.prepare_threshold = 0
+        self._prepared_statements = None
 
         sql_base.Database.__init__(self)
 
@@ -183,6 +320,8 @@ class Database(sql_base.Database):
                 raise AttributeError("Attribute sslrootcert needs to be set if sslmode is set.")
 
             self.dbh = psycopg2.connect(" ".join("%s=%s" % (k, re.escape(str(v))) for k, v in list(dsndata.items())))
+            # prepared statements belong to the session
+            self._prepared_statements = None
 
             # convert all DECIMAL types to float (let Python to choose one)
             DEC2INTFLOAT = psycopg2.extensions.new_type(psycopg2._psycopg.DECIMAL.values,
@@ -221,7 +360,10 @@ class Database(sql_base.Database):
             self.connect()  # only allow one try
 
     def prepare(self, sql, force=0, blob_map=None):
-        return Cursor(dbh=self.dbh, sql=sql, force=force, blob_map=blob_map)
+        if self.prepare_threshold > 0 and self._prepared_statements is None:
+            self._prepared_statements = PreparedStatements(self.prepare_threshold)
+        return Cursor(dbh=self.dbh, sql=sql, force=force, blob_map=blob_map,
+                      prepared_statements=self._prepared_statements)
 
     def execute(self, sql, *args, **kwargs):
         cursor = self.prepare(sql)
@@ -265,16 +407,19 @@ class Cursor(sql_base.Cursor):
 
     """ PostgreSQL specific wrapper over sql_base.Cursor. """
 
-    def __init__(self, dbh=None, sql=None, force=None, blob_map=None):
+    def __init__(self, dbh=None, sql=None, force=None, blob_map=None,
+                 prepared_statements=None):
 
         sql_base.Cursor.__init__(self, dbh, sql, force)
         self.blob_map = blob_map
+        self.prepared_statements = prepared_statements
 
         # Accept Oracle style named query params, but convert for python-pgsql
         # under the hood:
         temp_sql = ""
         if self.sql is not None:
             temp_sql = self.sql
+        self.named_sql = temp_sql
         self.sql = convert_named_query_params(temp_sql)
 
     def _prepare_sql(self):
@@ -282,10 +427,11 @@ class Cursor(sql_base.Cursor):
         return cursor
 
     def _execute_wrapper(self, function, *p, **kw):
-        params = ','.join(["%s: %s" % (key, value) for key, value
-                           in list(kw.items())])
-        log_debug(5, "Executing SQL: \"%s\" with bind params: {%s}"
-                  % (self.sql, params))
+        if log_debug_enabled(5):
+            params = ','.join(["%s: %s" % (key, value) for key, value
+                               in list(kw.items())])
+            log_debug(5, "Executing SQL: \"%s\" with bind params: {%s}"
+                      % (self.sql, params))
         if self.sql is None:
             raise rhnException("Cannot execute empty cursor")
         if self.blob_map:
@@ -295,6 +441,8 @@ class Cursor(sql_base.Cursor):
                 else:
                     kw[blob_var] = BufferType(kw[blob_var])
 
+        if sql_stats.enabled:
+            start = time.time()
         try:
             retval = function(*p, **kw)
         except psycopg2.InternalError:
@@ -311,6 +459,31 @@ class Cursor(sql_base.Cursor):
             e = sys.exc_info()[1]
             raise sql_base.SQLError("Unable to bound the following variable(s): %s"
                                     % (" ".join(e.args)))
+        if sql_stats.enabled:
+            retval = self._record_stats(function, p, time.time() - start, retval)
+        return retval
+
+    def _record_stats(self, function, args, elapsed, retval):
+        """
+        Records the execution in the SQL statistics. The rows are the ones
+        returned by a query (all fetched by execute) or modified by a DML
+        statement; the rows of iterate are counted as they are read.
+        """
+        statement = self.named_sql
+        if function == self._bulk_insert:
+            statement = "bulk insert into %s (%s)" % (args[0], ', '.join(args[1]))
+        elif not statement and function == self._execute_values:
+            statement = args[0]
+        if function == self._iterate:
+            sql_stats.record(statement, elapsed)
+            return sql_stats.count_rows(statement, retval)
+        if isinstance(retval, int):
+            rows = retval
+        elif isinstance(retval, list):
+            rows = len(retval)
+        else:
+            rows = self._real_cursor.rowcount
+        sql_stats.record(statement, elapsed, rows)
         return retval
 
     def _execute_(self, args, kwargs):
@@ -318,8 +491,11 @@ class Cursor(sql_base.Cursor):
         PostgreSQL specific execution of the query.
         """
         params = UserDictCase(kwargs)
+        sql = self.sql
+        if self.prepared_statements is not None:
+            sql = self.prepared_statements.get(self._real_cursor, self.named_sql) or sql
         try:
-            self._real_cursor.execute(self.sql, params)
+            self._real_cursor.execute(sql, params)
         except psycopg2.OperationalError:
             e = sys.exc_info()[1]
             raise sql_base.SQLError("Cannot execute SQL statement: %s" % str(e))
@@ -354,6 +530,58 @@ class Cursor(sql_base.Cursor):
         self.description = self._real_cursor.description
         return results
 
+    def _iterate(self, itersize, rows, **kwargs):
+        """
+        Iterate over the result set with a named (server-side) cursor: the
+        rows stay on the server and are fetched itersize at a time.
+        The cursor lives until the end of the transaction, so the caller
+        must not commit or roll back before the iteration ends.
+        """
+        cursor = self.dbh.cursor(name="rhn_iterate_%d" % next(_named_cursor_ids))
+        cursor.itersize = itersize
+        try:
+            cursor.execute(self.sql, UserDictCase(kwargs))
+        except psycopg2.OperationalError:
+            e = sys.exc_info()[1]
+            cursor.close()
+            raise sql_base.SQLError("Cannot execute SQL statement: %s" % str(e))
+        except:
+            cursor.close()
+            raise
+
+        def close():
+            try:
+                cursor.close()
+            except psycopg2.Error:
+                # the transaction already ended and took the cursor with it
+                pass
+        return sql_base.iter_rows(cursor, itersize, rows, close=close)
+
+    def _bulk_insert(self, table, columns, rows, ignore_conflicts=False):
+        """
+        Stream the rows with COPY into a temporary table and merge them
+        into table with a single INSERT ... SELECT.
+        """
+        columns = ', '.join(columns)
+        temp_table = "rhn_bulk_%d" % next(_bulk_table_ids)
+        cursor = self._real_cursor
+        cursor.execute("create temporary table %s on commit drop as select %s from %s with no data"
+                       % (temp_table, columns, table))
+        reader = CopyReader(rows)
+        try:
+            cursor.copy_expert("copy %s (%s) from stdin" % (temp_table, columns), reader)
+        except psycopg2.DataError:
+            e = sys.exc_info()[1]
+            raise sql_base.SQLError("Unable to copy rows into %s: %s" % (table, e.pgerror))
+        sql = "insert into %s (%s) select %s from %s" % (table, columns, columns, temp_table)
+        if ignore_conflicts:
+            sql += " on conflict do nothing"
+        cursor.execute(sql)
+        inserted = cursor.rowcount
+        cursor.execute("drop table %s" % temp_table)
+        log_debug(5, "Bulk insert into", table, "of", reader.count, "rows:", inserted, "inserted")
+        return inserted
+
     def update_blob(self, table_name, column_name, where_clause, data,
                     **kwargs):
         """
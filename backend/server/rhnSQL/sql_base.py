@@ -24,6 +24,7 @@
 #
 
 import sys
+import collections
 from . import sql_types
 from uyuni.common import usix
 
@@ -41,6 +42,49 @@ def ociDict(names=None, row=None):
     return data
 
 
+# Row types returned by Cursor.iterate()
+ROWS_DICT = 'dict'
+ROWS_TUPLE = 'tuple'
+ROWS_NAMEDTUPLE = 'namedtuple'
+
+# Default number of rows Cursor.iterate() fetches per round trip
+ITERSIZE = 2000
+
+
+def _row_factory(description, rows):
+    """ Return a function converting a fetched row into the requested row
+        type, or None if the row can be used as is. """
+    if rows == ROWS_TUPLE:
+        return None
+    names = [d[0].lower() for d in description]
+    if rows == ROWS_NAMEDTUPLE:
+        return collections.namedtuple('Row', names, rename=True)._make
+    return lambda row: dict(zip(names, row))
+
+
+def iter_rows(cursor, itersize, rows, close=None):
+    """ Yield the rows of an executed DB API cursor, fetching them itersize
+        at a time. The column names are read after the first fetch, since
+        server-side cursors only describe their result set then.
+        close, if given, is called once the iteration ends or is abandoned. """
+    try:
+        batch = cursor.fetchmany(itersize)
+        if not batch:
+            return
+        make_row = _row_factory(cursor.description, rows)
+        while batch:
+            if make_row is None:
+                for row in batch:
+                    yield row
+            else:
+                for row in batch:
+                    yield make_row(row)
+            batch = cursor.fetchmany(itersize)
+    finally:
+        if close is not None:
+            close()
+
+
 def __oci_name_value(names, value):
     """ Extract the name, value pair needed by ociDict function. """
     # the format of the names is
@@ -165,6 +209,30 @@ class Cursor:
         """
         return self._execute_wrapper(self._execute_values, sql, argslist, template, page_size, fetch)
 
+    def iterate(self, itersize=None, rows=ROWS_DICT, **kw):
+        """
+        Execute a query and return an iterator over its rows.
+
+        Unlike fetchall and fetchall_dict the result set is not loaded at
+        once: rows are fetched itersize at a time (ITERSIZE by default), so
+        memory use does not depend on the size of the result set.
+        rows is the type of the rows returned: ROWS_DICT (as fetchone_dict),
+        ROWS_TUPLE (as fetchone) or ROWS_NAMEDTUPLE.
+        The bind variables are passed as keyword arguments, as for execute.
+        """
+        if rows not in (ROWS_DICT, ROWS_TUPLE, ROWS_NAMEDTUPLE):
+            raise ValueError("Unknown row type %s" % rows)
+        return self._execute_wrapper(self._iterate, itersize or ITERSIZE, rows, **kw)
+
+    def bulk_insert(self, table, columns, rows, ignore_conflicts=False):
+        """
+        Insert many rows at once. rows is an iterable of sequences holding
+        the values of columns. With ignore_conflicts the rows violating a
+        unique constraint are skipped instead of failing the statement.
+        Returns the number of inserted rows.
+        """
+        return self._execute_wrapper(self._bulk_insert, table, columns, rows, ignore_conflicts)
+
     def _execute_wrapper(self, function, *p, **kw):
         """
         Database specific execute wrapper. Mostly used just to catch DB
@@ -184,9 +252,20 @@ class Cursor:
     def _executemany(self, *args, **kwargs):
         raise NotImplementedError()
 
+    def _iterate(self, itersize, rows, **kwargs):
+        """
+        Generic iteration over a regular cursor. Database drivers supporting
+        server-side cursors should override this.
+        """
+        self._execute(**kwargs)
+        return iter_rows(self._real_cursor, itersize, rows)
+
     def _execute_values(self, *args, **kwargs):
         raise NotImplementedError()
 
+    def _bulk_insert(self, *args, **kwargs):
+        raise NotImplementedError()
+
     def _execute_(self, args, kwargs):
         """ Database specific execution of the query. """
         raise NotImplementedError()
@@ -0,0 +1,310 @@
+#
+# Copyright (c) 2021 SUSE LLC
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Opt-in statistics of the SQL statements executed by a process.
+#
+# When enabled (db_statistics = 1 in rhn.conf) the cursors record, for each
+# statement, the number of executions, the total, maximum and 95th
+# percentile execution time, the number of rows it returned or modified and
+# the functions calling it. The statistics are aggregated in the process
+# and written as JSON to db_statistics_dir when the process exits or
+# receives SIGUSR2. Many executions of a cheap statement from the same
+# caller usually point to a query run once per item of a loop.
+#
+# The dumps are summarized with:
+#   python3 -m spacewalk.server.rhnSQL.sql_stats [options] [dump or dir ...]
+#
+
+import atexit
+import json
+import math
+import os
+import random
+import re
+import signal
+import sys
+import threading
+import time
+
+DEFAULT_DIR = "/var/log/rhn/sql-stats"
+
+# latencies kept per statement to compute the percentile
+MAX_SAMPLES = 1024
+
+# the statistics are only collected when this is set, see enable()
+enabled = False
+
+_dump_dir = None
+_started = None
+_stats = {}
+_lock = threading.Lock()
+_space_re = re.compile(r'\s+')
+_own_modules = ('spacewalk.server.rhnSQL', __name__)
+
+
+class StatementStats:
+
+    """ Execution statistics of a statement """
+
+    def __init__(self, statement):
+        self.statement = statement
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.samples = []
+        self.callers = {}
+
+    def add(self, elapsed, rows, caller):
+        self.count += 1
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+        self.rows += rows
+        self.callers[caller] = self.callers.get(caller, 0) + 1
+        # reservoir sampling keeps an even sample of all the executions
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.append(elapsed)
+        else:
+            i = random.randrange(self.count)
+            if i < MAX_SAMPLES:
+                self.samples[i] = elapsed
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        self.rows += other.rows
+        self.samples.extend(other.samples)
+        for caller, count in other.callers.items():
+            self.callers[caller] = self.callers.get(caller, 0) + count
+
+    def percentile(self, percent=95):
+        if not self.samples:
+            return 0.0
+        # nearest rank: the smallest sample with percent of them at or below it
+        samples = sorted(self.samples)
+        rank = int(math.ceil(len(samples) * percent / 100.0))
+        return samples[min(max(rank, 1), len(samples)) - 1]
+
+    def to_dict(self):
+        return {
+            'statement': self.statement,
+            'count': self.count,
+            'total': self.total,
+            'max': self.max,
+            'p95': self.percentile(95),
+            'rows': self.rows,
+            'callers': self.callers,
+            'samples': self.samples,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls(data['statement'])
+        for name in ('count', 'total', 'max', 'rows', 'callers', 'samples'):
+            setattr(stats, name, data[name])
+        return stats
+
+
+def normalize(statement):
+    """ Statement text used as key: the whitespace is collapsed """
+    return _space_re.sub(' ', statement).strip()
+
+
+def _caller():
+    """ module.function of the first caller outside of rhnSQL """
+    # pylint: disable=W0212
+    frame = sys._getframe(2)
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '?')
+        if not module.startswith(_own_modules):
+            return "%s.%s" % (module, frame.f_code.co_name)
+        frame = frame.f_back
+    return '?'
+
+
+def record(statement, elapsed, rows=0):
+    """ Records an execution of statement which took elapsed seconds """
+    key = normalize(statement)
+    caller = _caller()
+    with _lock:
+        stats = _stats.get(key)
+        if stats is None:
+            stats = _stats[key] = StatementStats(key)
+        stats.add(elapsed, max(rows or 0, 0), caller)
+
+
+def count_rows(statement, iterator):
+    """
+    Wraps an iterator over the rows of statement, adding the rows read to
+    the statistics of statement once the iteration ends
+    """
+    rows = 0
+    try:
+        for row in iterator:
+            rows += 1
+            yield row
+    finally:
+        key = normalize(statement)
+        with _lock:
+            stats = _stats.get(key)
+            if stats is not None:
+                stats.rows += rows
+
+
+def snapshot():
+    """ Returns copies of the statistics collected so far """
+    with _lock:
+        return [StatementStats.from_dict(s.to_dict()) for s in _stats.values()]
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+
+def dump(path=None):
+    """
+    Writes the statistics as JSON to path, by default a file named after
+    the program and the process id in the statistics directory.
+    Returns the name of the file written, or None without statistics.
+    """
+    statements = snapshot()
+    if not statements:
+        return None
+    if path is None:
+        program = os.path.basename(sys.argv[0] if sys.argv and sys.argv[0] else 'python')
+        path = os.path.join(_dump_dir or DEFAULT_DIR, "%s-%d.json" % (program, os.getpid()))
+    dirname = os.path.dirname(path)
+    if dirname and not os.path.isdir(dirname):
+        os.makedirs(dirname)
+    data = {
+        'pid': os.getpid(),
+        'argv': sys.argv,
+        'started': _started,
+        'dumped': time.time(),
+        'statements': [s.to_dict() for s in statements],
+    }
+    tmp_path = "%s.%d.tmp" % (path, os.getpid())
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.rename(tmp_path, path)
+    return path
+
+
+def _dump_at_exit():
+    try:
+        dump()
+    except (IOError, OSError):
+        e = sys.exc_info()[1]
+        sys.stderr.write("Unable to write the SQL statistics: %s\n" % e)
+
+
+def _dump_on_signal(signum, frame):
+    # pylint: disable=W0613
+    # The interrupted thread may hold _lock, which the dump needs: dump from
+    # another thread, which gets it once the handler returned
+    dumper = threading.Thread(target=_dump_at_exit, name="sql-stats-dump")
+    dumper.daemon = True
+    dumper.start()
+
+
+def enable(dump_dir=None):
+    """
+    Starts collecting the statistics, written to dump_dir on exit and on
+    SIGUSR2 (unless the process already handles that signal).
+    """
+    global enabled, _dump_dir, _started
+    _dump_dir = dump_dir
+    if enabled:
+        return
+    enabled = True
+    _started = time.time()
+    atexit.register(_dump_at_exit)
+    try:
+        if signal.getsignal(signal.SIGUSR2) in (signal.SIG_DFL, None):
+            signal.signal(signal.SIGUSR2, _dump_on_signal)
+    except ValueError:
+        # not in the main thread, e.g. under mod_wsgi
+        pass
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def load(paths):
+    """ Merges the statistics of the dumps found in paths (files or dirs) """
+    merged = {}
+    for path in paths:
+        if os.path.isdir(path):
+            files = [os.path.join(path, f) for f in sorted(os.listdir(path)) if f.endswith('.json')]
+        else:
+            files = [path]
+        for fname in files:
+            with open(fname) as f:
+                data = json.load(f)
+            for entry in data['statements']:
+                stats = StatementStats.from_dict(entry)
+                if stats.statement in merged:
+                    merged[stats.statement].merge(stats)
+                else:
+                    merged[stats.statement] = stats
+    return list(merged.values())
+
+
+SORT_KEYS = {
+    'total': lambda s: s.total,
+    'count': lambda s: s.count,
+    'p95': lambda s: s.percentile(95),
+    'max': lambda s: s.max,
+    'rows': lambda s: s.rows,
+}
+
+
+def report(statements, sort='total', limit=20, callers=3, out=sys.stdout):
+    """ Prints the limit statements with the highest sort key """
+    statements = sorted(statements, key=SORT_KEYS[sort], reverse=True)
+    if limit:
+        statements = statements[:limit]
+    out.write("%10s %10s %10s %10s %10s %12s  %s\n"
+              % ("count", "total s", "avg ms", "p95 ms", "max ms", "rows", "statement"))
+    for s in statements:
+        out.write("%10d %10.3f %10.3f %10.3f %10.3f %12d  %s\n"
+                  % (s.count, s.total, 1000.0 * s.total / max(s.count, 1),
+                     1000.0 * s.percentile(95), 1000.0 * s.max, s.rows, s.statement[:100]))
+        top = sorted(s.callers.items(), key=lambda c: c[1], reverse=True)[:callers]
+        for caller, count in top:
+            out.write("%10d %s called from %s\n" % (count, ' ' * 57, caller))
+
+
+def main(args=None):
+    from optparse import Option, OptionParser
+    parser = OptionParser(usage="%prog [options] [dump or directory ...]", option_list=[
+        Option('-s', '--sort', action='store', type='choice', choices=sorted(SORT_KEYS),
+               default='total', help="Sort by total (default), count, p95, max or rows"),
+        Option('-n', '--limit', action='store', type='int', default=20,
+               help="Number of statements printed (0 for all, default 20)"),
+        Option('-c', '--callers', action='store', type='int', default=3,
+               help="Number of callers printed per statement (default 3)"),
+    ])
+    options, paths = parser.parse_args(args)
+    statements = load(paths or [DEFAULT_DIR])
+    if not statements:
+        sys.stderr.write("No SQL statistics found\n")
+        return 1
+    report(statements, options.sort, options.limit, options.callers)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
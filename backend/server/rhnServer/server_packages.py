@@ -17,6 +17,7 @@
 # profiles.
 #
 
+import hashlib
 import sys
 import time
 from uyuni.common.usix import DictType, raise_with_tb
@@ -120,12 +121,18 @@ class dbPackage:
          where pa.id = lookup_package_arch(:arch)
     """)
 
+    # arch -> package type, the arches do not change at runtime
+    _package_types = {}
+
     def get_package_type_by_arch(self, arch):
+        if arch in self._package_types:
+            return self._package_types[arch]
         h = rhnSQL.prepare(self._query_get_package_type_by_arch)
         h.execute(arch=arch)
         row = h.fetchone_dict()
         if not row:
             return None
+        self._package_types[arch] = row['label']
         return row['label']
 
 
@@ -137,6 +144,8 @@ class Packages:
         # Have we loaded the packages or not?
         self.__loaded = 0
         self.__changed = 0
+        # Digest of the profile to store with the packages
+        self.__digest = None
 
     def add_package(self, sysid, entry):
         log_debug(4, sysid, entry)
@@ -195,12 +204,45 @@ class Packages:
         else:
             return None
 
+    _query_delete_packages = """
+        delete from rhnServerPackage sp
+         using (values %s) as d(server_id, name_id, evr_id, package_arch_id)
+         where sp.server_id = d.server_id
+           and sp.name_id = d.name_id
+           and sp.evr_id = d.evr_id
+           and ((d.package_arch_id is null and sp.package_arch_id is null)
+               or sp.package_arch_id = d.package_arch_id)
+    """
+
+    # The ids are looked up for all the packages at once, the lookup
+    # functions only run to create the missing names and EVRs
+    _query_insert_packages = """
+        insert into rhnServerPackage
+               (server_id, name_id, evr_id, package_arch_id, installtime)
+        select w.server_id,
+               coalesce(pn.id, lookup_package_name(w.n)),
+               coalesce(pe.id, lookup_evr(w.e, w.v, w.r, w.t)),
+               coalesce(pa.id, lookup_package_arch(w.a)),
+               TO_TIMESTAMP(w.instime, 'YYYY-MM-DD HH24:MI:SS')
+          from (values %s) as w(server_id, n, e, v, r, a, t, instime)
+          left join rhnPackageName pn
+            on pn.name = w.n
+          left join rhnPackageEVR pe
+            on pe.version = w.v
+           and pe.release = w.r
+           and ((pe.epoch is null and w.e is null) or pe.epoch = w.e)
+           and (pe.evr).type = w.t
+          left join rhnPackageArch pa
+            on pa.label = w.a
+    """
+
     def save_packages_byid(self, sysid, schedule=1):
         """ save the package list """
         log_debug(3, sysid, "Errata cache to run:", schedule,
                   "Changed:", self.__changed, "%d total packages" % len(self.__p))
 
         if not self.__changed:
+            self.__save_profile_digest(sysid)
             return 0
 
         commits = 0
@@ -209,20 +251,11 @@ class Packages:
         dlist = [a for a in list(self.__p.values()) if a.real and a.status in (DELETED, UPDATED)]
         if dlist:
             log_debug(4, sysid, len(dlist), "deleted packages")
-            h = rhnSQL.prepare("""
-            delete from rhnServerPackage
-            where server_id = :sysid
-            and name_id = :name_id
-            and evr_id = :evr_id
-            and ((:package_arch_id is null and package_arch_id is null)
-                or package_arch_id = :package_arch_id)
-            """)
-            h.executemany(**{
-                'sysid': [sysid] * len(dlist),
-                'name_id': [a.name_id for a in dlist],
-                'evr_id': [a.evr_id for a in dlist],
-                'package_arch_id': [a.package_arch_id for a in dlist],
-            })
+            h = rhnSQL.prepare(self._query_delete_packages)
+            h.execute_values(self._query_delete_packages,
+                             [(sysid, a.name_id, a.evr_id, a.package_arch_id) for a in dlist],
+                             template="(%s::numeric, %s::numeric, %s::numeric, %s::numeric)",
+                             fetch=False)
             commits = commits + len(dlist)
             del dlist
 
@@ -230,32 +263,14 @@ class Packages:
         alist = [a for a in list(self.__p.values()) if a.status in (ADDED, UPDATED)]
         if alist:
             log_debug(4, sysid, len(alist), "added packages")
-            h = rhnSQL.prepare("""
-            insert into rhnServerPackage
-            (server_id, name_id, evr_id, package_arch_id, installtime)
-            values (:sysid, LOOKUP_PACKAGE_NAME(:n), LOOKUP_EVR(:e, :v, :r, :t),
-                LOOKUP_PACKAGE_ARCH(:a), TO_TIMESTAMP(:instime, 'YYYY-MM-DD HH24:MI:SS')
-            )
-            """)
+            h = rhnSQL.prepare(self._query_insert_packages)
             # some fields are not allowed to contain empty string (varchar)
-
-            def lambdaae(a):
-                if a.e == '':
-                    return None
-                else:
-                    return a.e
-            package_data = {
-                'sysid': [sysid] * len(alist),
-                'n': [a.n for a in alist],
-                'v': [a.v for a in alist],
-                'r': [a.r for a in alist],
-                'e': list(map(lambdaae, alist)),
-                'a': [a.a for a in alist],
-                't': [a.t for a in alist],
-                'instime': [self.__expand_installtime(a.installtime) for a in alist],
-            }
+            package_data = [(sysid, a.n, a.e or None, a.v, a.r, a.a, a.t,
+                             self.__expand_installtime(a.installtime)) for a in alist]
             try:
-                h.executemany(**package_data)
+                h.execute_values(self._query_insert_packages, package_data,
+                                 template="(%s::numeric, %s, %s, %s, %s, %s, %s, %s)",
+                                 fetch=False)
                 rhnSQL.commit()
             except rhnSQL.SQLSchemaError:
                 e = sys.exc_info()[1]
@@ -267,6 +282,8 @@ class Packages:
             commits = commits + len(alist)
             del alist
 
+        self.__save_profile_digest(sysid)
+
         if schedule:
             # queue this server for an errata update
             update_errata_cache(sysid)
@@ -281,6 +298,37 @@ class Packages:
         self.__changed = 0
         return 0
 
+    def set_profile_digest(self, digest):
+        """ digest (see profile_digest) is stored by the next save_packages_byid,
+            as the digest of the complete package list of the server """
+        self.__digest = digest
+
+    def __save_profile_digest(self, sysid):
+        if self.__digest is None:
+            return
+        # after the packages: any change of rhnServerPackage removes the digest
+        h = rhnSQL.prepare("""
+            insert into suseServerPackageProfile (server_id, digest)
+            values (:sysid, :digest)
+            on conflict (server_id) do update
+               set digest = excluded.digest,
+                   modified = current_timestamp
+        """)
+        h.execute(sysid=sysid, digest=self.__digest)
+        self.__digest = None
+
+    def profile_unchanged(self, sysid, digest):
+        """ Returns true if digest is the one of the package list stored for
+            the server """
+        h = rhnSQL.prepare("""
+            select digest
+              from suseServerPackageProfile
+             where server_id = :sysid
+        """)
+        h.execute(sysid=sysid)
+        row = h.fetchone_dict()
+        return row is not None and row['digest'] == digest
+
     _query_get_package_arches = rhnSQL.Statement("""
         select id, label
           from rhnPackageArch
@@ -427,6 +475,22 @@ class Packages:
         return action_id
 
 
+def profile_digest(packages):
+    """ Returns the digest of a package profile, a list of package dicts
+        as sent by the clients. The digest does not depend on the order of
+        the packages nor on the notation of an empty epoch. """
+    entries = []
+    for p in packages:
+        epoch = p.get('epoch')
+        if epoch is None or str(epoch).lower() in ("", "(none)"):
+            epoch = ""
+        entries.append("\t".join(str(x) for x in (
+            p.get('name'), p.get('version'), p.get('release'), epoch,
+            p.get('arch') or "", p.get('installtime') or "")))
+    entries.sort()
+    return hashlib.sha256("\n".join(entries).encode('utf-8')).hexdigest()
+
+
 def update_errata_cache(server_id):
     """ Queue an update the the server's errata cache. This queues for
         Taskomatic instead of doing it in-line because updating many servers
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2021 SUSE LLC
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+"""
+Load test of the cached listAllPackagesChecksum response.
+
+Without arguments a response for a channel of 50000 packages is generated
+and served by a number of worker processes, as the Apache/WSGI workers do,
+from the pickled rhnCache entry used before and from the shared memory
+mapped rhnSharedCache entry. With --compress the response is also zlib
+compressed, as it is for the clients.
+
+With --db CHANNEL the workers call rhnChannel.list_all_packages_checksum
+for CHANNEL against the database configured in /etc/rhn/rhn.conf.
+
+Usage: python list_packages_loadtest.py [--compress] [--db CHANNEL]
+                                        [workers [seconds [packages]]]
+"""
+
+import multiprocessing
+import shutil
+import sys
+import tempfile
+import time
+import zlib
+
+try:
+    #  python 2
+    import xmlrpclib
+except ImportError:
+    #  python3
+    import xmlrpc.client as xmlrpclib
+
+from spacewalk.common import rhnCache, rhnSharedCache
+
+MODIFIED = '20210301120000'
+ENTRY = "list_all_packages_checksum-loadtest"
+
+
+def build_response(count):
+    packages = [("package-%d" % (i // 5), "1.%d" % (i % 5), "%d.el8" % i, "", "x86_64",
+                 "%d" % (100000 + i), "sha256", "%064x" % i, "loadtest-channel")
+                for i in range(count)]
+    return xmlrpclib.dumps((packages, ), methodresponse=1)
+
+
+def worker(get, seconds, compress, results, init=None):
+    if init is not None:
+        init()
+    requests = 0
+    size = 0
+    end = time.time() + seconds
+    while time.time() < end:
+        response = get()
+        if isinstance(response, str):
+            response = response.encode()
+        if compress:
+            response = zlib.compress(response, 6)
+        size = len(response)
+        requests += 1
+    results.put((requests, size))
+
+
+def run(name, get, workers, seconds, compress, init=None):
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=worker, args=(get, seconds, compress, results, init))
+                 for _ in range(workers)]
+    for p in processes:
+        p.start()
+    counts = [results.get() for _ in processes]
+    for p in processes:
+        p.join()
+    requests = sum(c[0] for c in counts)
+    print("%-22s %8d requests %10.1f requests/s  (%d workers, %.1f MiB responses)"
+          % (name, requests, requests / float(seconds), workers, counts[0][1] / 1024.0 / 1024))
+
+
+def get_rhncache():
+    return rhnCache.get(ENTRY, MODIFIED)
+
+
+def get_shared_cache():
+    return rhnSharedCache.get_buffer(ENTRY, MODIFIED)
+
+
+def bench_cache(workers, seconds, packages, compress):
+    cachedir = tempfile.mkdtemp()
+    rhnCache.CACHEDIR = cachedir
+    try:
+        response = build_response(packages)
+        rhnCache.set(ENTRY, response, MODIFIED)
+        rhnSharedCache.set(ENTRY, response, MODIFIED)
+        assert get_rhncache() == response
+        assert get_shared_cache()[:] == response.encode()
+        print("%d packages in the channel" % packages)
+        run("rhnCache (pickle)", get_rhncache, workers, seconds, compress)
+        run("rhnSharedCache (mmap)", get_shared_cache, workers, seconds, compress)
+    finally:
+        shutil.rmtree(cachedir)
+
+
+def bench_database(channel, workers, seconds, compress):
+    from spacewalk.common.rhnConfig import initCFG
+    from spacewalk.server import rhnSQL, rhnChannel
+
+    def init():
+        initCFG("server.xmlrpc")
+        rhnSQL.initDB()
+
+    def get():
+        return rhnChannel.list_all_packages_checksum(channel)
+
+    # fill the cache
+    init()
+    get()
+    rhnSQL.closeDB()
+    run("listAllPackagesChecksum", get, workers, seconds, compress, init)
+
+
+def main():
+    args = sys.argv[1:]
+    compress = '--compress' in args
+    if compress:
+        args.remove('--compress')
+    channel = None
+    if '--db' in args:
+        i = args.index('--db')
+        channel = args[i + 1]
+        del args[i:i + 2]
+    workers = int(args[0]) if args else multiprocessing.cpu_count()
+    seconds = int(args[1]) if len(args) > 1 else 10
+    packages = int(args[2]) if len(args) > 2 else 50000
+    if channel:
+        bench_database(channel, workers, seconds, compress)
+    else:
+        bench_cache(workers, seconds, packages, compress)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2021 SUSE LLC
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+"""
+Measure the prepare() + execute() throughput of the PostgreSQL rhnSQL driver.
+
+Without arguments the driver runs on a do-nothing DB API connection, which
+isolates the overhead of the driver itself, and is compared with the driver
+as it was before the converted statements were memoized and the debug
+message was built lazily.
+
+With --db the statement runs against the database configured in
+/etc/rhn/rhn.conf, with and without server-side prepared statements.
+
+Usage: python rhnsql_execute_benchmark.py [--db] [number of executions]
+"""
+
+import re
+import sys
+import time
+
+from spacewalk.common.rhnLog import log_debug
+from spacewalk.server import rhnSQL
+from spacewalk.server.rhnSQL import sql_base, driver_postgresql
+
+QUERY = """
+    select p.id, p.org_id, p.package_size
+      from rhnPackage p
+      join rhnChannelPackage cp on cp.package_id = p.id
+     where cp.channel_id = :channel_id
+       and p.name_id = :name_id
+       and p.evr_id = :evr_id
+       and p.package_arch_id = :package_arch_id
+"""
+
+PARAMS = {'channel_id': 101, 'name_id': 2002, 'evr_id': 30003, 'package_arch_id': 4}
+
+
+class NullCursor:
+
+    description = None
+    rowcount = 0
+
+    def execute(self, sql, params=None):
+        pass
+
+
+class NullConnection:
+
+    def cursor(self, name=None):
+        return NullCursor()
+
+
+class LegacyCursor(driver_postgresql.Cursor):
+
+    """ The driver cursor converting every statement and always formatting
+        the debug message """
+
+    def __init__(self, dbh=None, sql=None, force=None, blob_map=None):
+        sql_base.Cursor.__init__(self, dbh, sql, force)
+        self.blob_map = blob_map
+        self.prepared_statements = None
+        self.named_sql = sql
+        self.sql = re.sub(r'(\W):(\w+)', r'\1%(\2)s', sql.replace('%', '%%'))
+
+    def _execute_wrapper(self, function, *p, **kw):
+        params = ','.join(["%s: %s" % (key, value) for key, value
+                           in list(kw.items())])
+        log_debug(5, "Executing SQL: \"%s\" with bind params: {%s}"
+                  % (self.sql, params))
+        return driver_postgresql.Cursor._execute_wrapper(self, function, *p, **kw)
+
+
+def run(prepare, count):
+    start = time.time()
+    for i in range(count):
+        h = prepare(QUERY)
+        h.execute(**PARAMS)
+    elapsed = time.time() - start
+    return elapsed, count / elapsed
+
+
+def report(name, result):
+    print("%-28s %8.3fs %10.0f executions/s" % (name, result[0], result[1]))
+
+
+def bench_driver(count):
+    dbh = NullConnection()
+    report("legacy driver", run(lambda sql: LegacyCursor(dbh=dbh, sql=sql), count))
+    report("current driver", run(lambda sql: driver_postgresql.Cursor(dbh=dbh, sql=sql), count))
+
+
+def bench_database(count):
+    rhnSQL.initDB()
+    report("plain statements", run(rhnSQL.prepare, count))
+    rhnSQL.rollback()
+
+    statements = driver_postgresql.PreparedStatements(2)
+
+    def prepare(sql):
+        h = rhnSQL.prepare(sql)
+        h.prepared_statements = statements
+        return h
+    report("prepared statements", run(prepare, count))
+    rhnSQL.rollback()
+
+
+def main():
+    args = sys.argv[1:]
+    use_db = '--db' in args
+    if use_db:
+        args.remove('--db')
+    count = int(args[0]) if args else 100000
+    if use_db:
+        bench_database(count)
+    else:
+        bench_driver(count)
+
+
+if __name__ == '__main__':
+    main()
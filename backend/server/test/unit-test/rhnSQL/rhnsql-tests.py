@@ -21,7 +21,7 @@ NOTE: Not hitting the database here!
 
 import unittest
 
-from spacewalk.server.rhnSQL.driver_postgresql import convert_named_query_params
+from spacewalk.server.rhnSQL.driver_postgresql import convert_named_query_params, CopyReader
 
 
 class RhnSQLTests(unittest.TestCase):
@@ -55,3 +55,23 @@ class RhnSQLTests(unittest.TestCase):
         expected_query = "SELECT TO_CHAR(issued, 'YYYY-MM-DD HH24:MI:SS') issued FROM rhnSatelliteCert WHERE id=%(id)s, name=%(name)s"
         new_query = convert_named_query_params(query)
         self.assertEqual(expected_query, new_query)
+
+    def test_copy_reader_escapes_values(self):
+        reader = CopyReader([(1, None, "tab\there", "line\nbreak\\"), (2, True, b"\x01\xff", "")])
+        expected = "1\t\\N\ttab\\there\tline\\nbreak\\\\\n" \
+                   "2\tt\t\\\\x01ff\t\n"
+        self.assertEqual(expected, reader.read())
+        self.assertEqual("", reader.read())
+        self.assertEqual(2, reader.count)
+
+    def test_copy_reader_sized_reads(self):
+        rows = [(i, "name%d" % i) for i in range(100)]
+        reader = CopyReader(rows)
+        chunks = []
+        while True:
+            chunk = reader.read(7)
+            if not chunk:
+                break
+            self.assertTrue(len(chunk) <= 7)
+            chunks.append(chunk)
+        self.assertEqual("".join("%d\tname%d\n" % (i, i) for i in range(100)), "".join(chunks))
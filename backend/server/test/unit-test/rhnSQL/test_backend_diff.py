@@ -0,0 +1,102 @@
+#!/usr/bin/python
+#
+# Copyright (c) 2021 SUSE LLC
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+# Tests Backend._do_diff against a scratch table
+#
+
+import os
+import unittest
+from spacewalk.server import rhnSQL
+from spacewalk.server.importlib.backend import Backend
+
+import misc_functions
+
+DB_SETTINGS = misc_functions.db_settings("postgresql")
+
+
+class DiffTest(unittest.TestCase):
+
+    def setUp(self):
+        self.table_name = "misatestdiff_%d" % os.getpid()
+        rhnSQL.initDB(
+            backend="postgresql",
+            username=DB_SETTINGS["user"],
+            password=DB_SETTINGS["password"],
+            database=DB_SETTINGS["database"],
+            host=DB_SETTINGS["host"]
+        )
+        self._cleanup()
+
+        rhnSQL.execute("create table %s (file_id numeric not null, package_id numeric, name varchar(64))"
+                       % self.table_name)
+        rhnSQL.execute("insert into %s (file_id, package_id, name) values "
+                       "(1, null, 'a'), (1, 2, 'b'), (1, 3, 'c'), (2, 5, 'e'), (9, 9, 'other')"
+                       % self.table_name)
+        rhnSQL.commit()
+        self.backend = Backend(rhnSQL)
+
+    def _cleanup(self):
+        try:
+            rhnSQL.execute("drop table %s" % self.table_name)
+        except rhnSQL.SQLStatementPrepareError:
+            pass
+
+    def tearDown(self):
+        rhnSQL.rollback()
+        self._cleanup()
+
+        rhnSQL.commit()
+
+    def _rows(self):
+        h = rhnSQL.prepare("select file_id, package_id, name from %s" % self.table_name)
+        h.execute()
+        return sorted(((int(r[0]), r[1] is not None and int(r[1]) or None, r[2]) for r in h.fetchall()),
+                      key=str)
+
+    def _diff(self):
+        data = [
+            # unchanged, with a NULL in a unique field
+            {'file_id': 1, 'package_id': None, 'name': 'a'},
+            # duplicate keys, the last one wins
+            {'file_id': 1, 'package_id': 2, 'name': 'stale'},
+            {'file_id': 1, 'package_id': 2, 'name': 'B'},
+            {'file_id': 1, 'package_id': 4, 'name': 'd'},
+            {'file_id': 2, 'package_id': None, 'name': 'n'},
+        ]
+        return self.backend._do_diff(data, self.table_name, ['file_id', 'package_id'], ['name'])
+
+    def _check(self, stats):
+        self.assertEqual({'insert': 2, 'update': 1, 'delete': 2}, stats)
+        self.assertEqual(sorted([(1, None, 'a'), (1, 2, 'B'), (1, 4, 'd'), (2, None, 'n'), (9, 9, 'other')],
+                                key=str), self._rows())
+        # a second run has nothing left to do
+        self.assertEqual({'insert': 0, 'update': 0, 'delete': 0}, self._diff())
+
+    def test_diff(self):
+        self._check(self._diff())
+
+    def test_diff_copy(self):
+        self.backend.copy_threshold = 2
+        self._check(self._diff())
+
+    def test_diff_no_data(self):
+        self.assertEqual({'insert': 0, 'update': 0, 'delete': 0},
+                         self.backend._do_diff([], self.table_name, ['file_id', 'package_id'], ['name']))
+        self.assertEqual(5, len(self._rows()))
+
+    def test_diff_null_first_field(self):
+        self.assertRaises(Exception, self.backend._do_diff,
+                          [{'file_id': None, 'package_id': 1, 'name': 'x'}],
+                          self.table_name, ['file_id', 'package_id'], ['name'])
+
+
+if __name__ == "__main__":
+    unittest.main()
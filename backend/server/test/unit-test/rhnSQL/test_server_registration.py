@@ -225,6 +225,34 @@ class Tests(unittest.TestCase):
 
         self.assertEqual(sgs, sgstgt)
 
+    def test_update_packages_profile_digest(self):
+        "An unchanged package profile is not saved again"
+        u, password = self._create_new_user()
+        params = build_new_system_params_with_username(username=u.contact['login'],
+                                                       password=password, os_release="2.1as")
+        system_id = register_new_system(params)
+        rhnSQL.commit()
+        server_id = rhnServer.get(system_id).getid()
+
+        packages = [
+            {'name': 'unittest-pkg-a', 'version': '1.0', 'release': '1', 'epoch': '', 'arch': 'i386'},
+            {'name': 'unittest-pkg-b', 'version': '2.0', 'release': '3', 'epoch': '1', 'arch': 'noarch'},
+        ]
+        registration.Registration().update_packages(system_id, packages)
+        created = fetch_package_rows(server_id)
+        self.assertEqual(2, len(created))
+
+        # same profile in another order: nothing is written
+        registration.Registration().update_packages(system_id, packages[::-1])
+        self.assertEqual(created, fetch_package_rows(server_id))
+
+        # a change of rhnServerPackage invalidates the digest
+        h = rhnSQL.prepare("delete from rhnServerPackage where server_id = :sid")
+        h.execute(sid=server_id)
+        rhnSQL.commit()
+        registration.Registration().update_packages(system_id, packages)
+        self.assertEqual(2, len(fetch_package_rows(server_id)))
+
     def _create_new_user(self):
         # Create new org
         org_id = misc_functions.create_new_org()
@@ -289,5 +317,16 @@ def register_new_system(params):
     return registration.Registration().new_system(params)
 
 
+def fetch_package_rows(server_id):
+    h = rhnSQL.prepare("""
+        select name_id, evr_id, package_arch_id, created
+          from rhnServerPackage
+         where server_id = :sid
+         order by name_id
+    """)
+    h.execute(sid=server_id)
+    return h.fetchall_dict() or []
+
+
 if __name__ == '__main__':
     sys.exit(unittest.main() or 0)
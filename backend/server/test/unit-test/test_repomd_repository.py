@@ -0,0 +1,100 @@
+#!/usr/bin/python
+#
+# Copyright (c) 2021 SUSE LLC
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    from unittest.mock import Mock, patch
+except ImportError:
+    from mock import Mock, patch
+
+from spacewalk.common import rhnCache
+from spacewalk.server.repomd import repository
+
+
+class FakeView:
+
+    def __init__(self, fragment_name):
+        self.fragment_name = fragment_name
+        self.fileobj = Mock()
+        self.fragments = []
+        self.rendered = []
+
+    def write_start(self):
+        pass
+
+    def write_end(self):
+        pass
+
+    def render_package(self, package):
+        self.rendered.append(int(package.id))
+        return "<%s id='%s'/>" % (self.fragment_name, package.id)
+
+    def write_fragment(self, fragment):
+        self.fragments.append(fragment)
+
+
+class FragmentsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cachedir = patch.object(rhnCache, 'CACHEDIR', self.tmpdir)
+        self.cachedir.start()
+        package_mapper = Mock()
+        package_mapper.last_modified_batch = lambda ids: dict((i, 1000000000 + i) for i in ids)
+        package_mapper.get_packages = lambda ids: [Mock(id=str(i)) for i in ids]
+        self.mapper = patch.object(repository.mapper, 'get_package_mapper', Mock(return_value=package_mapper))
+        self.mapper.start()
+
+    def tearDown(self):
+        self.mapper.stop()
+        self.cachedir.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def _generate(self, channel_id, package_ids):
+        repo = repository.Repository({'id': channel_id, 'last_modified': None})
+        repo._channel = Mock(package_ids=package_ids)
+        view = FakeView("primary")
+        repo.generate_files([view])
+        return view
+
+    def _cached(self, channel_id):
+        path = os.path.join(self.tmpdir, "repomd-fragments", "primary", str(channel_id))
+        return sorted(int(name) for name in os.listdir(path))
+
+    def test_fragments_reused(self):
+        view = self._generate(1, [10, 11])
+        self.assertEqual([10, 11], view.rendered)
+        view = self._generate(1, [10, 11, 12])
+        self.assertEqual([12], view.rendered)
+        self.assertEqual(["<primary id='%d'/>" % i for i in (10, 11, 12)], view.fragments)
+
+    def test_stale_fragments_deleted(self):
+        self._generate(1, [10, 11, 12])
+        self._generate(2, [10, 11])
+        self.assertEqual([10, 11, 12], self._cached(1))
+
+        view = self._generate(1, [11, 13])
+        self.assertEqual([13], view.rendered)
+        self.assertEqual([11, 13], self._cached(1))
+        # the other channel keeps its fragments
+        self.assertEqual([10, 11], self._cached(2))
+
+        self._generate(1, [])
+        self.assertEqual([], self._cached(1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+#!/usr/bin/python
+#
+# Copyright (c) 2021 SUSE LLC
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+#
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+try:
+    from io import StringIO
+except ImportError:
+    from StringIO import StringIO
+
+from spacewalk.server.rhnSQL import sql_stats
+
+
+def lookup():
+    sql_stats.record("select id\n  from rhnPackageName\n where name = :name", 0.002, 1)
+
+
+class Tests(unittest.TestCase):
+    # pylint: disable=R0904
+
+    def setUp(self):
+        sql_stats.reset()
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        sql_stats.reset()
+        sql_stats._dump_dir = None
+        shutil.rmtree(self.tmpdir)
+
+    def test_record(self):
+        for _ in range(10):
+            lookup()
+        sql_stats.record("select 1", 0.5, 0)
+        stats = dict((s.statement, s) for s in sql_stats.snapshot())
+
+        s = stats["select id from rhnPackageName where name = :name"]
+        self.assertEqual(10, s.count)
+        self.assertEqual(10, s.rows)
+        self.assertAlmostEqual(0.02, s.total)
+        self.assertAlmostEqual(0.002, s.percentile(95))
+        self.assertEqual({__name__ + '.lookup': 10}, s.callers)
+        self.assertEqual(0.5, stats["select 1"].max)
+
+    def test_count_rows(self):
+        sql_stats.record("select name from rhnPackageName", 0.1)
+        rows = list(sql_stats.count_rows("select name from rhnPackageName", iter(range(5))))
+        self.assertEqual(5, len(rows))
+        self.assertEqual(5, sql_stats.snapshot()[0].rows)
+
+    def test_percentile(self):
+        s = sql_stats.StatementStats("select 1")
+        for i in range(1, 101):
+            s.add(i / 1000.0, 0, "caller")
+        self.assertEqual(0.095, s.percentile(95))
+        self.assertEqual(0.001, s.percentile(0))
+        self.assertEqual(0.1, s.percentile(100))
+        self.assertEqual(0.1, s.max)
+
+        for i in range(10 * sql_stats.MAX_SAMPLES):
+            s.add(0.001, 0, "caller")
+        self.assertEqual(sql_stats.MAX_SAMPLES, len(s.samples))
+
+    def test_dump_on_signal(self):
+        sql_stats._dump_dir = self.tmpdir
+        lookup()
+        # the signal interrupts a thread holding the lock: the dump waits for it
+        with sql_stats._lock:
+            sql_stats._dump_on_signal(None, None)
+            dumper = [t for t in threading.enumerate() if t.name == "sql-stats-dump"][0]
+            dumper.join(0.1)
+            self.assertTrue(dumper.is_alive())
+        dumper.join(5)
+        self.assertFalse(dumper.is_alive())
+        self.assertEqual(1, len(sql_stats.load([self.tmpdir])))
+
+    def test_dump_load(self):
+        lookup()
+        sql_stats.dump(os.path.join(self.tmpdir, "one.json"))
+        lookup()
+        sql_stats.dump(os.path.join(self.tmpdir, "two.json"))
+
+        statements = sql_stats.load([self.tmpdir])
+        self.assertEqual(1, len(statements))
+        self.assertEqual(3, statements[0].count)
+
+        out = StringIO()
+        sql_stats.report(statements, sort='count', out=out)
+        self.assertIn("rhnPackageName", out.getvalue())
+        self.assertIn(__name__ + '.lookup', out.getvalue())
+
+
+if __name__ == '__main__':
+    sys.exit(unittest.main() or 0)
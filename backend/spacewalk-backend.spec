@@ -691,6 +691,8 @@ fi
 %{python3rhnroot}/satellite_tools/reposync.py*
 %{python3rhnroot}/satellite_tools/constants.py*
 %{python3rhnroot}/satellite_tools/download.py*
+%{python3rhnroot}/satellite_tools/import_pool.py*
+%{python3rhnroot}/satellite_tools/file_verify.py*
 %{python3rhnroot}/satellite_tools/ulnauth.py*
 %dir %{python3rhnroot}/satellite_tools/disk_dumper
 %{python3rhnroot}/satellite_tools/disk_dumper/__init__.py*
@@ -190,6 +190,40 @@ class RhnSQLDatabaseTests(unittest.TestCase):
             self.assertEqual(TEST_NAMES[i], rows[i]['name'])
             i = i + 1
 
+    def test_iterate(self):
+        query = rhnSQL.prepare("SELECT * FROM %s ORDER BY id" %
+                               self.temp_table)
+        rows = list(query.iterate(itersize=2))
+        self.assertEqual(len(TEST_IDS), len(rows))
+
+        i = 0
+        while i < len(TEST_IDS):
+            self.assertEqual(TEST_IDS[i], rows[i]['id'])
+            self.assertEqual(TEST_NAMES[i], rows[i]['name'])
+            i = i + 1
+
+    def test_iterate_tuple_rows(self):
+        query = rhnSQL.prepare("SELECT id, name FROM %s WHERE id > :id ORDER BY id" %
+                               self.temp_table)
+        rows = list(query.iterate(rows=rhnSQL.ROWS_TUPLE, id=TEST_IDS[0]))
+        self.assertEqual(list(zip(TEST_IDS[1:], TEST_NAMES[1:])), rows)
+
+    def test_iterate_namedtuple_rows(self):
+        query = rhnSQL.prepare("SELECT id, name FROM %s ORDER BY id" %
+                               self.temp_table)
+        rows = query.iterate(itersize=1, rows=rhnSQL.ROWS_NAMEDTUPLE)
+        row = next(rows)
+        self.assertEqual(TEST_IDS[0], row.id)
+        self.assertEqual(TEST_NAMES[0], row.name)
+        # other queries can run while the iteration is in progress
+        self.assertEqual(len(TEST_IDS), len(list(query.iterate())))
+        self.assertEqual(TEST_IDS[1:], [r.id for r in rows])
+
+    def test_iterate_empty(self):
+        query = rhnSQL.prepare("SELECT * FROM %s WHERE id = 0" %
+                               self.temp_table)
+        self.assertEqual([], list(query.iterate()))
+
     def test_unicode_string_argument(self):
         query = rhnSQL.prepare("SELECT * FROM %s WHERE name=:name" %
                                self.temp_table)
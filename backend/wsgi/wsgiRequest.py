@@ -60,6 +60,9 @@ class WsgiRequest:
     def write(self, msg):
         if isinstance(msg, str):
             msg = msg.encode()
+        elif not isinstance(msg, bytes):
+            # e.g. a memory mapped response, the WSGI server wants bytes
+            msg = bytes(msg)
         self.output.append(msg)
 
     def send_http_header(self, status=None):
@@ -659,8 +659,11 @@ class BaseOutput:
             del self.headers[name]
 
     def process(self, data):
-        # Assume straight text/xml
+        # Assume straight text/xml, a string or a bytes-like object (e.g. a
+        # memory mapped response), which is compressed without copying it
         self.data = data
+        if not isinstance(data, (type(u''), type(b''))):
+            data = memoryview(data)
 
         # Content-Encoding header
         if self.encoding == self.ENCODE_GZIP:
@@ -670,7 +673,9 @@ class BaseOutput:
             f = SmartIO(force_mem=1)
             gz = gzip.GzipFile(mode="wb", compresslevel=COMPRESS_LEVEL,
                                fileobj = f)
-            if sys.version_info[0] == 3:
+            if isinstance(data, memoryview):
+                gz.write(data)
+            elif sys.version_info[0] == 3:
                 gz.write(bstr(data))
             else:
                 gz.write(sstr(data))
@@ -682,7 +687,9 @@ class BaseOutput:
             encoding_name = self.encodings[self.ENCODE_ZLIB][0]
             self.set_header("Content-Encoding", encoding_name)
             obj = zlib.compressobj(COMPRESS_LEVEL)
-            self.data = obj.compress(data.encode()) + obj.flush()
+            if not isinstance(data, memoryview):
+                data = data.encode()
+            self.data = obj.compress(data) + obj.flush()
         elif self.encoding == self.ENCODE_GPG:
             # XXX: fix me.
             raise NotImplementedError(self.transfer, self.encoding)
@@ -699,7 +706,10 @@ class BaseOutput:
             self.set_header("Content-Type", "text/base64")
             self.data = base64.encodestring(self.data).decode()
 
-        self.set_header("Content-Length", len(bstr(self.data)))
+        if isinstance(self.data, (type(u''), type(b''))):
+            self.set_header("Content-Length", len(bstr(self.data)))
+        else:
+            self.set_header("Content-Length", len(self.data))
 
         rpc_version = __version__
         if len(__version__.split()) > 1:
@@ -612,8 +612,11 @@ class BrokerHandler(SharedHandler):
             params = ()
         try:
             ret = f(*params)
-        except rhnRepository.NotLocalError:
-            # The package is not local
+        except rhnRepository.NotLocalError as e:
+            # The package is not local; remember where it belongs in case
+            # the response of the parent gets streamed
+            if e.args:
+                self.localCachePath = "%s/%s" % (CFG.PKG_DIR, e.args[0])
             return None
 
         return ret
@@ -21,6 +21,8 @@
 import os
 import time
 import glob
+import mmap
+from collections import OrderedDict
 try:
     # python 3
     import pickle as cPickle
@@ -52,6 +54,13 @@ from rhn import rpclib
 
 PKG_LIST_DIR = os.path.join(CFG.PKG_DIR, 'list')
 PREFIX = "rhn"
+# Suffix of the sorted lookup index written next to a package mapping
+INDEX_SUFFIX = ".idx"
+# Number of decoded cache files kept in memory by every process
+MEMORY_CACHE_SIZE = 16
+
+# filePath -> ((st_ino, st_mtime, st_size), object), least recently used first
+_memoryCache = OrderedDict()
 
 
 class NotLocalError(Exception):
@@ -87,9 +96,6 @@ class Repository(rhnRepository.Repository):
         """
 
         log_debug(3, pkgFilename)
-        mappingName = "package_mapping:%s:" % self.channelName
-        mapping = self._cacheObj(mappingName, self.channelVersion,
-                                 self.__channelPackageMapping, ())
 
         # If the file name has parameters, it's a different kind of package.
         # Determine the architecture requested so we can construct an
@@ -105,13 +111,13 @@ class Repository(rhnRepository.Repository):
                      pkgFilename[2],
                      pkgFilename[3])
 
-        if pkgFilename not in mapping:
-            log_debug(3, "Package not in mapping: %s" % pkgFilename)
-            raise NotLocalError
         # A list of possible file paths. Always a list, channel mappings are
         # cleared on package upgrade so we don't have to worry about the old
         # behavior of returning a string
-        filePaths = mapping[pkgFilename]
+        filePaths = self._lookupPackageMapping(pkgFilename)
+        if filePaths is None:
+            log_debug(3, "Package not in mapping: %s" % pkgFilename)
+            raise NotLocalError
         # Can we see a file at any of the possible filepaths?
         for filePath in filePaths:
             filePath = "%s/%s" % (CFG.PKG_DIR, filePath)
@@ -121,6 +127,35 @@ class Repository(rhnRepository.Repository):
         log_debug(4, "Package not found locally: %s" % pkgFilename)
         raise NotLocalError(filePaths[0], pkgFilename)
 
+    def _lookupPackageMapping(self, pkgFilename):
+        """ Returns the list of possible file paths of pkgFilename from the
+            channel package mapping, or None if the channel does not have it.
+
+            The mapping is served from the in-process cache if it is there,
+            otherwise the on-disk index is searched for pkgFilename alone.
+            Only without an index the whole mapping is loaded (or fetched),
+            and the index is written for the next lookups.
+        """
+        mappingName = "package_mapping:%s:" % self.channelName
+        filePath = "%s/%s-%s" % (self._getPkgListDir(), mappingName, self.channelVersion)
+        indexPath = filePath + INDEX_SUFFIX
+
+        if _getMemoryCached(filePath) is None:
+            try:
+                return lookupMappingIndex(indexPath, pkgFilename)
+            except (IOError, OSError, ValueError):
+                # no usable index; fall back to the whole mapping
+                pass
+
+        mapping = self._cacheObj(mappingName, self.channelVersion,
+                                 self.__channelPackageMapping, ())
+        if not os.access(indexPath, os.R_OK):
+            try:
+                writeMappingIndex(indexPath, mapping)
+            except (IOError, OSError):
+                log_debug(2, "Unable to write mapping index %s: %s" % (indexPath, sys.exc_info()[1]))
+        return mapping.get(pkgFilename)
+
     def getSourcePackagePath(self, pkgFilename):
         """ OVERLOADS getSourcePackagePath in common/rhnRepository.
             snag src.rpm and nosrc.rpm from local repo, after ensuring
@@ -184,13 +219,18 @@ class Repository(rhnRepository.Repository):
         log_debug(4, fileName, version, params)
         fileDir = self._getPkgListDir()
         filePath = "%s/%s-%s" % (fileDir, fileName, version)
+        stringObject = _getMemoryCached(filePath)
+        if stringObject is not None:
+            return stringObject
         if os.access(filePath, os.R_OK):
             try:
                 # Slurp the file
                 f = open(filePath, "rb")
                 data = f.read()
+                stat = os.fstat(f.fileno())
                 f.close()
                 stringObject = cPickle.loads(data)
+                _setMemoryCached(filePath, stat, stringObject)
                 return stringObject
             except (IOError, cPickle.UnpicklingError): # corrupted cache file
                 pass # do nothing, we'll fetch / write it again
@@ -201,6 +241,10 @@ class Repository(rhnRepository.Repository):
         stringObject = dataProducer(*params)
         # Cache the thing
         cache(cPickle.dumps(stringObject, 1), fileDir, fileName, version)
+        try:
+            _setMemoryCached(filePath, os.stat(filePath), stringObject)
+        except OSError:
+            pass
         # Return the string
         return stringObject
 
@@ -462,6 +506,83 @@ def computePackagePaths(nvrea, source=0, prepend="", checksum=None):
     return paths
 
 
+def _statKey(stat):
+    return (stat.st_ino, stat.st_mtime, stat.st_size)
+
+
+def _getMemoryCached(filePath):
+    """ Returns the object decoded from filePath if this process has it and
+        the file was not replaced since, None otherwise """
+    if filePath not in _memoryCache:
+        return None
+    statKey, obj = _memoryCache[filePath]
+    try:
+        if _statKey(os.stat(filePath)) != statKey:
+            raise OSError
+    except OSError:
+        del _memoryCache[filePath]
+        return None
+    _memoryCache.move_to_end(filePath)
+    return obj
+
+
+def _setMemoryCached(filePath, stat, obj):
+    _memoryCache[filePath] = (_statKey(stat), obj)
+    _memoryCache.move_to_end(filePath)
+    while len(_memoryCache) > MEMORY_CACHE_SIZE:
+        _memoryCache.popitem(last=False)
+
+
+def writeMappingIndex(indexPath, mapping):
+    """ Writes a package mapping as a sorted index with one
+        "filename<TAB>path<TAB>path...<LF>" line per package, which
+        lookupMappingIndex can search without loading the whole mapping """
+    lines = []
+    for filename, filePaths in mapping.items():
+        fields = [filename] + list(filePaths)
+        if any(('\t' in field or '\n' in field) for field in fields):
+            raise ValueError("Cannot index %s" % filename)
+        lines.append('\t'.join(fields).encode('utf-8') + b'\n')
+    lines.sort(key=lambda line: line.split(b'\t', 1)[0])
+
+    # write to a temp file and rename it, readers never see a partial index
+    tempPath = "%s-%.20f" % (indexPath, time.time())
+    fd = os.open(tempPath, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    with os.fdopen(fd, "wb") as f:
+        f.writelines(lines)
+    os.rename(tempPath, indexPath)
+
+
+def lookupMappingIndex(indexPath, pkgFilename):
+    """ Binary search of pkgFilename in an index written by
+        writeMappingIndex. Returns the list of file paths or None """
+    key = pkgFilename.encode('utf-8')
+    with open(indexPath, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        lo, hi = 0, len(mm)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            # move to the start of the line mid points into
+            newline = mm.rfind(b'\n', lo, mid)
+            start = lo if newline == -1 else newline + 1
+            end = mm.find(b'\n', start)
+            if end == -1:
+                raise ValueError("Truncated index %s" % indexPath)
+            fields = mm[start:end].split(b'\t')
+            if fields[0] == key:
+                return [field.decode('utf-8') for field in fields[1:]]
+            if fields[0] < key:
+                lo = end + 1
+            else:
+                hi = start
+        return None
+    finally:
+        mm.close()
+
+
 def cache(stringObject, directory, filename, version):
     """ Caches stringObject into a file and removes older files """
 
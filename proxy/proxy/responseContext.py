@@ -62,6 +62,18 @@ class ResponseContext:
         """ Set the current connection object. """
         self._getCurrentContext()[CXT_CONNECTION] = connection
 
+    def detach(self):
+        """ Hand the body file descriptor and the connection of the current
+            context over to the caller, which becomes responsible for
+            closing them. close() and clear() will not touch them anymore.
+        """
+        context = self._getCurrentContext()
+        bodyFd = context[CXT_RESP_BODYFD]
+        connection = context[CXT_CONNECTION]
+        context[CXT_RESP_BODYFD] = None
+        context[CXT_CONNECTION] = None
+        return bodyFd, connection
+
     def add(self):
         """ Add a new context to the stack. The new context becomes the current
             one.
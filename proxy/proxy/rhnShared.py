@@ -21,8 +21,10 @@ try:
 except ImportError:
     # python 2
     import urllib
+import os
 import socket
 import sys
+import tempfile
 
 # global imports
 from rhn import connections
@@ -69,6 +71,8 @@ class SharedHandler:
 
         self.responseContext = ResponseContext()
         self.uri = None   # ''
+        # where a streamed response is stored locally, if it should be
+        self.localCachePath = None
 
         # Common settings for both the proxy and the redirect
         # broker and redirect immediately alter these for their own purposes
@@ -466,6 +470,11 @@ class SharedHandler:
 
         # read content if there is some or the size is unknown
         if (size > 0 or size == -1) and (toRequest.method != 'HEAD'):
+            if CFG.STREAM_RESPONSES and fromResponse is self.responseContext.getBodyFd():
+                # the stream closes the response and the connection when done
+                _bodyFd, connection = self.responseContext.detach()
+                toRequest.output = self._streamHTTPBody(fromResponse, connection, size)
+                return
             tfile = SmartIO(max_mem_size=CFG.MAX_MEM_FILE_SIZE)
             buf = fromResponse.read(CFG.BUFFER_SIZE)
             while buf:
@@ -479,3 +488,64 @@ class SharedHandler:
                 toRequest.output = toRequest.headers_in['wsgi.file_wrapper'](tfile, CFG.BUFFER_SIZE)
             else:
                 toRequest.output = iter(lambda: tfile.read(CFG.BUFFER_SIZE), '')
+
+    def _streamHTTPBody(self, fromResponse, connection, size):
+        """ Generator forwarding the body of an HTTP response chunk by chunk,
+            as soon as it is received. The response object takes care of
+            Content-Length and chunked transfer encoding.
+            If self.localCachePath is set, a copy of a complete 200 response
+            is stored there.
+        """
+        cacheFd, tmpPath = None, None
+        if self.localCachePath and CFG.STREAM_CACHE_PACKAGES and \
+                fromResponse.status == apache.HTTP_OK:
+            cacheFd, tmpPath = self._openLocalCacheFile(self.localCachePath)
+
+        received = 0
+        complete = False
+        try:
+            buf = fromResponse.read(CFG.BUFFER_SIZE)
+            while buf:
+                received += len(buf)
+                if cacheFd is not None:
+                    cacheFd.write(buf)
+                yield buf
+                buf = fromResponse.read(CFG.BUFFER_SIZE)
+            complete = size in (-1, received)
+        except IOError:
+            log_error("Error while streaming the response body after %s bytes: %s"
+                      % (received, sys.exc_info()[1]))
+        finally:
+            fromResponse.close()
+            if connection is not None:
+                connection.close()
+            if cacheFd is not None:
+                self._closeLocalCacheFile(cacheFd, tmpPath, self.localCachePath, complete)
+
+    @staticmethod
+    def _openLocalCacheFile(path):
+        """ Open a temporary file next to path, returns (None, None) if the
+            file cannot be created """
+        try:
+            dirname = os.path.dirname(path)
+            if not os.path.isdir(dirname):
+                os.makedirs(dirname)
+            fd, tmpPath = tempfile.mkstemp(prefix='.stream-', dir=dirname)
+            return os.fdopen(fd, 'wb'), tmpPath
+        except OSError:
+            log_debug(2, "Not caching %s: %s" % (path, sys.exc_info()[1]))
+            return None, None
+
+    @staticmethod
+    def _closeLocalCacheFile(cacheFd, tmpPath, path, complete):
+        """ Move a completely received file in place, drop it otherwise """
+        try:
+            cacheFd.close()
+            if complete:
+                os.chmod(tmpPath, 0o644)
+                os.rename(tmpPath, path)
+                log_debug(3, "Stored streamed package in %s" % path)
+            else:
+                os.unlink(tmpPath)
+        except OSError:
+            log_error("Unable to store %s: %s" % (path, sys.exc_info()[1]))
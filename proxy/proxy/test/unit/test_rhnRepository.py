@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2021 SUSE LLC
+#
+# This software is licensed to you under the GNU General Public License,
+# version 2 (GPLv2). There is NO WARRANTY for this software, express or
+# implied, including the implied warranties of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+# along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    from unittest.mock import Mock, patch
+except ImportError:
+    from mock import Mock, patch
+
+from spacewalk.common import rhnConfig
+
+with patch.object(rhnConfig, 'CFG', Mock(PKG_DIR='/var/spool/rhn-proxy')):
+    from proxy.broker import rhnRepository
+
+
+class MappingIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.index = os.path.join(self.tmpdir, "package_mapping:channel:-1" + rhnRepository.INDEX_SUFFIX)
+        self.mapping = dict(("pkg-%03d-1.0-1.x86_64.rpm" % i,
+                             ["packages/%03d/pkg-1.0-1.x86_64.rpm" % i, "other/%03d.rpm" % i])
+                            for i in range(1, 200, 2))
+        self.mapping["single-1.0-1.noarch.rpm"] = ["single/single-1.0-1.noarch.rpm"]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_hit(self):
+        rhnRepository.writeMappingIndex(self.index, self.mapping)
+        for filename, filePaths in self.mapping.items():
+            self.assertEqual(filePaths, rhnRepository.lookupMappingIndex(self.index, filename))
+
+    def test_first_and_last_keys(self):
+        rhnRepository.writeMappingIndex(self.index, self.mapping)
+        keys = sorted(self.mapping)
+        self.assertEqual(self.mapping[keys[0]], rhnRepository.lookupMappingIndex(self.index, keys[0]))
+        self.assertEqual(self.mapping[keys[-1]], rhnRepository.lookupMappingIndex(self.index, keys[-1]))
+
+    def test_miss(self):
+        rhnRepository.writeMappingIndex(self.index, self.mapping)
+        # before the first key, between two keys and after the last one
+        for filename in ("aaa.rpm", "pkg-002-1.0-1.x86_64.rpm", "pkg-100-1.0-1.x86_64.rpm", "zzz.rpm",
+                         "pkg-001-1.0-1.x86_64"):
+            self.assertIsNone(rhnRepository.lookupMappingIndex(self.index, filename))
+
+    def test_single_entry(self):
+        rhnRepository.writeMappingIndex(self.index, {"a.rpm": ["x/a.rpm"]})
+        self.assertEqual(["x/a.rpm"], rhnRepository.lookupMappingIndex(self.index, "a.rpm"))
+        self.assertIsNone(rhnRepository.lookupMappingIndex(self.index, "b.rpm"))
+
+    def test_empty_index(self):
+        rhnRepository.writeMappingIndex(self.index, {})
+        self.assertEqual(0, os.path.getsize(self.index))
+        self.assertIsNone(rhnRepository.lookupMappingIndex(self.index, "a.rpm"))
+
+    def test_invalid_index(self):
+        self.assertRaises(ValueError, rhnRepository.writeMappingIndex, self.index, {"a\tb.rpm": ["x"]})
+        self.assertFalse(os.path.exists(self.index))
+        with open(self.index, "wb") as f:
+            f.write(b"a.rpm\tx/a.rpm")
+        self.assertRaises(ValueError, rhnRepository.lookupMappingIndex, self.index, "a.rpm")
+        self.assertRaises(IOError, rhnRepository.lookupMappingIndex, self.index + ".missing", "a.rpm")
+
+
+class MemoryCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.files = []
+        for i in range(3):
+            path = os.path.join(self.tmpdir, "file%d" % i)
+            with open(path, "w") as f:
+                f.write("content %d" % i)
+            self.files.append(path)
+        rhnRepository._memoryCache.clear()
+        self.size = patch.object(rhnRepository, 'MEMORY_CACHE_SIZE', 2)
+        self.size.start()
+
+    def tearDown(self):
+        self.size.stop()
+        rhnRepository._memoryCache.clear()
+        shutil.rmtree(self.tmpdir)
+
+    def _set(self, index):
+        path = self.files[index]
+        rhnRepository._setMemoryCached(path, os.stat(path), index)
+
+    def test_hit_and_miss(self):
+        self.assertIsNone(rhnRepository._getMemoryCached(self.files[0]))
+        self._set(0)
+        self.assertEqual(0, rhnRepository._getMemoryCached(self.files[0]))
+
+    def test_lru_eviction(self):
+        self._set(0)
+        self._set(1)
+        # using file0 makes file1 the least recently used one
+        self.assertEqual(0, rhnRepository._getMemoryCached(self.files[0]))
+        self._set(2)
+        self.assertEqual(2, len(rhnRepository._memoryCache))
+        self.assertIsNone(rhnRepository._getMemoryCached(self.files[1]))
+        self.assertEqual(0, rhnRepository._getMemoryCached(self.files[0]))
+        self.assertEqual(2, rhnRepository._getMemoryCached(self.files[2]))
+
+    def test_replaced_file(self):
+        self._set(0)
+        with open(self.files[0], "w") as f:
+            f.write("new and longer content")
+        self.assertIsNone(rhnRepository._getMemoryCached(self.files[0]))
+        self.assertNotIn(self.files[0], rhnRepository._memoryCache)
+        self._set(1)
+        os.unlink(self.files[1])
+        self.assertIsNone(rhnRepository._getMemoryCached(self.files[1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
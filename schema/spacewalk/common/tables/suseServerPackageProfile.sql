@@ -0,0 +1,26 @@
+--
+-- Copyright (c) 2021 SUSE LLC
+--
+-- This software is licensed to you under the GNU General Public License,
+-- version 2 (GPLv2). There is NO WARRANTY for this software, express or
+-- implied, including the implied warranties of MERCHANTABILITY or FITNESS
+-- FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+-- along with this software; if not, see
+-- http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+--
+-- Digest of the package profile last uploaded by a traditional client.
+-- A change of the rows of the server in rhnServerPackage removes it.
+--
+
+CREATE TABLE suseServerPackageProfile
+(
+    server_id  NUMERIC NOT NULL
+                   CONSTRAINT suse_spp_sid_pk PRIMARY KEY
+                   CONSTRAINT suse_spp_sid_fk
+                       REFERENCES rhnServer (id)
+                       ON DELETE CASCADE,
+    digest     VARCHAR(64) NOT NULL,
+    modified   TIMESTAMPTZ
+                   DEFAULT (current_timestamp) NOT NULL
+)
+;
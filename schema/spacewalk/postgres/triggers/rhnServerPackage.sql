@@ -0,0 +1,40 @@
+--
+-- Copyright (c) 2021 SUSE LLC
+--
+-- This software is licensed to you under the GNU General Public License,
+-- version 2 (GPLv2). There is NO WARRANTY for this software, express or
+-- implied, including the implied warranties of MERCHANTABILITY or FITNESS
+-- FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+-- along with this software; if not, see
+-- http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+--
+
+create or replace function rhn_server_package_profile_trig_fun() returns trigger as
+$$
+begin
+        delete from suseServerPackageProfile
+         where server_id in (select server_id from changed_rows);
+        return null;
+end;
+$$ language plpgsql;
+
+create trigger
+rhn_sp_profile_ins_trig
+after insert on rhnServerPackage
+referencing new table as changed_rows
+for each statement
+execute procedure rhn_server_package_profile_trig_fun();
+
+create trigger
+rhn_sp_profile_upd_trig
+after update on rhnServerPackage
+referencing new table as changed_rows
+for each statement
+execute procedure rhn_server_package_profile_trig_fun();
+
+create trigger
+rhn_sp_profile_del_trig
+after delete on rhnServerPackage
+referencing old table as changed_rows
+for each statement
+execute procedure rhn_server_package_profile_trig_fun();
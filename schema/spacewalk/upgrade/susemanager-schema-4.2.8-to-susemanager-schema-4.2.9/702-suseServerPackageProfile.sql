@@ -0,0 +1,56 @@
+--
+-- Copyright (c) 2021 SUSE LLC
+--
+-- This software is licensed to you under the GNU General Public License,
+-- version 2 (GPLv2). There is NO WARRANTY for this software, express or
+-- implied, including the implied warranties of MERCHANTABILITY or FITNESS
+-- FOR A PARTICULAR PURPOSE. You should have received a copy of GPLv2
+-- along with this software; if not, see
+-- http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+--
+
+
+CREATE TABLE IF NOT EXISTS suseServerPackageProfile
+(
+    server_id  NUMERIC NOT NULL
+                   CONSTRAINT suse_spp_sid_pk PRIMARY KEY
+                   CONSTRAINT suse_spp_sid_fk
+                       REFERENCES rhnServer (id)
+                       ON DELETE CASCADE,
+    digest     VARCHAR(64) NOT NULL,
+    modified   TIMESTAMPTZ
+                   DEFAULT (current_timestamp) NOT NULL
+);
+
+create or replace function rhn_server_package_profile_trig_fun() returns trigger as
+$$
+begin
+        delete from suseServerPackageProfile
+         where server_id in (select server_id from changed_rows);
+        return null;
+end;
+$$ language plpgsql;
+
+drop trigger if exists rhn_sp_profile_ins_trig on rhnServerPackage;
+create trigger
+rhn_sp_profile_ins_trig
+after insert on rhnServerPackage
+referencing new table as changed_rows
+for each statement
+execute procedure rhn_server_package_profile_trig_fun();
+
+drop trigger if exists rhn_sp_profile_upd_trig on rhnServerPackage;
+create trigger
+rhn_sp_profile_upd_trig
+after update on rhnServerPackage
+referencing new table as changed_rows
+for each statement
+execute procedure rhn_server_package_profile_trig_fun();
+
+drop trigger if exists rhn_sp_profile_del_trig on rhnServerPackage;
+create trigger
+rhn_sp_profile_del_trig
+after delete on rhnServerPackage
+referencing old table as changed_rows
+for each statement
+execute procedure rhn_server_package_profile_trig_fun();
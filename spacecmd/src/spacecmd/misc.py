@@ -398,6 +398,7 @@ def do_login(self, args):
     # keep track of who we are and who we're connected to
     self.current_user = username
     self.server = server
+    self.server_url = server_url
 
     logging.info(_N('Connected to %s as %s'), server_url, username)
 
@@ -418,6 +419,7 @@ def do_logout(self, args):
     self.session = ''
     self.current_user = ''
     self.server = ''
+    self.server_url = ''
     self.do_clear_caches('')
     return 0
 
@@ -496,6 +498,7 @@ def remove_last_history_item(self):
 
 
 def clear_errata_cache(self):
+    self.errata_channels = {}
     self.all_errata = {}
     self.errata_cache_expire = datetime.now()
     self.save_errata_cache()
@@ -510,10 +513,105 @@ def get_erratum_id(self, name):
         return self.all_errata[name]['id']
 
 
+def _reverse_index(self, attribute, build):
+    """
+    Get the reverse index of the cache stored in the given attribute, built
+    with build(cache) and kept until the cache is replaced or grows.
+    """
+    cache = getattr(self, attribute)
+    index_attribute = '_%s_index' % attribute
+    index = getattr(self, index_attribute, None)
+    if not isinstance(index, tuple) or index[0] is not cache or index[1] != len(cache):
+        index = (cache, len(cache), build(cache))
+        setattr(self, index_attribute, index)
+    return index[2]
+
+
+def _erratum_names_by_id(errata):
+    index = {}
+    for name, erratum in errata.items():
+        index.setdefault(erratum['id'], name)
+    return index
+
+
 def get_erratum_name(self, erratum_id):
-    for erratum in self.all_errata:
-        if self.all_errata[erratum]['id'] == erratum_id:
-            return erratum
+    return _reverse_index(self, 'all_errata', _erratum_names_by_id).get(erratum_id)
+
+
+def _get_channel_last_modified(self, client, channel):
+    try:
+        modified = client.channel.software.getDetails(self.session, channel).get('last_modified')
+    except xmlrpclib.Fault:
+        return None
+    if not modified:
+        return None
+    return str(modified)
+
+
+def _update_channel_cache(self, cache, list_channel):
+    """
+    Update a cache of the software channels ({label: (last_modified, keys)}).
+
+    Only the channels modified since they were cached are listed again, with
+    list_channel(client, label), through call_parallel. list_channel returns
+    the (key, item) pairs of the channel, or None if it can't be listed.
+    The channels which are gone are dropped.
+
+    :return: labels of the cached channels, in the order of the server, and
+             the (key, item) pairs of the channels listed again by label
+    """
+    channels = self.client.channel.listSoftwareChannels(self.session)
+    channels = [c.get('label') for c in channels]
+
+    last_modified = call_parallel(
+        self, lambda client, channel: _get_channel_last_modified(self, client, channel), channels)
+
+    stale = [(channel, modified) for channel, modified in zip(channels, last_modified)
+             if modified is None or channel not in cache or cache[channel][0] != modified]
+    listed = call_parallel(self, lambda client, entry: list_channel(client, entry[0]), stale)
+
+    items = {}
+    for (channel, modified), channel_items in zip(stale, listed):
+        if channel_items is None:
+            cache.pop(channel, None)
+        else:
+            cache[channel] = (modified, tuple(key for key, _item in channel_items))
+            items[channel] = channel_items
+
+    for channel in set(cache) - set(channels):
+        del cache[channel]
+
+    return [channel for channel in channels if channel in cache], items
+
+
+def _channel_items(cache, channels, listed, previous):
+    """
+    Yield the (key, item) pairs of the channels: those listed again, or the
+    previous items of the channels which were not modified.
+    """
+    for channel in channels:
+        if channel in listed:
+            for key, item in listed[channel]:
+                yield key, item
+        else:
+            for key in cache[channel][1]:
+                if key in previous:
+                    yield key, previous[key]
+
+
+def _list_channel_errata(self, client, channel):
+    try:
+        errata = client.channel.software.listErrata(self.session, channel)
+    except xmlrpclib.Fault as exc:
+        logging.debug('No access to %s (%s): %s', channel, exc.faultCode, exc.faultString)
+        return None
+
+    return [(erratum.get('advisory_name'),
+             {'id': erratum.get('id'),
+              'advisory_name': erratum.get('advisory_name'),
+              'advisory_type': erratum.get('advisory_type'),
+              'date': erratum.get('date'),
+              'advisory_synopsis': erratum.get('advisory_synopsis')}) for erratum in errata]
 
 
 def generate_errata_cache(self, force=False):
@@ -524,24 +622,15 @@ def generate_errata_cache(self, force=False):
         # tell the user what's going on
         self.replace_line_buffer(_('** Generating errata cache **'))
 
-    channels = self.client.channel.listSoftwareChannels(self.session)
-    channels = [c.get('label') for c in channels]
+    channels, listed = _update_channel_cache(
+        self, self.errata_channels,
+        lambda client, channel: _list_channel_errata(self, client, channel))
 
-    for c in channels:
-        try:
-            errata = self.client.channel.software.listErrata(self.session, c)
-        except xmlrpclib.Fault as exc:
-            logging.debug('No access to %s (%s): %s', c, exc.faultCode, exc.faultString)
-            continue
-
-        for erratum in errata:
-            if erratum.get('advisory_name') not in self.all_errata:
-                self.all_errata[erratum.get('advisory_name')] = \
-                    {'id': erratum.get('id'),
-                     'advisory_name': erratum.get('advisory_name'),
-                     'advisory_type': erratum.get('advisory_type'),
-                     'date': erratum.get('date'),
-                     'advisory_synopsis': erratum.get('advisory_synopsis')}
+    errata = {}
+    for name, erratum in _channel_items(self.errata_channels, channels, listed, self.all_errata):
+        if name not in errata:
+            errata[name] = erratum
+    self.all_errata = errata
 
     self.errata_cache_expire = datetime.now() + timedelta(self.ERRATA_CACHE_TTL)
     self.save_errata_cache()
@@ -551,13 +640,32 @@ def generate_errata_cache(self, force=False):
         self.replace_line_buffer()
 
 
+def _share_channel_keys(cache):
+    """
+    Share the identical keys of the cached channels, such as the packages of
+    the clones of a channel, so that they are pickled once.
+    """
+    shared = {}
+    return dict((channel, (modified, shared.setdefault(keys, keys)))
+                for channel, (modified, keys) in cache.items())
+
+
 def save_errata_cache(self):
+    # refer to the advisory names of all_errata in the channels, so that
+    # each name is pickled once
+    names = dict((name, name) for name in self.all_errata)
+    channels = {}
+    for channel, (modified, errata) in self.errata_channels.items():
+        channels[channel] = (modified, tuple(names.get(name, name) for name in errata))
+
     save_cache(self.errata_cache_file,
-               self.all_errata,
+               {'channels': _share_channel_keys(channels), 'errata': self.all_errata},
                self.errata_cache_expire)
 
 
 def clear_package_cache(self):
+    self.package_channels = {}
+    self.package_details = {}
     self.all_packages_short = {}
     self.all_packages = {}
     self.all_packages_by_id = {}
@@ -567,46 +675,34 @@ def clear_package_cache(self):
 
 def generate_package_cache(self, force=False):
     if not force and datetime.now() < self.package_cache_expire:
+        if self.all_packages is None:
+            # loaded from disk, not indexed yet
+            _build_package_indexes(self)
         return
 
     if not self.options.quiet:
         # tell the user what's going on
         self.replace_line_buffer(_('** Generating package cache **'))
 
-    channels = self.client.channel.listSoftwareChannels(self.session)
-    channels = [c.get('label') for c in channels]
+    channels, listed = _update_channel_cache(
+        self, self.package_channels,
+        lambda client, channel: _list_channel_packages(self, client, channel))
 
-    for c in channels:
-        try:
-            packages = self.client.channel.software.listAllPackages(self.session, c)
-        except xmlrpclib.Fault:
-            logging.debug('No access to %s', c)
-            continue
-
-        for p in packages:
-            if not p.get('name') in self.all_packages_short:
-                self.all_packages_short[p.get('name')] = ''
-
-            longname = build_package_names(p)
-
-            if longname not in self.all_packages:
-                self.all_packages[longname] = [p.get('id')]
-            else:
-                self.all_packages[longname].append(p.get('id'))
-
-    # keep a reverse dictionary so we can lookup package names by ID
     # We assume that package IDs are unique, so one ID is only
     # refering one package.
-    self.all_packages_by_id = {}
-    for k, v in self.all_packages.items():
-        for i in v:
-            # Alert in case of non-unique ID is detected.
-            if i in self.all_packages_by_id:
-                logging.debug(
-                    'Non-unique package id "%s" is detected. Taking "%s" '
-                    'instead of "%s"' % (i, k, self.all_packages_by_id[i]))
-
-            self.all_packages_by_id[i] = k
+    packages = {}
+    for package_id, package in _channel_items(self.package_channels, channels, listed,
+                                              self.package_details):
+        previous = packages.get(package_id)
+        # Alert in case of non-unique ID is detected.
+        if previous is not None and previous != package:
+            logging.debug(
+                'Non-unique package id "%s" is detected. Taking "%s" '
+                'instead of "%s"' % (package_id, package[1], previous[1]))
+
+        packages[package_id] = package
+    self.package_details = packages
+    _build_package_indexes(self)
 
     self.package_cache_expire = datetime.now() + timedelta(seconds=self.PACKAGE_CACHE_TTL)
     self.save_package_caches()
@@ -616,18 +712,41 @@ def generate_package_cache(self, force=False):
         self.replace_line_buffer()
 
 
-def save_package_caches(self):
-    # store the cache to disk to speed things up
-    save_cache(self.packages_short_cache_file,
-               self.all_packages_short,
-               self.package_cache_expire)
+def _list_channel_packages(self, client, channel):
+    try:
+        packages = client.channel.software.listAllPackages(self.session, channel)
+    except xmlrpclib.Fault:
+        logging.debug('No access to %s', channel)
+        return None
 
-    save_cache(self.packages_long_cache_file,
-               self.all_packages,
-               self.package_cache_expire)
+    return [(p.get('id'), (p.get('name'), build_package_names(p))) for p in packages]
+
+
+def _build_package_indexes(self):
+    """
+    Build the package names and the package IDs by long name and the long
+    names by package ID (keeping a reverse dictionary so we can lookup package
+    names by ID) from package_details ({id: (name, long name)}).
+    """
+    self.all_packages_short = dict.fromkeys((name for name, _longname in self.package_details.values()), '')
+    self.all_packages_by_id = dict((package_id, longname)
+                                   for package_id, (_name, longname) in self.package_details.items())
+
+    self.all_packages = {}
+    for package_id, longname in self.all_packages_by_id.items():
+        package_ids = self.all_packages.get(longname)
+        if package_ids is None:
+            self.all_packages[longname] = [package_id]
+        else:
+            package_ids.append(package_id)
 
-    save_cache(self.packages_by_id_cache_file,
-               self.all_packages_by_id,
+
+def save_package_caches(self):
+    # store the cache to disk to speed things up: the packages of each channel
+    # are stored by ID, the details of each package once
+    save_cache(self.packages_cache_file,
+               {'channels': _share_channel_keys(self.package_channels),
+                'packages': self.package_details},
                self.package_cache_expire)
 
 
@@ -718,12 +837,15 @@ def load_caches(self, server, username):
 
     self.ssm_cache_file = os.path.join(conf_dir, 'ssm')
     self.system_cache_file = os.path.join(conf_dir, 'systems')
-    self.errata_cache_file = os.path.join(conf_dir, 'errata')
-    self.packages_long_cache_file = os.path.join(conf_dir, 'packages_long')
-    self.packages_by_id_cache_file = \
-        os.path.join(conf_dir, 'packages_by_id')
-    self.packages_short_cache_file = \
-        os.path.join(conf_dir, 'packages_short')
+    self.errata_cache_file = os.path.join(conf_dir, 'errata_channels')
+    self.packages_cache_file = os.path.join(conf_dir, 'package_channels')
+
+    # remove the caches of the previous versions, replaced by the above
+    for name in ('errata', 'packages_long', 'packages_by_id', 'packages_short'):
+        try:
+            os.remove(os.path.join(conf_dir, name))
+        except OSError:
+            pass
 
     # load self.ssm from disk
     (self.ssm, _ignore) = load_cache(self.ssm_cache_file)
@@ -735,21 +857,29 @@ def load_caches(self, server, username):
     (self.all_systems, self.system_cache_expire) = \
         load_cache(self.system_cache_file)
 
-    # load self.all_errata from disk
-    (self.all_errata, self.errata_cache_expire) = \
+    # load self.errata_channels and self.all_errata from disk
+    (errata, self.errata_cache_expire) = \
         load_cache(self.errata_cache_file)
+    self.errata_channels = errata.get('channels', {})
+    self.all_errata = errata.get('errata', {})
 
-    # load self.all_packages_short from disk
-    (self.all_packages_short, self.package_cache_expire) = \
-        load_cache(self.packages_short_cache_file)
+    # load self.package_channels and self.package_details from disk, they are
+    # indexed in all_packages_short, all_packages and all_packages_by_id
+    # by generate_package_cache when a command needs them
+    (packages, self.package_cache_expire) = \
+        load_cache(self.packages_cache_file)
+    self.package_channels = packages.get('channels', {})
+    self.package_details = packages.get('packages', {})
+    self.all_packages_short = None
+    self.all_packages = None
+    self.all_packages_by_id = None
 
-    # load self.all_packages from disk
-    (self.all_packages, self.package_cache_expire) = \
-        load_cache(self.packages_long_cache_file)
 
-    # load self.all_packages_by_id from disk
-    (self.all_packages_by_id, self.package_cache_expire) = \
-        load_cache(self.packages_by_id_cache_file)
+def _system_ids_by_name(systems):
+    index = {}
+    for system_id, name in systems.items():
+        index.setdefault(name, []).append(system_id)
+    return index
 
 
 def get_system_names(self):
@@ -778,9 +908,7 @@ def get_system_id(self, name):
 
     # get a set of matching systems to check for duplicate names
     if not systems:
-        for system_id in self.all_systems:
-            if name == self.all_systems[system_id]:
-                systems.append(system_id)
+        systems = list(_reverse_index(self, 'all_systems', _system_ids_by_name).get(name, []))
 
     if len(systems) == 1:
         return systems[0]
@@ -1004,7 +1132,7 @@ def replace_line_buffer(self, msg=None):
 
 
 def load_config_section(self, section):
-    config_opts = ['server', 'username', 'password', 'nossl']
+    config_opts = ['server', 'username', 'password', 'nossl', 'parallel']
 
     if not self.config_parser.has_section(section):
         logging.debug('Configuration section [%s] does not exist', section)
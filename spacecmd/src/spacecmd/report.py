@@ -30,6 +30,7 @@
 # pylint: disable=C0103
 
 import gettext
+from collections import Counter
 from operator import itemgetter
 from spacecmd.i18n import _N
 from spacecmd.utils import *
@@ -146,12 +147,13 @@ def do_report_errata(self, args):
 
     errata_list = self.expand_errata(_args)
 
-    report = {}
-    for erratum in errata_list:
+    def list_affected_systems(client, erratum):
         logging.debug('Getting affected systems for %s' % erratum)
+        return client.errata.listAffectedSystems(self.session, erratum)
 
-        affected = self.client.errata.listAffectedSystems(self.session, erratum)
-
+    errata_list = list(errata_list)
+    report = {}
+    for erratum, affected in zip(errata_list, call_parallel(self, list_affected_systems, errata_list)):
         num_affected = len(affected)
         if num_affected:
             report[erratum] = num_affected
@@ -202,10 +204,13 @@ def do_report_ipaddresses(self, args):
         logging.warning(_N('No systems selected'))
         return 1
 
+    systems = list(systems)
+    system_ids = [self.get_system_id(system) for system in systems]
+    networks = call_parallel(self, lambda client, system_id: client.system.getNetwork(self.session, system_id),
+                             system_ids)
+
     report = {}
-    for system in systems:
-        system_id = self.get_system_id(system)
-        network = self.client.system.getNetwork(self.session, system_id)
+    for system, network in zip(systems, networks):
         report[system] = {'hostname': network.get('hostname'),
                           'ip': network.get('ip')}
 
@@ -266,11 +271,12 @@ def do_report_kernels(self, args):
         logging.warning(_N('No systems selected'))
         return 1
 
-    report = {}
-    for system in systems:
-        system_id = self.get_system_id(system)
-        kernel = self.client.system.getRunningKernel(self.session, system_id)
-        report[system] = kernel
+    systems = list(systems)
+    system_ids = [self.get_system_id(system) for system in systems]
+    kernels = call_parallel(self, lambda client, system_id: client.system.getRunningKernel(self.session, system_id),
+                            system_ids)
+
+    report = dict(zip(systems, kernels))
 
     # XXX: max(list, key=len) in >2.5
     system_max_size = 0
@@ -301,11 +307,14 @@ def help_report_duplicates(self):
 def do_report_duplicates(self, args):
     add_separator = False
 
+    names = list(self.get_system_names())
+    counts = Counter(names)
     dupes_by_profile = []
-    for system in self.get_system_names():
-        if self.get_system_names().count(system) > 1:
-            if system not in dupes_by_profile:
-                dupes_by_profile.append(system)
+    for system in names:
+        if counts[system] > 1:
+            dupes_by_profile.append(system)
+            # report each name once
+            counts[system] = 0
 
     if dupes_by_profile:
         add_separator = True
@@ -85,6 +85,7 @@ class SpacewalkShell(Cmd):
         self.session = ''
         self.current_user = ''
         self.server = ''
+        self.server_url = ''
         self.ssm = {}
         self.config = {}
 
@@ -1114,6 +1114,23 @@ def complete_system_listupgrades(self, text, line, beg, end):
     return self.tab_complete_systems(text)
 
 
+def _call_for_systems(self, systems, call):
+    """
+    Call call(client, system_id) for the systems sorted by name, through
+    call_parallel. The systems without an ID are skipped.
+
+    :return: list of (system, result)
+    """
+    system_ids = []
+    for system in sorted(systems):
+        system_id = self.get_system_id(system)
+        if system_id:
+            system_ids.append((system, system_id))
+
+    results = call_parallel(self, lambda client, item: call(client, item[1]), system_ids)
+    return [(system, result) for (system, _system_id), result in zip(system_ids, results)]
+
+
 def do_system_listupgrades(self, args):
     arg_parser = get_argument_parser()
 
@@ -1135,15 +1152,11 @@ def do_system_listupgrades(self, args):
         logging.warning(_N('No systems selected'))
         return 1
 
-    for system in sorted(systems):
-        system_id = self.get_system_id(system)
-        if not system_id:
-            continue
-
-        packages = \
-            self.client.system.listLatestUpgradablePackages(self.session,
-                                                            system_id)
+    upgrades = _call_for_systems(
+        self, systems,
+        lambda client, system_id: client.system.listLatestUpgradablePackages(self.session, system_id))
 
+    for system, packages in upgrades:
         if not packages:
             logging.warning(_N('No upgrades available for %s') % system)
             continue
@@ -1205,14 +1218,10 @@ def do_system_listinstalledpackages(self, args):
         logging.warning(_N('No systems selected'))
         return 1
 
-    for system in sorted(systems):
-        system_id = self.get_system_id(system)
-        if not system_id:
-            continue
-
-        packages = self.client.system.listPackages(self.session,
-                                                   system_id)
+    installed = _call_for_systems(
+        self, systems, lambda client, system_id: client.system.listPackages(self.session, system_id))
 
+    for system, packages in installed:
         if add_separator:
             print(self.SEPARATOR)
         add_separator = True
@@ -2433,7 +2442,10 @@ def do_system_listfqdns(self, args):
 
     add_separator = False
 
-    for system in sorted(systems):
+    all_fqdns = _call_for_systems(
+        self, systems, lambda client, system_id: client.system.listFqdns(self.session, system_id))
+
+    for system, fqdns in all_fqdns:
         if add_separator:
             print(self.SEPARATOR)
         add_separator = True
@@ -2442,12 +2454,6 @@ def do_system_listfqdns(self, args):
             print(_('System: %s') % system)
             print('')
 
-        system_id = self.get_system_id(system)
-        if not system_id:
-            continue
-
-        fqdns = self.client.system.listFqdns(self.session, system_id)
-
         for f in fqdns:
             print(f)
 
@@ -3126,11 +3132,10 @@ def do_system_listerrata(self, args):
         logging.warning(_N('No systems selected'))
         return 1
 
-    for system in sorted(systems):
-        system_id = self.get_system_id(system)
-        if not system_id:
-            continue
+    relevant_errata = _call_for_systems(
+        self, systems, lambda client, system_id: client.system.getRelevantErrata(self.session, system_id))
 
+    for system, errata in relevant_errata:
         if add_separator:
             print(self.SEPARATOR)
         add_separator = True
@@ -3139,9 +3144,6 @@ def do_system_listerrata(self, args):
             print(_('System: %s') % system)
             print('')
 
-        errata = self.client.system.getRelevantErrata(self.session,
-                                                      system_id)
-
         print_errata_list(errata)
 
     return 0
@@ -3243,11 +3245,10 @@ def do_system_listevents(self, args):
 
     add_separator = False
 
-    for system in sorted(systems):
-        system_id = self.get_system_id(system)
-        if not system_id:
-            continue
+    event_history = _call_for_systems(
+        self, systems, lambda client, system_id: client.system.getEventHistory(self.session, system_id))
 
+    for system, events in event_history:
         if add_separator:
             print(self.SEPARATOR)
         add_separator = True
@@ -3255,8 +3256,6 @@ def do_system_listevents(self, args):
         if len(systems) > 1:
             print(_('System: %s') % system)
 
-        events = self.client.system.getEventHistory(self.session, system_id)
-
         for e in events:
             print('')
             print(_('Summary:   %s') % e.get('summary'))
@@ -3300,11 +3299,10 @@ def do_system_listentitlements(self, args):
         logging.warning(_N('No systems selected'))
         return 1
 
-    for system in sorted(systems):
-        system_id = self.get_system_id(system)
-        if not system_id:
-            continue
+    all_entitlements = _call_for_systems(
+        self, systems, lambda client, system_id: client.system.getEntitlements(self.session, system_id))
 
+    for system, entitlements in all_entitlements:
         if add_separator:
             print(self.SEPARATOR)
         add_separator = True
@@ -3312,9 +3310,6 @@ def do_system_listentitlements(self, args):
         if len(systems) > 1:
             print(_('System: %s') % system)
 
-        entitlements = self.client.system.getEntitlements(self.session,
-                                                          system_id)
-
         print('\n'.join(sorted(entitlements)))
 
     return 0
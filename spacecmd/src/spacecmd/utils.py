@@ -37,7 +37,9 @@ import pickle
 import re
 import readline
 import shlex
+import socket
 import sys
+import threading
 import time
 import argparse
 
@@ -45,6 +47,10 @@ try:
     from xmlrpc import client as xmlrpclib
 except ImportError:
     import xmlrpclib
+try:
+    from http.client import HTTPException
+except ImportError:
+    from httplib import HTTPException
 from collections import deque
 from datetime import datetime, timedelta
 from difflib import unified_diff
@@ -168,19 +174,82 @@ def tab_completer(options, text):
     return [o for o in options if re.match(text, o)]
 
 
+# characters with a special meaning in a regular expression
+_REGEX_SPECIAL = frozenset('.^$*+?{}[]\\|()')
+
+
+def _literal_pattern(pattern):
+    """
+    Return the string matched by pattern if it is a plain string, possibly with
+    escaped special characters (as produced by re.escape), or None.
+    """
+    literal = []
+    escaped = False
+    for char in pattern:
+        if escaped:
+            if char.isalnum():
+                # \d, \w, back references, ...
+                return None
+            literal.append(char)
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif char in _REGEX_SPECIAL:
+            return None
+        else:
+            literal.append(char)
+    if escaped:
+        return None
+    return ''.join(literal)
+
+
+def _is_ascii(text):
+    try:
+        text.encode('ascii')
+    except UnicodeError:
+        return False
+    return True
+
+
 def filter_results(items, patterns, search=False):
     matches = []
 
+    # Plain ASCII patterns, e.g. the escaped system names of a group, are
+    # compared to the lowercase items instead of being tried one by one as
+    # regular expressions. Non-ASCII items are always matched with the
+    # regular expressions, the case folding of which differs from lower().
+    literals = set()
     compiled_patterns = []
+    regex_patterns = []
     for pattern in patterns:
         if search:
-            compiled_patterns.append(re.compile(pattern, re.I))
+            compiled = re.compile(pattern, re.I)
         else:
             # If in "match" mode, we don't want to match substrings
-            compiled_patterns.append(re.compile("^" + pattern + "$", re.I))
+            compiled = re.compile("^" + pattern + "$", re.I)
+        compiled_patterns.append(compiled)
+
+        literal = _literal_pattern(pattern)
+        if literal is not None and _is_ascii(literal):
+            literals.add(literal.lower())
+        else:
+            regex_patterns.append(compiled)
 
     for item in items:
-        for pattern in compiled_patterns:
+        if literals and _is_ascii(item):
+            lower_item = item.lower()
+            if search:
+                found = any(literal in lower_item for literal in literals)
+            else:
+                found = lower_item in literals
+            if found:
+                matches.append(item)
+                continue
+            patterns_to_try = regex_patterns
+        else:
+            patterns_to_try = compiled_patterns
+
+        for pattern in patterns_to_try:
             if search:
                 result = pattern.search(item)
             else:
@@ -871,3 +940,126 @@ class DictToDefault:
         :return:
         """
         return self.__target.get(value, default or self.__default)
+
+
+# attempts of an XMLRPC call failing with a connection or HTTP error
+CALL_ATTEMPTS = 3
+# seconds to wait after the first failed attempt, doubled after each one
+CALL_RETRY_DELAY = 1
+
+
+def get_parallel_degree(self):
+    """
+    Get the number of concurrent XMLRPC calls (--parallel or the "parallel"
+    configuration option), 1 by default.
+    """
+    for value in (getattr(self.options, 'parallel', None), self.config.get('parallel')):
+        try:
+            if value:
+                return max(int(value), 1)
+        except (TypeError, ValueError):
+            pass
+    return 1
+
+
+def _call_with_retries(function, client, item):
+    delay = CALL_RETRY_DELAY
+    for attempt in range(1, CALL_ATTEMPTS + 1):
+        try:
+            return function(client, item)
+        except (xmlrpclib.ProtocolError, HTTPException, socket.error) as exc:
+            if attempt == CALL_ATTEMPTS:
+                raise
+            logging.debug('Call for %s failed (%s), retrying in %d seconds', item, exc, delay)
+            time.sleep(delay)
+            delay *= 2
+
+
+class _Progress:
+    """
+    Progress of the calls written to stderr when it is a terminal.
+    """
+    def __init__(self, total, quiet=False):
+        self.enabled = total > 1 and not quiet and sys.stderr.isatty()
+        self.total = total
+        self.done = 0
+        self.lock = threading.Lock()
+
+    def step(self):
+        with self.lock:
+            self.done += 1
+            if self.enabled:
+                sys.stderr.write('\r** %d/%d **' % (self.done, self.total))
+                sys.stderr.flush()
+
+    def end(self):
+        if self.enabled:
+            sys.stderr.write('\r%s\r' % (' ' * (len(str(self.total)) * 2 + 8)))
+            sys.stderr.flush()
+
+
+def call_parallel(self, function, items):
+    """
+    Call function(client, item) for each item, where client is an XMLRPC
+    client to use for the call, and return the results in the order of items.
+
+    With a parallel degree (see get_parallel_degree) above 1, the calls are
+    made by a pool of threads, each with its own connection to the server.
+    The calls failing with a connection or HTTP error are retried. If a call
+    fails, the remaining calls are not made and the exception of the first
+    failed item is raised.
+
+    :param function: function(client, item) making the call
+    :param items: list of items
+    :return: list of results
+    """
+    items = list(items)
+    degree = min(get_parallel_degree(self), len(items))
+    progress = _Progress(len(items), self.options.quiet)
+
+    if degree <= 1 or not self.server_url:
+        results = []
+        try:
+            for item in items:
+                results.append(_call_with_retries(function, self.client, item))
+                progress.step()
+        finally:
+            progress.end()
+        return results
+
+    results = [None] * len(items)
+    errors = {}
+    next_item = iter(range(len(items)))
+    lock = threading.Lock()
+
+    def worker():
+        client = xmlrpclib.Server(self.server_url, verbose=self.options.debug > 1)
+        while True:
+            with lock:
+                if errors:
+                    return
+                index = next(next_item, None)
+            if index is None:
+                return
+            try:
+                results[index] = _call_with_retries(function, client, items[index])
+            except Exception as exc:  # pylint: disable=W0703
+                with lock:
+                    errors[index] = exc
+                return
+            progress.step()
+
+    logging.debug('Calling the server for %d items with %d threads', len(items), degree)
+    threads = [threading.Thread(target=worker) for _ in range(degree)]
+    try:
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        progress.end()
+
+    if errors:
+        raise errors[min(errors)]
+    return results
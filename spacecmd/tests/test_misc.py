@@ -7,6 +7,9 @@ from helpers import shell, assert_expect, assert_list_args_expect, assert_args_e
 import spacecmd.misc
 from xmlrpc import client as xmlrpclib
 import datetime
+import os
+import shutil
+import tempfile
 
 
 class TestSCMisc:
@@ -753,6 +756,7 @@ class TestSCMisc:
         spacecmd.misc.clear_errata_cache(shell)
 
         assert shell.all_errata == {}
+        assert shell.errata_channels == {}
         assert shell.errata_cache_expire > tst
         assert shell.save_errata_cache.called
 
@@ -811,6 +815,7 @@ class TestSCMisc:
         """
         shell.ERRATA_CACHE_TTL = 86400
         shell.all_errata = {}
+        shell.errata_channels = {}
         shell.options.quiet = False
         shell.errata_cache_expire = datetime.datetime(2099, 1, 1)
         shell.client.channel.listSoftwareChannels = MagicMock(return_value=[
@@ -861,6 +866,7 @@ class TestSCMisc:
         assert shell.all_packages_short == {}
         assert shell.all_packages == {}
         assert shell.all_packages_by_id == {}
+        assert shell.package_channels == {}
         assert shell.package_cache_expire is not None
         assert shell.package_cache_expire != tst
         assert shell.save_package_caches.called
@@ -880,6 +886,7 @@ class TestSCMisc:
         shell.all_packages = {}
         shell.all_packages_short = {}
         shell.all_packages_by_id = {}
+        shell.package_channels = {}
         shell.package_cache_expire = tst
         shell.PACKAGE_CACHE_TTL = 8000
 
@@ -910,6 +917,7 @@ class TestSCMisc:
         shell.all_packages = {}
         shell.all_packages_short = {}
         shell.all_packages_by_id = {}
+        shell.package_channels = {}
         shell.package_cache_expire = tst
         shell.PACKAGE_CACHE_TTL = 8000
         shell.client.channel.listSoftwareChannels = MagicMock(return_value=[])
@@ -942,6 +950,7 @@ class TestSCMisc:
         shell.all_packages = {}
         shell.all_packages_short = {}
         shell.all_packages_by_id = {}
+        shell.package_channels = {}
         shell.package_cache_expire = tst
         shell.PACKAGE_CACHE_TTL = 8000
         shell.client.channel.listSoftwareChannels = MagicMock(return_value=[])
@@ -973,6 +982,7 @@ class TestSCMisc:
         shell.all_packages = {}
         shell.all_packages_short = {}
         shell.all_packages_by_id = {}
+        shell.package_channels = {}
         shell.package_cache_expire = tst
         shell.PACKAGE_CACHE_TTL = 8000
         shell.client.channel.software.listAllPackages = MagicMock(
@@ -1024,6 +1034,7 @@ class TestSCMisc:
         shell.all_packages = {}
         shell.all_packages_short = {}
         shell.all_packages_by_id = {}
+        shell.package_channels = {}
         shell.package_cache_expire = tst
         shell.PACKAGE_CACHE_TTL = 8000
         shell.client.channel.software.listAllPackages = MagicMock(
@@ -1076,13 +1087,9 @@ class TestSCMisc:
         """
         savecache = MagicMock()
 
-        shell.all_packages = {"emacs-41-1": [42]}
-        shell.all_packages_short = {"emacs": ""}
-        shell.all_packages_by_id = {42: "emacs-41-1"}
-
-        shell.packages_short_cache_file = "/tmp/psc.f"
-        shell.packages_long_cache_file = "/tmp/plc.f"
-        shell.packages_by_id_cache_file = "/tmp/bic.f"
+        shell.package_channels = {"base": ("20190101", (42,))}
+        shell.package_details = {42: ("emacs", "emacs-41-1")}
+        shell.packages_cache_file = "/tmp/pcc.f"
 
         tst = datetime.datetime(2019, 1, 1, 0, 0)
         shell.package_cache_expire = tst
@@ -1093,11 +1100,129 @@ class TestSCMisc:
         assert shell.package_cache_expire == tst
         assert_args_expect(savecache.call_args_list,
                            [
-                               (('/tmp/psc.f', {'emacs': ''}, tst), {}),
-                               (('/tmp/plc.f', {'emacs-41-1': [42]}, tst), {}),
-                               (('/tmp/bic.f', {42: 'emacs-41-1'}, tst), {}),
+                               (('/tmp/pcc.f',
+                                 {'channels': {'base': ('20190101', (42,))},
+                                  'packages': {42: ('emacs', 'emacs-41-1')}},
+                                 tst), {}),
                            ])
 
+    def test_generate_package_cache_modified_channels(self, shell):
+        """
+        Test generate package cache lists only the modified channels again.
+
+        :param shell:
+        :return:
+        """
+        shell.options.quiet = True
+        shell.PACKAGE_CACHE_TTL = 8000
+        shell.package_cache_expire = datetime.datetime(2000, 1, 1, 0, 0)
+        shell.package_channels = {
+            "base": ("20200101", (42,)),
+            "child": ("20200101", (69,)),
+            "removed": ("20200101", (13,)),
+        }
+        shell.package_details = {
+            42: ("emacs", "emacs-42-3"),
+            69: ("gedit", "gedit-1-2"),
+            13: ("vim", "vim-1-2"),
+        }
+        shell.client.channel.listSoftwareChannels = MagicMock(return_value=[
+            {"label": "base"}, {"label": "child"}, {"label": "new"},
+        ])
+        shell.client.channel.software.getDetails = MagicMock(side_effect=[
+            {"last_modified": "20200101"}, {"last_modified": "20210101"}, {"last_modified": "20210101"},
+        ])
+        shell.client.channel.software.listAllPackages = MagicMock(side_effect=[
+            [{"name": "gedit", "version": 1, "release": 3, "id": 70}],
+            [{"name": "emacs", "version": 42, "release": 3, "id": 42}],
+        ])
+
+        spacecmd.misc.generate_package_cache(shell)
+
+        assert_args_expect(shell.client.channel.software.listAllPackages.call_args_list,
+                           [((shell.session, "child"), {}), ((shell.session, "new"), {})])
+        assert shell.package_channels == {
+            "base": ("20200101", (42,)),
+            "child": ("20210101", (70,)),
+            "new": ("20210101", (42,)),
+        }
+        assert shell.package_details == {42: ("emacs", "emacs-42-3"), 70: ("gedit", "gedit-1-3")}
+        assert shell.all_packages == {"emacs-42-3": [42], "gedit-1-3": [70]}
+        assert shell.all_packages_by_id == {42: "emacs-42-3", 70: "gedit-1-3"}
+        assert sorted(shell.all_packages_short) == ["emacs", "gedit"]
+        assert shell.save_package_caches.called
+
+    def test_generate_errata_cache_modified_channels(self, shell):
+        """
+        Test generate errata cache lists only the modified channels again.
+
+        :param shell:
+        :return:
+        """
+        erratum = {"id": 1, "advisory_name": "cve-123", "advisory_type": "Bug Fix Advisory",
+                   "date": "2019.1.1", "advisory_synopsis": "some text here"}
+        shell.options.quiet = True
+        shell.ERRATA_CACHE_TTL = 1
+        shell.errata_cache_expire = datetime.datetime(2000, 1, 1, 0, 0)
+        shell.errata_channels = {"base": ("20200101", ("cve-123",)), "child": ("20200101", ())}
+        shell.all_errata = {"cve-123": erratum}
+        shell.client.channel.listSoftwareChannels = MagicMock(return_value=[
+            {"label": "base"}, {"label": "child"},
+        ])
+        shell.client.channel.software.getDetails = MagicMock(side_effect=[
+            {"last_modified": "20200101"}, {"last_modified": "20210101"},
+        ])
+        shell.client.channel.software.listErrata = MagicMock(return_value=[
+            dict(erratum, id=2, advisory_name="cve-456"),
+        ])
+
+        spacecmd.misc.generate_errata_cache(shell)
+
+        assert_args_expect(shell.client.channel.software.listErrata.call_args_list,
+                           [((shell.session, "child"), {})])
+        assert shell.errata_channels == {"base": ("20200101", ("cve-123",)),
+                                         "child": ("20210101", ("cve-456",))}
+        assert shell.all_errata["cve-123"] is erratum
+        assert shell.all_errata["cve-456"]["id"] == 2
+        assert shell.save_errata_cache.called
+
+    def test_package_caches_save_load(self, shell):
+        """
+        Test the package and errata caches are loaded as they were saved.
+
+        :param shell:
+        :return:
+        """
+        erratum = {"id": 1, "advisory_name": "cve-123", "advisory_type": "Bug Fix Advisory",
+                   "date": "2019.1.1", "advisory_synopsis": "some text here"}
+        shell.conf_dir = tempfile.mkdtemp()
+        try:
+            os.mkdir(os.path.join(shell.conf_dir, "example.com"))
+            spacecmd.misc.load_caches(shell, "example.com", "admin")
+
+            shell.package_channels = {"base": ("20200101", (42, 69)), "clone": ("20200102", (42,))}
+            shell.package_details = {42: ("emacs", "emacs-42-3"), 69: ("gedit", "gedit-1-2")}
+            shell.errata_channels = {"base": ("20200101", ("cve-123",)), "clone": ("20200102", ("cve-123",))}
+            shell.all_errata = {"cve-123": erratum}
+            shell.package_cache_expire = shell.errata_cache_expire = datetime.datetime(2099, 1, 1)
+            spacecmd.misc.save_package_caches(shell)
+            spacecmd.misc.save_errata_cache(shell)
+            shell.package_channels = shell.errata_channels = None
+
+            spacecmd.misc.load_caches(shell, "example.com", "admin")
+        finally:
+            shutil.rmtree(shell.conf_dir)
+
+        assert shell.package_cache_expire == shell.errata_cache_expire == datetime.datetime(2099, 1, 1)
+        assert shell.package_channels == {"base": ("20200101", (42, 69)), "clone": ("20200102", (42,))}
+        assert shell.all_packages is None
+        spacecmd.misc.generate_package_cache(shell)
+        assert shell.all_packages == {"emacs-42-3": [42], "gedit-1-2": [69]}
+        assert shell.all_packages_by_id == {42: "emacs-42-3", 69: "gedit-1-2"}
+        assert sorted(shell.all_packages_short) == ["emacs", "gedit"]
+        assert shell.errata_channels == {"base": ("20200101", ("cve-123",)), "clone": ("20200102", ("cve-123",))}
+        assert shell.all_errata == {"cve-123": erratum}
+
     def test_user_confirm_bool_positive(self, shell):
         """
         Test interactive user confirmation UI. Boolean, positive.
@@ -1210,6 +1335,32 @@ class TestSCMisc:
 
         assert logger.warning.called
 
+    def test_get_system_id_cache_replaced(self, shell):
+        """
+        Test getting system ID after the system cache was replaced.
+
+        :param shell:
+        :return:
+        """
+        shell.all_systems = {100100: "douchebox", 100200: "sloppy"}
+        assert spacecmd.misc.get_system_id(shell, "douchebox") == 100100
+
+        shell.all_systems = {100300: "douchebox"}
+        assert spacecmd.misc.get_system_id(shell, "douchebox") == 100300
+        assert spacecmd.misc.get_system_id(shell, "sloppy") == 0
+
+    def test_get_erratum_name_cache_grows(self, shell):
+        """
+        Test to get erratum name after an erratum was added to the cache.
+
+        :param shell:
+        :return:
+        """
+        shell.all_errata = {"cve-zzz": {"id": 3}}
+        assert spacecmd.misc.get_erratum_name(shell, 4) is None
+        shell.all_errata["cve-yyy"] = {"id": 4}
+        assert spacecmd.misc.get_erratum_name(shell, 4) == "cve-yyy"
+
     def test_get_package_name(self, shell):
         """
         Get package name.
@@ -4,6 +4,7 @@ Test spacecmd.utils
 """
 from unittest.mock import MagicMock, patch, mock_open
 import pytest
+import re
 from helpers import shell, assert_expect, assert_list_args_expect, assert_args_expect
 import spacecmd.utils
 from xmlrpc import client as xmlrpclib
@@ -161,6 +162,23 @@ class TestSCUtils:
                                             ["space*", "pig"], search=False)
         assert out == ['space']
 
+    def test_filter_results_literal(self):
+        """
+        Test results filtering with plain and escaped patterns.
+
+        :return:
+        """
+        items = ["web1.example.com", "WEB2.example.com", "web10.example.com", "db1.example.com", "wéb1"]
+        out = spacecmd.utils.filter_results(items, [re.escape("web1.example.com"), "web2.example.com", "wéb1"])
+        assert out == ["web1.example.com", "WEB2.example.com", "wéb1"]
+
+        out = spacecmd.utils.filter_results(items, ["web1", "db\\d"], search=True)
+        assert out == ["web1.example.com", "web10.example.com", "db1.example.com"]
+
+        # unescaped dots are regular expressions
+        out = spacecmd.utils.filter_results(["web1xexample.com"], ["web1.example.com"])
+        assert out == ["web1xexample.com"]
+
     @patch("spacecmd.utils.mkstemp", MagicMock(return_value=(1, "test",)))
     @patch("spacecmd.utils.os.fdopen", MagicMock(side_effect=IOError("Electromagnetic energy loss")))
     def test_editor_ioerror_handle(self):
@@ -742,3 +760,74 @@ class TestSCUtils:
         assert not spacecmd.utils.string_to_bool("no")
         assert spacecmd.utils.string_to_bool("yes")
         assert spacecmd.utils.string_to_bool("true")
+
+    def test_call_parallel_sequential(self):
+        """
+        Test calls with the default parallel degree are made with the shell client.
+
+        :return:
+        """
+        shell = MagicMock(server_url="https://example.com/rpc/api", config={})
+        shell.options.parallel = None
+        results = spacecmd.utils.call_parallel(shell, lambda client, item: (client, item * 2), [1, 2, 3])
+        assert results == [(shell.client, 2), (shell.client, 4), (shell.client, 6)]
+
+    def test_call_parallel_ordered(self):
+        """
+        Test concurrent calls return the results in the order of the items.
+
+        :return:
+        """
+        shell = MagicMock(server_url="https://example.com/rpc/api", config={"parallel": "4"})
+        shell.options.parallel = None
+        shell.options.debug = 0
+
+        def call(client, item):
+            time.sleep((10 - item) / 1000.0)
+            return item * 2
+
+        with patch("spacecmd.utils.xmlrpclib.Server") as server:
+            results = spacecmd.utils.call_parallel(shell, call, range(10))
+        assert results == [item * 2 for item in range(10)]
+        assert server.call_count == 4
+
+    def test_call_parallel_retry(self):
+        """
+        Test failed connections are retried.
+
+        :return:
+        """
+        shell = MagicMock(server_url="https://example.com/rpc/api", config={})
+        shell.options.parallel = 2
+        shell.options.debug = 0
+        failures = {1: 2}
+
+        def call(client, item):
+            if failures.get(item):
+                failures[item] -= 1
+                raise xmlrpclib.ProtocolError("example.com/rpc/api", 503, "Service Unavailable", {})
+            return item
+
+        with patch("spacecmd.utils.xmlrpclib.Server"), patch("spacecmd.utils.time.sleep") as sleep:
+            assert spacecmd.utils.call_parallel(shell, call, [0, 1, 2]) == [0, 1, 2]
+        assert [args[0][0] for args in sleep.call_args_list] == [1, 2]
+
+    def test_call_parallel_error(self):
+        """
+        Test the error of the first failed item is raised.
+
+        :return:
+        """
+        shell = MagicMock(server_url="https://example.com/rpc/api", config={})
+        shell.options.parallel = 3
+        shell.options.debug = 0
+
+        def call(client, item):
+            if item >= 1:
+                raise xmlrpclib.Fault(1, "Failed %d" % item)
+            return item
+
+        with patch("spacecmd.utils.xmlrpclib.Server"):
+            with pytest.raises(xmlrpclib.Fault) as exc:
+                spacecmd.utils.call_parallel(shell, call, [0, 1, 2])
+        assert "Failed 1" in str(exc.value)
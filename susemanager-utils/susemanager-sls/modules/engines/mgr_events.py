@@ -18,6 +18,15 @@ The algorithm is an implementation of token bucket:
  - when an event arrives but no tokens are available, the event is INSERTed but
    not COMMITted yet. COMMIT will happen as soon as a token is available
 
+Optionally, events are buffered and INSERTed together: when flush_size is
+greater than 1, accepted events are kept in memory until flush_size of them
+were collected or the oldest one waited flush_interval milliseconds, and are
+then written with a single multi-row INSERT.
+
+The counters of accepted, discarded and written (flushed) events and the
+time spent writing them are logged at trace level, and every stats_interval
+seconds at info level if set.
+
 .. versionadded:: 2018.3.0
 
 :depends: psycopg2
@@ -43,6 +52,9 @@ Full configuration example
       - mgr_events:
           commit_interval: 1
           commit_burst: 100
+          flush_size: 500
+          flush_interval: 100
+          stats_interval: 300
           postgres_db:
               dbname: susemanger
               user: spacewalk
@@ -62,9 +74,11 @@ import logging
 import time
 import fnmatch
 import hashlib
+import re
 
 try:
     import psycopg2
+    import psycopg2.extras
     HAS_PSYCOPG2 = True
 except ImportError:
     HAS_PSYCOPG2 = False
@@ -81,6 +95,26 @@ log = logging.getLogger(__name__)
 
 DEFAULT_COMMIT_INTERVAL = 1
 DEFAULT_COMMIT_BURST = 100
+DEFAULT_FLUSH_SIZE = 1
+DEFAULT_FLUSH_INTERVAL = 100
+DEFAULT_STATS_INTERVAL = 0
+
+# Tags of the events written to the database
+EVENT_TAGS = [
+    "salt/minion/*/start",
+    "salt/job/*/ret/*",
+    "salt/beacon/*",
+    "salt/engines/*",
+    "salt/batch/*/start",
+    "suse/manager/image_deployed",
+    "suse/manager/image_synced",
+    "suse/systemid/generate",
+]
+EVENT_TAGS_RE = re.compile("|".join(fnmatch.translate(pattern) for pattern in EVENT_TAGS))
+JOB_RETURN_RE = re.compile(fnmatch.translate("salt/job/*/ret/*"))
+
+INSERT_EVENT = 'INSERT INTO suseSaltEvent (minion_id, data, queue) VALUES (%s, %s, %s);'
+INSERT_EVENTS = 'INSERT INTO suseSaltEvent (minion_id, data, queue) VALUES %s;'
 
 def __virtual__():
     return HAS_PSYCOPG2
@@ -91,14 +125,30 @@ class Responder:
         self.config = config
         self.config.setdefault('commit_interval', DEFAULT_COMMIT_INTERVAL)
         self.config.setdefault('commit_burst', DEFAULT_COMMIT_BURST)
+        self.config.setdefault('flush_size', DEFAULT_FLUSH_SIZE)
+        self.config.setdefault('flush_interval', DEFAULT_FLUSH_INTERVAL)
+        self.config.setdefault('stats_interval', DEFAULT_STATS_INTERVAL)
         self.config.setdefault('postgres_db', {})
         self.config['postgres_db'].setdefault('host', 'localhost')
         self.config['postgres_db'].setdefault('notify_channel', 'suseSaltEvent')
         self.counters = [0 for i in range(config['events']['thread_pool_size'] + 1)]
         self.tokens = config['commit_burst']
         self.event_bus = event_bus
+        # events accepted but not INSERTed yet, and the timeout flushing them
+        self.buffer = []
+        self.flush_timeout = None
+        self.stats = {
+            'accepted': 0,
+            'discarded': 0,
+            'flushed': 0,
+            'flushes': 0,
+            'flush_time': 0.0,
+            'flush_time_max': 0.0,
+        }
         self._connect_to_database()
         self.event_bus.io_loop.call_later(config['commit_interval'], self.add_token)
+        if config['stats_interval']:
+            self.event_bus.io_loop.call_later(config['stats_interval'], self.log_stats)
 
     def _connect_to_database(self):
         db_config = self.config.get('postgres_db')
@@ -119,47 +169,86 @@ class Responder:
 
     def _insert(self, tag, data):
         self.db_keepalive()
-        if any([
-            fnmatch.fnmatch(tag, "salt/minion/*/start"),
-            fnmatch.fnmatch(tag, "salt/job/*/ret/*"),
-            fnmatch.fnmatch(tag, "salt/beacon/*"),
-            fnmatch.fnmatch(tag, "salt/engines/*"),
-            fnmatch.fnmatch(tag, "salt/batch/*/start"),
-            fnmatch.fnmatch(tag, "suse/manager/image_deployed"),
-            fnmatch.fnmatch(tag, "suse/manager/image_synced"),
-            fnmatch.fnmatch(tag, "suse/systemid/generate")
-        ]) and not self._is_salt_mine_event(tag, data) and not self._is_presence_ping(tag, data):
+        if EVENT_TAGS_RE.match(tag) and not self._is_salt_mine_event(tag, data) and not self._is_presence_ping(tag, data):
+            self.stats['accepted'] += 1
             queue = 0
             if 'id' in data:
                 hash_sum = hashlib.md5(data.get("id").encode(self.connection.encoding)).hexdigest()[0:8]
                 queue = int(hash_sum, 16) % self.config['events']['thread_pool_size'] + 1
             log.debug("%s: Adding event to queue %d -> %s", __name__, queue, tag)
+            row = (data.get("id"), json.dumps({'tag': tag, 'data': data}), queue)
+            if self.config['flush_size'] > 1:
+                self._buffer(row)
+                return
             try:
-                self.cursor.execute(
-                    'INSERT INTO suseSaltEvent (minion_id, data, queue) VALUES (%s, %s, %s);',
-                    (data.get("id"), json.dumps({'tag': tag, 'data': data}), queue)
-                )
+                self.cursor.execute(INSERT_EVENT, row)
                 self.counters[queue] += 1
+                self.stats['flushed'] += 1
                 self.attempt_commit()
             except Exception as err:
                 log.error("%s: %s", __name__, err)
             finally:
                 log.debug("%s: %s", __name__, self.cursor.query)
         else:
+            self.stats['discarded'] += 1
             log.debug("%s: Discarding event -> %s", __name__, tag)
 
+    def _buffer(self, row):
+        self.buffer.append(row)
+        if len(self.buffer) >= self.config['flush_size']:
+            self.flush()
+        elif self.flush_timeout is None:
+            self.flush_timeout = self.event_bus.io_loop.call_later(
+                self.config['flush_interval'] / 1000.0, self.flush)
+
+    def flush(self):
+        """
+        INSERT the buffered events at once.
+        """
+        if self.flush_timeout is not None:
+            self.event_bus.io_loop.remove_timeout(self.flush_timeout)
+            self.flush_timeout = None
+        if not self.buffer:
+            return
+        rows, self.buffer = self.buffer, []
+        self.db_keepalive()
+        log.debug("%s: Flushing %d events", __name__, len(rows))
+        start = time.time()
+        try:
+            psycopg2.extras.execute_values(self.cursor, INSERT_EVENTS, rows, page_size=len(rows))
+            for row in rows:
+                self.counters[row[2]] += 1
+            self.stats['flushed'] += len(rows)
+        except Exception as err:
+            log.error("%s: %s", __name__, err)
+        elapsed = time.time() - start
+        self.stats['flushes'] += 1
+        self.stats['flush_time'] += elapsed
+        self.stats['flush_time_max'] = max(self.stats['flush_time_max'], elapsed)
+        self.attempt_commit()
+
     def trace_log(self):
         log.trace("%s: queues sizes -> %s", __name__, self.counters)
         log.trace("%s: tokens -> %s", __name__, self.tokens)
+        log.trace("%s: stats -> %s", __name__, self.stats)
+
+    def log_stats(self):
+        stats = self.stats
+        log.info("%s: %d events accepted, %d discarded, %d written in %d flushes "
+                 "(%.1f ms average, %.1f ms max), %d buffered", __name__,
+                 stats['accepted'], stats['discarded'], stats['flushed'], stats['flushes'],
+                 1000.0 * stats['flush_time'] / max(stats['flushes'], 1),
+                 1000.0 * stats['flush_time_max'], len(self.buffer))
+        self.event_bus.io_loop.call_later(self.config['stats_interval'], self.log_stats)
 
     def _is_salt_mine_event(self, tag, data):
-        return fnmatch.fnmatch(tag, "salt/job/*/ret/*") and self._is_salt_mine_update(data)
+        return JOB_RETURN_RE.match(tag) and self._is_salt_mine_update(data)
 
     def _is_salt_mine_update(self, data):
         return data.get("fun") == "mine.update"
 
     def _is_presence_ping(self, tag, data):
-        return fnmatch.fnmatch(tag, "salt/job/*/ret/*") and self._is_test_ping(data) and self._is_batch_mode(data)
+        return JOB_RETURN_RE.match(tag) and self._is_test_ping(data) and self._is_batch_mode(data)
 
     def _is_test_ping(self, data):
         return data.get("fun") == "test.ping"
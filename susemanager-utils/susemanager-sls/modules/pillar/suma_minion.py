@@ -14,8 +14,10 @@ Retrieve SUSE Manager pillar data for a minion_id.
 # Import python libs
 from __future__ import absolute_import
 from enum import Enum
+import copy
 import os
 import logging
+import types
 import yaml
 import json
 import sys
@@ -51,7 +53,22 @@ MINION_PILLAR_FILES_SUFFIXES = [".yml", "_group_memberships.yml", "_virtualizati
 
 CONFIG_FILE = '/etc/rhn/rhn.conf'
 
-formulas_metadata_cache = dict()
+# Use the LibYAML based loader when available, it is much faster
+YAML_LOADER = getattr(yaml, 'CFullLoader', yaml.FullLoader)
+
+# Salt executes the module again for every new loader, i.e. for most pillar
+# renders: the caches live in a module of their own to be shared by all the
+# renders of a salt-master worker process.
+#   files: path -> (stat key, parsed data) of the files shared by the minions
+#   group_formulas: (group id, formula) -> (layout, group data, metadata,
+#                   merged pillar) of the minions without formula data
+_CACHE_MODULE = 'suma_minion_cache'
+if _CACHE_MODULE not in sys.modules:
+    _cache = types.ModuleType(_CACHE_MODULE)
+    _cache.files = {}
+    _cache.group_formulas = {}
+    sys.modules[_CACHE_MODULE] = _cache
+_cache = sys.modules[_CACHE_MODULE]
 
 # Fomula group subtypes
 class EditGroupSubtype(Enum):
@@ -70,6 +87,42 @@ def __virtual__():
     '''
     return True
 
+def _load_yaml(stream):
+    return yaml.load(stream, Loader=YAML_LOADER)
+
+
+def _stat_key(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def load_cached(path, parse=_load_yaml, copy_data=True):
+    '''
+    Return the data parsed from the file at path, reusing the data parsed by a
+    previous call as long as the file is not modified or replaced.
+    Without copy_data the cached data is returned and must not be modified.
+    '''
+    key = _stat_key(path)
+    entry = _cache.files.get(path)
+    if key is None or entry is None or entry[0] != key:
+        with open(path) as f:
+            entry = (key, parse(f))
+        if key is not None:
+            _cache.files[path] = entry
+    return copy.deepcopy(entry[1]) if copy_data else entry[1]
+
+
+def clear_cache():
+    '''
+    Drop the cached files and formula pillars.
+    '''
+    _cache.files.clear()
+    _cache.group_formulas.clear()
+
+
 def ext_pillar(minion_id, *args):
     '''
     Find SUMA-related pillars for the registered minions and return the data.
@@ -82,7 +135,7 @@ def ext_pillar(minion_id, *args):
     for static_pillar in MANAGER_STATIC_PILLAR:
         static_pillar_filename = os.path.join(MANAGER_STATIC_PILLAR_DATA_PATH, static_pillar)
         try:
-            ret.update(yaml.load(open('{0}.yml'.format(static_pillar_filename)).read(), Loader=yaml.FullLoader))
+            ret.update(load_cached('{0}.yml'.format(static_pillar_filename)))
         except Exception as exc:
             log.error('Error accessing "{0}": {1}'.format(static_pillar_filename, exc))
 
@@ -90,20 +143,19 @@ def ext_pillar(minion_id, *args):
     for global_pillar in MANAGER_GLOBAL_PILLAR:
         global_pillar_filename = os.path.join(MANAGER_PILLAR_DATA_PATH, global_pillar)
         try:
-            ret.update(yaml.load(open('{0}.yml'.format(global_pillar_filename)).read(), Loader=yaml.FullLoader))
+            ret.update(load_cached('{0}.yml'.format(global_pillar_filename)))
         except Exception as exc:
             log.error('Error accessing "{0}": {1}'.format(global_pillar_filename, exc))
 
-    # Including generated pillar data for this minion
+    # Including generated pillar data for this minion, not cached as read by
+    # its renders only
     minion_pillar_filename_prefix = MINION_PILLAR_FILES_PREFIX.format(minion_id=minion_id)
     for suffix in MINION_PILLAR_FILES_SUFFIXES:
         data_filename = os.path.join(MANAGER_PILLAR_DATA_PATH, minion_pillar_filename_prefix + suffix)
         if os.path.exists(data_filename):
             try:
-                ret = salt.utils.dictupdate.merge(
-                        ret,
-                        yaml.load(open(data_filename).read(), Loader=yaml.FullLoader),
-                        strategy='recurse')
+                with open(data_filename) as f:
+                    ret = salt.utils.dictupdate.merge(ret, _load_yaml(f), strategy='recurse')
             except Exception as error:
                 log.error('Error accessing "{pillar_file}": {message}'.format(pillar_file=data_filename, message=str(error)))
 
@@ -123,12 +175,15 @@ def ext_pillar(minion_id, *args):
 
 
 def load_formulas_from_file(formula_filename):
+    '''
+    Load the formulas assigned to the groups or minions, the returned data
+    is cached and must not be modified.
+    '''
     formulas = {}
     formula_file = os.path.join(FORMULAS_DATA_PATH, formula_filename)
     if os.path.exists(formula_file):
         try:
-            with open(formula_file) as f:
-                formulas = json.load(f)
+            formulas = load_cached(formula_file, json.load, copy_data=False)
         except Exception as error:
             log.error('Error loading formulas from file: {message}'.format(message=str(error)))
     return formulas
@@ -171,9 +226,8 @@ def formula_pillars(minion_id, group_ids):
 
     # Loading the formula order
     if os.path.exists(FORMULA_ORDER_FILE):
-        with open(FORMULA_ORDER_FILE) as ofile:
-            order = json.load(ofile)
-            pillar["formulas"] = list(filter(lambda i: i in out_formulas, order))
+        order = load_cached(FORMULA_ORDER_FILE, json.load, copy_data=False)
+        pillar["formulas"] = list(filter(lambda i: i in out_formulas, order))
     else:
         pillar["formulas"] = out_formulas
 
@@ -183,6 +237,10 @@ def formula_pillars(minion_id, group_ids):
 def load_formula_pillar(minion_id, group_id, formula_name, formula_metadata = None):
     '''
     Load the data from a specific formula for a minion in a specific group, merge and return it.
+
+    The merged pillar of a group formula is the same for all the minions of the
+    group without formula data of their own: it is computed once and reused as
+    long as the layout, group data and metadata are unchanged.
     '''
     layout_filename = os.path.join( MANAGER_FORMULAS_METADATA_STANDALONE_PATH, formula_name, "form.yml")
     if not os.path.isfile(layout_filename):
@@ -197,13 +255,36 @@ def load_formula_pillar(minion_id, group_id, formula_name, formula_metadata = No
     system_filename = os.path.join(FORMULAS_DATA_PATH, "pillar", "{id}_{name}.json".format(id=minion_id, name=formula_name))
 
     try:
-        layout = yaml.load(open(layout_filename).read(), Loader=yaml.FullLoader)
-        group_data = json.load(open(group_filename)) if group_filename is not None and os.path.isfile(group_filename) else {}
-        system_data = json.load(open(system_filename)) if os.path.isfile(system_filename) else {}
+        layout = load_cached(layout_filename, copy_data=False)
+        group_data = None
+        if group_filename is not None and os.path.isfile(group_filename):
+            group_data = load_cached(group_filename, json.load, copy_data=False)
+        system_data = None
+        if os.path.isfile(system_filename):
+            with open(system_filename) as f:
+                system_data = json.load(f)
     except Exception as error:
         log.error('Error loading data for formula "{formula}": {message}'.format(formula=formula_name, message=str(error)))
         return {}
 
+    cache_key = None
+    if system_data is None and group_id is not None:
+        cache_key = (group_id, formula_name)
+        entry = _cache.group_formulas.get(cache_key)
+        if entry is not None and entry[0] is layout and entry[1] is group_data and entry[2] is formula_metadata:
+            return copy.deepcopy(entry[3])
+
+    merged_data = _merge_formula_pillar(formula_name, layout, group_data or {}, system_data or {}, formula_metadata)
+    if cache_key is not None:
+        _cache.group_formulas[cache_key] = (layout, group_data, formula_metadata, merged_data)
+    # the merged data shares values with the cached layout and group data
+    return copy.deepcopy(merged_data)
+
+
+def _merge_formula_pillar(formula_name, layout, group_data, system_data, formula_metadata):
+    '''
+    Merge the formula group and system data with the formula layout.
+    '''
     # if group_data starts with mgr_clusters then merge and adjust without the mgr_clusters:<cluster>:settings prefix
     cluster_name = None
     cluster_pillar_key = None
@@ -326,8 +407,7 @@ def image_pillars(minion_id, group_ids, org_id):
         # read also pilars from top dir, for backward compatibility
         if os.path.isfile(pillar_path) and pillar.endswith('.sls'):
             try:
-                with open(pillar_path) as p:
-                    ret = salt.utils.dictupdate.merge(ret, yaml.load(p.read(), Loader=yaml.FullLoader), strategy='recurse')
+                ret = salt.utils.dictupdate.merge(ret, load_cached(pillar_path), strategy='recurse')
             except Exception as error:
                 log.error('Error loading data for image "{image}": {message}'.format(image=pillar.path(), message=str(error)))
 
@@ -342,17 +422,16 @@ def image_pillars(minion_id, group_ids, org_id):
             pillar_path = os.path.join(pillar_dir, pillar)
             if os.path.isfile(pillar_path) and pillar.endswith('.sls'):
                 try:
-                    with open(pillar_path) as p:
-                        ret = salt.utils.dictupdate.merge(ret, yaml.load(p.read(), Loader=yaml.FullLoader), strategy='recurse')
+                    ret = salt.utils.dictupdate.merge(ret, load_cached(pillar_path), strategy='recurse')
                 except Exception as error:
                     log.error('Error loading data for image "{image}": {message}'.format(image=pillar.path(), message=str(error)))
 
     return ret
 
 def load_formula_metadata(formula_name):
-    if formula_name in formulas_metadata_cache:
-        return formulas_metadata_cache[formula_name]
-
+    '''
+    Load the metadata of a formula, the returned data is cached and must not be modified.
+    '''
     metadata_filename = None
     metadata_paths_ordered = [
         os.path.join(MANAGER_FORMULAS_METADATA_STANDALONE_PATH, formula_name, "metadata.yml"),
@@ -370,12 +449,11 @@ def load_formula_metadata(formula_name):
         log.error('Error loading metadata for formula "{formula}": No metadata.yml found'.format(formula=formula_name))
         return {}
     try:
-        metadata = yaml.load(open(metadata_filename).read())
+        metadata = load_cached(metadata_filename, copy_data=False)
     except Exception as error:
         log.error('Error loading data for formula "{formula}": {message}'.format(formula=formula_name, message=str(error)))
         return {}
 
-    formulas_metadata_cache[formula_name] = metadata                 
     return metadata            
 
 def _pillar_value_by_path(data, path):
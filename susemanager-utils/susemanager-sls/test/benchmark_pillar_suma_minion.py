@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+'''
+Benchmark of the suma_minion ext_pillar.
+
+Renders the pillars of a synthetic tree of minions (10000 by default) spread
+over groups with formulas and image pillars, as a highstate of all of them
+does, once with the caches and once without them and with the pure Python
+YAML loader.
+
+Usage (from the test directory, with salt installed):
+    python benchmark_pillar_suma_minion.py [minions [groups]]
+'''
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import yaml
+
+sys.path.append("../modules/pillar")
+import suma_minion
+
+FORMULAS = ['locale', 'tftpd', 'branch-network', 'dhcpd']
+
+
+def write(path, data, dump=json.dump):
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with open(path, "w") as f:
+        dump(data, f)
+
+
+def build_tree(root, minions, groups):
+    static = os.path.join(root, "static")
+    pillar_data = os.path.join(root, "pillar_data")
+    formula_data = os.path.join(root, "formula_data")
+    write(os.path.join(static, "gpgkeys.yml"),
+          {"gpgkeys": dict(("key%d" % i, {"file": "key%d.key" % i, "name": "key %d" % i}) for i in range(20))},
+          yaml.dump)
+    write(os.path.join(pillar_data, "mgr_conf.yml"),
+          {"mgr_server": "manager.example.com", "mgr_origin_server": "manager.example.com",
+           "machine_password": "foo", "mgr_server_is_uyuni": False},
+          yaml.dump)
+    for i in range(minions):
+        minion_id = "minion%d.example.com" % i
+        write(os.path.join(pillar_data, "pillar_%s.yml" % minion_id),
+              {"org_id": 1, "group_ids": [i % groups, groups + i % 3], "contact_method": "default",
+               "channels": {"channel%d" % c: {"alias": "susemanager:channel%d" % c, "gpgcheck": "1"}
+                            for c in range(5)}},
+              yaml.dump)
+    write(os.path.join(formula_data, "group_formulas.json"),
+          dict((str(g), FORMULAS[g % 2:g % 2 + 2]) for g in range(groups + 3)))
+    write(os.path.join(formula_data, "minion_formulas.json"),
+          dict(("minion%d.example.com" % i, ['dhcpd']) for i in range(0, minions, 100)))
+    write(os.path.join(formula_data, "formula_order.json"), FORMULAS)
+    for g in range(groups + 3):
+        write(os.path.join(formula_data, "group_pillar", "%d_locale.json" % g),
+              {"timezone": {"name": "CET", "hardware_clock_set_to_utc": True},
+               "keyboard_and_language": {"language": "English (US)", "keyboard_layout": "English (US)"}})
+    for i in range(0, minions, 50):
+        write(os.path.join(formula_data, "pillar", "minion%d.example.com_locale.json" % i),
+              {"timezone": {"name": "EST"}})
+    images = os.path.join(pillar_data, "images")
+    for g in range(groups):
+        write(os.path.join(images, "group%d" % g, "image%d.sls" % g),
+              {"images": {"image%d" % g: {"1.0.0": {"url": "http://example.com/image%d" % g, "size": 1000}}}},
+              yaml.dump)
+    write(os.path.join(images, "org1", "image.sls"),
+          {"images": {"orgimage": {"1.0.0": {"url": "http://example.com/orgimage", "size": 1000}}}},
+          yaml.dump)
+
+    suma_minion.MANAGER_STATIC_PILLAR_DATA_PATH = static
+    suma_minion.MANAGER_PILLAR_DATA_PATH = pillar_data
+    suma_minion.IMAGES_DATA_PATH = images
+    suma_minion.FORMULAS_DATA_PATH = formula_data
+    suma_minion.FORMULA_ORDER_FILE = os.path.join(formula_data, "formula_order.json")
+    suma_minion.MANAGER_FORMULAS_METADATA_MANAGER_PATH = os.path.join(os.path.abspath(''), 'data', 'formulas', 'metadata')
+
+
+def render(minions, cached):
+    start = time.time()
+    for i in range(minions):
+        if not cached:
+            suma_minion.clear_cache()
+        suma_minion.ext_pillar("minion%d.example.com" % i)
+    return time.time() - start
+
+
+def main():
+    minions = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    groups = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    root = tempfile.mkdtemp()
+    try:
+        build_tree(root, minions, groups)
+        loader = suma_minion.YAML_LOADER
+
+        suma_minion.YAML_LOADER = yaml.FullLoader
+        elapsed = render(minions, False)
+        print("%-38s %8.2fs %8.2f ms/minion" % ("uncached, pure Python YAML loader", elapsed, 1000.0 * elapsed / minions))
+
+        suma_minion.YAML_LOADER = loader
+        suma_minion.clear_cache()
+        elapsed = render(minions, True)
+        print("%-38s %8.2fs %8.2f ms/minion" % ("cached, %s" % loader.__name__, elapsed, 1000.0 * elapsed / minions))
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,7 +3,7 @@ import pytest
 import psycopg2
 import shlex
 import subprocess
-from mgr_events import Responder, DEFAULT_COMMIT_BURST
+from mgr_events import Responder, DEFAULT_COMMIT_BURST, INSERT_EVENTS
 from mock import MagicMock, patch, call
 from sqlalchemy import create_engine
 from sqlalchemy_utils import database_exists, create_database, drop_database
@@ -211,3 +211,60 @@ def test_postgres_connect_with_port(responder):
     with patch('mgr_events.psycopg2') as mock_psycopg2:
         responder._connect_to_database()
         mock_psycopg2.connect.assert_called_once_with(u"dbname='tests' user='postgres' host='localhost' port='1234' password=''")
+
+
+@pytest.fixture
+def buffered_responder():
+    with patch('mgr_events.psycopg2') as mock_psycopg2:
+        mock_psycopg2.connect.return_value.closed = False
+        mock_psycopg2.connect.return_value.encoding = 'utf-8'
+        yield Responder(
+            MagicMock(),  # mock event_bus
+            {
+                'flush_size': 3,
+                'postgres_db': {
+                     'dbname': 'tests',
+                     'user': 'postgres',
+                     'password': '',
+                     'host': 'localhost',
+                 },
+                'events': {
+                    'thread_pool_size': 3
+                }
+            }
+        )
+
+
+def test_buffered_insert(buffered_responder):
+    responder = buffered_responder
+    responder._insert('salt/minion/1/start', {'id': 'testminion', 'value': 1})
+    responder._insert('salt/auth', {'id': 'testminion'})
+    responder._insert('salt/job/1/ret/testminion', {'id': 'testminion', 'fun': 'state.apply'})
+    assert len(responder.buffer) == 2
+    assert responder.event_bus.io_loop.call_later.call_count == 2
+    with patch('mgr_events.psycopg2.extras.execute_values') as execute_values:
+        responder._insert('salt/beacon/testminion/inotify', {'id': 'testminion'})
+        assert execute_values.call_count == 1
+        assert execute_values.call_args[0][1] == INSERT_EVENTS
+        assert [row[2] for row in execute_values.call_args[0][2]] == [2, 2, 2]
+    assert responder.buffer == []
+    assert responder.event_bus.io_loop.remove_timeout.call_count == 1
+    assert responder.connection.commit.call_count == 1
+    assert responder.cursor.execute.mock_calls[-1:] == [call("NOTIFY suseSaltEvent, '0,0,3,0';")]
+    assert responder.stats['accepted'] == 3
+    assert responder.stats['discarded'] == 1
+    assert responder.stats['flushed'] == 3
+    assert responder.stats['flushes'] == 1
+
+
+def test_buffered_flush_timeout(buffered_responder):
+    responder = buffered_responder
+    responder._insert('salt/minion/1/start', {'id': 'testminion', 'value': 1})
+    interval, callback = responder.event_bus.io_loop.call_later.call_args[0]
+    assert interval == 0.1
+    with patch('mgr_events.psycopg2.extras.execute_values') as execute_values:
+        callback()
+        assert execute_values.call_count == 1
+    assert responder.buffer == []
+    assert responder.flush_timeout is None
+    assert responder.stats['flushed'] == 1
@@ -30,3 +30,38 @@ def test_formula_pillars():
     assert "formulas" in pillar
     assert pillar["formulas"] == ['branch-network', 'locale', 'tftpd']
 
+
+def test_load_cached(tmpdir):
+    '''
+    Test the parsed files are reused until they are modified
+    '''
+    path = str(tmpdir.join("data.yml"))
+    with open(path, "w") as f:
+        f.write("key: [1, 2]\n")
+    data = suma_minion.load_cached(path)
+    assert data == {"key": [1, 2]}
+    data["key"].append(3)
+    assert suma_minion.load_cached(path) == {"key": [1, 2]}
+    assert suma_minion.load_cached(path, copy_data=False) is suma_minion.load_cached(path, copy_data=False)
+
+    with open(path, "w") as f:
+        f.write("key: [1, 2, 3, 4]\n")
+    assert suma_minion.load_cached(path) == {"key": [1, 2, 3, 4]}
+
+def test_group_formula_pillars_cache():
+    '''
+    Test the group formula pillars are computed once for the minions of the group
+    '''
+    suma_minion.FORMULAS_DATA_PATH = os.path.sep.join([os.path.abspath(''), 'data'])
+    suma_minion.FORMULA_ORDER_FILE = os.path.sep.join([os.path.abspath(''), 'data', 'formula_order.json'])
+    suma_minion.MANAGER_FORMULAS_METADATA_MANAGER_PATH = os.path.sep.join([os.path.abspath(''), 'data', 'formulas', 'metadata'])
+    suma_minion.clear_cache()
+
+    pillar = suma_minion.formula_pillars("minion1.mgr.suse.de", [9])
+    assert pillar["formulas"] == ['locale', 'tftpd']
+    assert (9, 'locale') in suma_minion._cache.group_formulas
+
+    with patch.object(suma_minion, 'merge_formula_data') as merge:
+        pillar["timezone"]["name"] = "changed"
+        assert suma_minion.formula_pillars("minion2.mgr.suse.de", [9])["timezone"] != pillar["timezone"]
+        merge.assert_not_called()